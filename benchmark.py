@@ -0,0 +1,564 @@
+import argparse
+import csv
+import inspect
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import database
+import repository
+
+# 性能基准：按行数生成合成的 question_data.db，逐个计时 database.py 的函数、回顾页的筛选路径
+# 和四个回顾页的 load_data（offscreen Qt 平台，没装 PyQt5 时跳过这一部分），结果写成 JSON
+# 给了 --baseline 时与基线逐项对比，超过阈值的算作回退，退出码为 1
+# 用法：python benchmark.py --sizes 1000,10000 --baseline bench_baseline.json
+#       python benchmark.py --sizes 1000,10000 --save-baseline bench_baseline.json
+# 生成的库按行数缓存在 --data-dir，每次在副本上计时，写操作不会污染缓存
+SIZES = (1000, 10000, 100000, 1000000)
+REPEAT = 5
+THRESHOLD = 1.3  # 中位数超过基线的这个倍数算回退
+MIN_DELTA_MS = 0.5  # 绝对差值小于这个毫秒数的波动不算回退
+GENERATE_BATCH = 10000
+QT_TIMEOUT_MS = 120000
+
+logging.getLogger('xingce').addHandler(logging.NullHandler())  # 慢查询警告会干扰计时输出
+
+Case = namedtuple('Case', 'name fn setup teardown', defaults=(None, None))
+
+WORDS = ['排列组合', '行程问题', '工程问题', '概率', '逻辑判断', '类比推理', '定义判断', '图形推理', '资料分析',
+         '言语理解', '片段阅读', '成语辨析', '增长率', '比重', '平均数', '经济利润', '几何', '容斥原理',
+         '真假推理', '削弱论证', '加强论证', '主旨概括', '细节判断', '词语填空']
+MODULES = ['言语理解', '数量关系', '判断推理', '资料分析', '常识判断']
+PROVINCES = ['北京', '上海', '广东', '江苏', '浙江', '山东', '四川', '湖北']
+IDIOM_CHARS = '一二三四五六七八九十百千万天地人山水风火龙虎马心手口目耳金木石日月云雨花草鸟'
+BASE_TIME = datetime(2024, 1, 1)
+
+def _text(rng, low, high, tag=''):
+    return ''.join(rng.choice(WORDS) for _ in range(rng.randint(low, high))) + tag
+
+def _idiom_name(i):  # 按序号编码成 4 个字，保证名称唯一
+    base = len(IDIOM_CHARS)
+    return ''.join(IDIOM_CHARS[i // base ** k % base] for k in range(4))
+
+def _stamp(rng, days=365):
+    return BASE_TIME + timedelta(seconds=rng.randrange(days * 86400))
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= GENERATE_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _question_rows(n, rng):
+    now = datetime.now()
+    for i in range(n):
+        content = _text(rng, 8, 30, f'（第{i}题）')
+        answer = rng.choice('ABCD')
+        created = _stamp(rng)
+        yield (rng.choice(MODULES), f'来源{rng.randrange(50)}', content, answer, _text(rng, 5, 20),
+               f'题型{rng.randrange(20)}', rng.randrange(10), created, created.strftime('%Y-%m-%d'),
+               round(rng.uniform(1.3, 3.0), 2), rng.randrange(60), rng.randrange(8),
+               now + timedelta(days=rng.uniform(-30, 30)), database.question_hash(content, answer))
+
+def _idiom_rows(n, rng):
+    for i in range(n):
+        created = _stamp(rng)
+        yield (f'分类{rng.randrange(30)}', _idiom_name(i), _text(rng, 2, 6), _text(rng, 1, 4), _text(rng, 1, 3),
+               _text(rng, 3, 8), created, created.strftime('%Y-%m-%d'))
+
+def _exam_rows(n, rng):
+    for i in range(1, n + 1):
+        done = _stamp(rng, 3 * 365)
+        sections = [(i, name, rng.randint(5, 25), 0) for name, _ in database.EXAM_SECTIONS]
+        sections = [(pid, name, total, rng.randint(0, total)) for pid, name, total, _ in sections]
+        total = sum(row[2] for row in sections)
+        correct = sum(row[3] for row in sections)
+        yield ((i, done.year, done.strftime('%Y-%m-%d'), f'模拟卷{i}', correct, total, round(correct / total * 100, 1), done),
+               sections)
+
+def _essay_rows(n, rng):
+    for _ in range(n):
+        day = _stamp(rng, 5 * 365)
+        yield (day.year, rng.choice(PROVINCES), f'题型{rng.randrange(6)}', f'来源{rng.randrange(20)}',
+               day.strftime('%Y-%m-%d'), _text(rng, 20, 60), rng.choice(['已完成', '未完成']), day.strftime('%Y-%m-%d'))
+
+def generate(path, n, seed):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    database.DB_PATH = path
+    database.init_db()
+    rng = random.Random(seed)
+    conn = database.get_conn()
+    with conn:
+        for batch in _batches(_question_rows(n, rng)):
+            conn.executemany('''INSERT INTO questions (module, source, content, answer, analysis, question_type, reviews,
+                                create_time, entry_time, ease, interval_days, repetitions, due, content_hash)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', batch)
+        for batch in _batches(_idiom_rows(n, rng)):
+            conn.executemany('''INSERT INTO idioms (category, name, meaning, context, collocation, example, create_time, entry_time)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', batch)
+        for batch in _batches(_exam_rows(n, rng)):
+            conn.executemany('''INSERT INTO exam_papers (id, year, completion_date, paper_name, total_correct, total_questions, score, create_time)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', [paper for paper, _ in batch])
+            conn.executemany('INSERT INTO exam_sections (paper_id, section, total, correct) VALUES (?, ?, ?, ?)',
+                             [row for _, sections in batch for row in sections])
+        for batch in _batches(_essay_rows(n, rng)):
+            conn.executemany('''INSERT INTO essay_papers (year, province, question_type, source, date, content, completion_status, entry_time)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', batch)
+    conn.execute('ANALYZE')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    database.close_db()
+
+# 缓存的库版本与当前迁移版本一致才复用，否则重新生成
+def prepare_database(data_dir, n, seed):
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'bench_{n}_{seed}.db')
+    fresh = False
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        fresh = database.get_schema_version(conn) == database.SCHEMA_VERSION
+        conn.close()
+    if not fresh:
+        started = time.perf_counter()
+        print(f'生成 {n} 行的测试库…', file=sys.stderr)
+        generate(path, n, seed)
+        print(f'  用时 {time.perf_counter() - started:.1f} 秒', file=sys.stderr)
+    work = os.path.join(data_dir, f'bench_{n}_{seed}.work.db')
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    shutil.copyfile(path, work)
+    return work
+
+# 每个用例先预热一次再计时 repeat 次；setup 和 teardown 不计时，setup 的返回值传给 fn，fn 的返回值传给 teardown
+def measure(case, repeat):
+    timings = []
+    for i in range(repeat + 1):
+        arg = case.setup() if case.setup is not None else None
+        started = time.perf_counter()
+        result = case.fn(arg) if case.setup is not None else case.fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        if case.teardown is not None:
+            case.teardown(result)
+        if i:
+            timings.append(elapsed)
+    return {'median_ms': round(statistics.median(timings), 4), 'min_ms': round(min(timings), 4),
+            'max_ms': round(max(timings), 4), 'runs': repeat}
+
+def database_cases(n, rng, tmp_dir):
+    qid, iid, eid, sid = (rng.randint(1, n) for _ in range(4))
+    question = database.get_question(qid)
+    idiom = database.get_idiom(iid)
+    paper = database.get_exam_paper(eid)
+    sections = database.get_exam_sections(eid)
+    essay = database.get_essay_paper(sid)
+    counter = iter(range(10 ** 9))
+    csv_path = os.path.join(tmp_dir, 'import.csv')
+    with open(csv_path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['ID', '题型模块', '题目来源', '题目内容', '正确答案', '错题解析', '题型', '录入时间'])
+        writer.writerows([0, '数量关系', 'bench-import', _text(rng, 8, 20, f'（导入{i}）'), 'A', '', '题型', '2024-01-01']
+                         for i in range(1000))
+
+    def new_question():
+        return database.add_question('数量关系', 'bench', _text(rng, 8, 20, f'（新{next(counter)}）'), 'A', '', '题型', '2024-01-01')
+
+    def new_exam_paper():
+        return database.add_exam_paper(2024, '2024-06-01', 'bench', sections, paper[3], paper[4], paper[5])
+
+    def new_idiom():
+        return database.add_idiom('bench', f'基准{next(counter)}', '语义', '', '', '', '2024-01-01')
+
+    def new_essay():
+        return database.add_essay_paper(*essay)
+
+    def review_backlog():
+        for i in range(500):
+            database.record_review(rng.randint(1, n), rng.choice(list(database.REVIEW_GRADES.values())), 10.0)
+
+    image_path = os.path.join(tmp_dir, 'image.png')
+    with open(image_path, 'wb') as file:
+        file.write(rng.randbytes(200 * 1024))  # 附件存储只按字节处理，不需要真的是图片
+    database.add_attachment(qid, image_path)  # 让读附件的用例有结果可取
+
+    def new_attachment():
+        return database.add_attachment(qid, image_path)
+
+    def review_edits():  # 模拟一天的学习：100 次复习评分
+        for _ in range(100):
+            database.review_question(rng.randint(1, n), 4)
+
+    def remove_imported(result):
+        with database.get_conn() as conn:
+            conn.execute("DELETE FROM questions WHERE source = 'bench-import'")
+
+    peer_path = _sync_peer(tmp_dir)
+    keyword = {'keyword': '排列组合'}
+    cases = [
+        Case('init_db', database.init_db),
+        Case('get_conn', database.get_conn),
+        Case('get_schema_version', lambda: database.get_schema_version(database.get_conn())),
+        Case('fts_tokens', lambda: database.fts_tokens(question[2])),
+        Case('fts_query', lambda: database.fts_query('排列组合 概率')),
+        Case('question_hash', lambda: database.question_hash(question[2], question[3])),
+        Case('shuffle_key', lambda: database.shuffle_key(qid, 12345)),
+        Case('sm2_schedule', lambda: database.sm2_schedule(2.5, 6, 2, 4)),
+        # 题目
+        Case('get_all_questions', database.get_all_questions),
+        Case('query_questions[page]', lambda: database.query_questions(limit=200)),
+        Case('query_questions[last page]', lambda: database.query_questions(limit=200, offset=max(n - 200, 0))),
+        Case('query_questions[module]', lambda: database.query_questions({'module': '数量关系'}, limit=200)),
+        Case('query_questions[keyword]', lambda: database.query_questions(keyword, 'rank', limit=200)),
+        Case('query_questions[keyword+module]', lambda: database.query_questions(dict(keyword, module='数量关系'), 'rank', limit=200)),
+        Case('query_questions[random]', lambda: database.query_questions(order='random', limit=200, seed=42)),
+        Case('query_questions[random next page]', lambda: database.query_questions(order='random', limit=200, offset=200, seed=42)),
+        Case('count_questions', database.count_questions),
+        Case('count_questions[keyword]', lambda: database.count_questions(keyword)),
+        Case('get_question', lambda: database.get_question(qid)),
+        Case('get_record[miss]', lambda _: repository.get_record('questions', qid), setup=repository.clear_record_cache),
+        Case('get_record[hit]', lambda: repository.get_record('questions', qid)),
+        Case('get_record[exam_papers miss]', lambda _: repository.get_record('exam_papers', eid), setup=repository.clear_record_cache),
+        Case('prefetch_records[7]', lambda _: repository.prefetch_records('questions', range(qid, qid + 7)),
+             setup=repository.clear_record_cache),
+        Case('check_duplicate_question', lambda: database.check_duplicate_question(question[2], question[3])),
+        Case('add_question', new_question, teardown=database.delete_question),
+        Case('update_question', lambda: database.update_question(qid, *question)),
+        Case('delete_question', database.delete_question, setup=new_question),
+        Case('update_review', lambda: database.update_review(qid)),
+        Case('review_question', lambda: database.review_question(qid, 4, duration=10.0)),
+        Case('record_review', lambda: database.record_review(qid, 4, 10.0), teardown=lambda _: database.flush_reviews()),
+        Case('pending_reviews', database.pending_reviews),
+        Case('flush_reviews[500]', lambda _: database.flush_reviews(), setup=review_backlog),
+        Case('get_review_events', lambda: database.get_review_events(qid)),
+        Case('get_due_questions', lambda: database.get_due_questions(50)),
+        Case('count_due_questions', database.count_due_questions),
+        Case('sample_questions', lambda: database.sample_questions(30, seed=7)),
+        Case('sample_questions[module]', lambda: database.sample_questions(30, {'module': '数量关系'}, seed=7)),
+        Case('sample_questions[weighted]', lambda: database.sample_questions(30, weight='reviews', seed=7)),
+        Case('sample_questions[stratified]', lambda: database.sample_questions(30, stratify='module', seed=7)),
+        Case('get_all_sources', database.get_all_sources),
+        Case('attachment_dir', database.attachment_dir),
+        Case('attachment_path', lambda: database.attachment_path('0' * 64, '.png')),
+        Case('add_attachment', new_attachment, teardown=database.delete_attachment),
+        Case('get_attachments', lambda: database.get_attachments(qid)),
+        Case('get_first_attachments[page]', lambda: database.get_first_attachments(range(max(qid - 100, 1), qid + 100))),
+        Case('delete_attachment', database.delete_attachment, setup=new_attachment),
+        Case('import_csv[questions 1000]', lambda: database.import_csv('questions', csv_path), teardown=remove_imported),
+        # 成语
+        Case('get_all_idioms', database.get_all_idioms),
+        Case('query_idioms[page]', lambda: database.query_idioms(limit=200)),
+        Case('query_idioms[keyword]', lambda: database.query_idioms({'keyword': '排列'}, 'rank', limit=200)),
+        Case('count_idioms', database.count_idioms),
+        Case('get_idiom', lambda: database.get_idiom(iid)),
+        Case('check_duplicate_idiom', lambda: database.check_duplicate_idiom(idiom[1])),
+        Case('add_idiom', new_idiom, teardown=database.delete_idiom),
+        Case('update_idiom', lambda: database.update_idiom(iid, *idiom)),
+        Case('delete_idiom', database.delete_idiom, setup=new_idiom),
+        Case('load_idiom_index', lambda _: database.load_idiom_index(), setup=lambda: setattr(database._idiom_index, '_root', None)),
+        Case('complete_idioms', lambda: database.complete_idioms(idiom[1][:2])),
+        Case('find_idiom', lambda: database.find_idiom(idiom[1])),
+        # 行测套卷
+        Case('get_all_exam_papers', database.get_all_exam_papers),
+        Case('query_exam_papers[page]', lambda: database.query_exam_papers(limit=200)),
+        Case('query_exam_papers[year]', lambda: database.query_exam_papers({'year': 2025}, limit=200)),
+        Case('count_exam_papers', database.count_exam_papers),
+        Case('get_exam_paper', lambda: database.get_exam_paper(eid)),
+        Case('get_exam_sections', lambda: database.get_exam_sections(eid)),
+        Case('add_exam_paper', new_exam_paper, teardown=database.delete_exam_paper),
+        Case('update_exam_paper', lambda: database.update_exam_paper(eid, *paper[:3], sections, *paper[3:])),
+        Case('delete_exam_paper', database.delete_exam_paper, setup=new_exam_paper),
+        Case('get_exam_stats[year]', lambda: database.get_exam_stats('year')),
+        Case('get_exam_stats[month]', lambda: database.get_exam_stats('month')),
+        Case('get_exam_rolling_stats', lambda: database.get_exam_rolling_stats(10)),
+        # 申论
+        Case('get_all_essay_papers', database.get_all_essay_papers),
+        Case('query_essay_papers[page]', lambda: database.query_essay_papers(limit=200)),
+        Case('query_essay_papers[province]', lambda: database.query_essay_papers({'province': '北京'}, limit=200)),
+        Case('count_essay_papers', database.count_essay_papers),
+        Case('get_essay_paper', lambda: database.get_essay_paper(sid)),
+        Case('add_essay_paper', new_essay, teardown=database.delete_essay_paper),
+        Case('update_essay_paper', lambda: database.update_essay_paper(sid, *essay)),
+        Case('delete_essay_paper', database.delete_essay_paper, setup=new_essay),
+    ]
+    for table in database.EXPORT_SPECS:
+        for suffix in ('.csv', '.jsonl.gz'):
+            path = os.path.join(tmp_dir, f'export_{table}{suffix}')
+            cases.append(Case(f'export_table[{table}{suffix}]', lambda table=table, path=path: database.export_table(table, path),
+                              teardown=lambda _, path=path: os.remove(path)))
+        # 增量导出：只有最近的 100 条变更时的代价，应当与表的大小无关
+        path = os.path.join(tmp_dir, f'changes_{table}.csv')
+        cases.append(Case(f'export_changes[{table} 100]',
+                          lambda since, table=table, path=path: database.export_changes(table, path, since),
+                          setup=lambda table=table: _recent_changes_seq(table, 100),
+                          teardown=lambda _, path=path: os.remove(path)))
+    cases += [
+        Case('current_change_seq', database.current_change_seq),
+        Case('sync_with[100 edits]', lambda _: database.sync_with(peer_path), setup=review_edits),
+        Case('get_change_watermark', lambda: database.get_change_watermark('questions')),
+        Case('set_change_watermark', lambda: database.set_change_watermark('bench', n)),
+    ]
+    return cases
+
+# 同步的对方：当前库的副本，两边的同步水位直接设到当前位置，等同于已经完整同步过一次
+def _sync_peer(tmp_dir):
+    conn = database.get_conn()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    path = os.path.join(tmp_dir, 'peer.db')
+    shutil.copyfile(database.DB_PATH, path)
+    local_id = conn.execute('SELECT id FROM replica').fetchone()[0]
+    seq = database.current_change_seq()
+    peer = sqlite3.connect(path)
+    with peer:  # 连同路径一起改，打开时不会再被当成复制出来的库换 ID
+        peer.execute("UPDATE replica SET id = 'bench-peer', path = ?", (os.path.normcase(os.path.realpath(path)),))
+        peer.execute('INSERT INTO change_watermarks (name, seq) VALUES (?, ?)', (f'sync:{local_id}', seq))
+    peer.close()
+    database.set_change_watermark('sync:bench-peer', seq)
+    return path
+
+# 正确性检查：conn.execute 和游标的 execute 执行的语句都要记进 SQL 统计；返回漏记的语句
+def check_sql_stats(tmp_dir):
+    saved = database.DB_PATH
+    statements = ['SELECT 1 AS conn_execute_check', 'SELECT 2 AS cursor_execute_check']
+    try:
+        database.DB_PATH = os.path.join(tmp_dir, 'trace_check.db')
+        database.reset_stats()
+        conn = database.get_conn()
+        conn.execute(statements[0]).fetchone()
+        conn.cursor().execute(statements[1]).fetchone()
+        recorded = {row['name'] for row in database.query_stats()}
+        return [sql for sql in statements if sql not in recorded]
+    finally:
+        database.reset_stats()
+        database.close_db()
+        database.DB_PATH = saved
+
+# 正确性检查：一个库复制成两份，各自修改后都只和第三个库同步，两份最后应当完全一致
+# 返回内容不一致的表名，空列表表示通过；在临时目录里用小库完成，不碰计时用的库
+def check_sync_via_hub(tmp_dir):
+    saved = database.DB_PATH
+    first, copy, hub = (os.path.join(tmp_dir, f'sync_{name}.db') for name in ('a', 'b', 'hub'))
+    try:
+        database.DB_PATH = first
+        database.init_db()
+        ids = [database.add_question('言语理解', f'来源{i}', f'题目{i}', 'A', '', '单选', '2024-01-01') for i in range(4)]
+        idiom = database.add_idiom('成语', '一心一意', '专心', '', '', '', '2024-01-01')
+        renamed = [database.add_idiom('成语', name, '', '', '', '', '2024-01-01') for name in ('三心二意', '四平八稳')]
+        paper = database.add_exam_paper(2024, '2024-01-01', '模拟卷', {'logic': (20, 15)}, 15, 20, 75.0)
+        database.close_db()
+        shutil.copyfile(first, copy)
+        database.update_question(ids[0], '言语理解', '来源0', '题目0 改 A', 'B', '', '单选', '2024-01-01')
+        database.delete_question(ids[1])
+        database.add_question('数量关系', '来源A', '新题 A', 'C', '', '单选', '2024-01-02')
+        database.update_idiom(idiom, '成语', '一心一意', '专心致志', '', '', '', '2024-01-01')
+        database.DB_PATH = copy
+        database.update_question(ids[2], '言语理解', '来源2', '题目2 改 B', 'D', '', '单选', '2024-01-01')
+        database.update_question(ids[0], '言语理解', '来源0', '题目0 改 B', 'C', '', '单选', '2024-01-01')
+        database.update_exam_paper(paper, 2024, '2024-01-01', '模拟卷', {'logic': (20, 18)}, 18, 20, 90.0)
+        # 成语改名撞上对方新录入的同名成语：先录入后改名时改名胜出，先改名后录入时新录入的胜出
+        database.add_idiom('成语', '半途而废', '', '', '', '', '2024-01-02')
+        database.DB_PATH = first
+        database.update_idiom(renamed[0], '成语', '半途而废', '改名', '', '', '', '2024-01-01')
+        database.update_idiom(renamed[1], '成语', '专心致志', '改名', '', '', '', '2024-01-01')
+        database.DB_PATH = copy
+        database.add_idiom('成语', '专心致志', '新录入', '', '', '', '2024-01-02')
+        for path in (first, copy, first):
+            database.DB_PATH = path
+            database.sync_with(hub)
+        database.close_db()
+        snapshots = []
+        for path in (first, copy):
+            conn = sqlite3.connect(path)
+            snapshots.append({table: sorted((row[1:] for row in conn.execute(f'SELECT * FROM {table}')), key=repr)  # 去掉本地行号
+                              for table in database.CHANGE_TABLES})
+            conn.close()
+        return [table for table in database.CHANGE_TABLES if snapshots[0][table] != snapshots[1][table]]
+    finally:
+        database.close_db()
+        database.DB_PATH = saved
+
+def _recent_changes_seq(table, count):  # 该表倒数第 count 条变更之前的序号
+    with database.get_conn() as conn:
+        row = conn.execute('SELECT seq FROM changes WHERE table_name = ? ORDER BY seq DESC LIMIT 1 OFFSET ?',
+                           (table, count)).fetchone()
+        return row[0] if row else 0
+
+# 回顾页：构造（含首次 load_data）、刷新、关键词筛选，以及把可见区域画到离屏 pixmap 上
+def qt_cases(app, main):
+    from PyQt5.QtCore import QEventLoop, QTimer
+
+    def wait_idle(model):
+        if model.task is None and not model.resetting:
+            return
+        loop = QEventLoop()
+        model.statusChanged.connect(lambda text: loop.quit() if not text else None)
+        QTimer.singleShot(QT_TIMEOUT_MS, loop.quit)
+        loop.exec_()
+        if model.task is not None or model.resetting:
+            raise TimeoutError(f'{model.table} 加载超时')
+
+    cases = []
+    tabs = {}
+    for page_class in (main.ReviewTab, main.IdiomReviewTab, main.ExamReviewTab, main.EssayReviewTab):
+        name = page_class.__name__
+
+        def construct(page_class=page_class):
+            page = page_class()
+            page.resize(1000, 700)
+            wait_idle(page.model)
+            return page
+
+        def keep(page, name=name):
+            if name in tabs:
+                tabs[name].deleteLater()
+            tabs[name] = page
+
+        def refresh(name=name):
+            tabs[name].load_data()
+            wait_idle(tabs[name].model)
+
+        def search(name=name):
+            page = tabs[name]
+            page.filter_input.setText('排列组合')
+            page.filter_controller.refresh()
+            wait_idle(page.model)
+
+        def clear(_, name=name):
+            tabs[name].filter_input.clear()
+            tabs[name].filter_controller.refresh()
+            wait_idle(tabs[name].model)
+
+        cases += [
+            Case(f'{name}[construct]', construct, teardown=keep),
+            Case(f'{name}.load_data', refresh),
+            Case(f'{name}.filter[keyword]', search, teardown=clear),
+            Case(f'{name}.render', lambda name=name: tabs[name].grab()),
+        ]
+    return cases
+
+def load_qt():
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt5.QtWidgets import QApplication
+    except ImportError:
+        return None, None
+    import main
+    return QApplication.instance() or QApplication([]), main
+
+def covered_functions(results):
+    public = {name for name, fn in inspect.getmembers(database, inspect.isfunction)
+              if fn.__module__ == database.__name__ and not name.startswith('_')}
+    timed = {name.split('[')[0] for cases in results.values() for name in cases}
+    return sorted(public - timed)
+
+def run(sizes, repeat, data_dir, seed, with_qt):
+    app, main = load_qt() if with_qt else (None, None)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        diverged = check_sync_via_hub(tmp_dir)
+        untraced = check_sql_stats(tmp_dir)
+    if diverged:
+        print('同步检查失败，两份副本经中转库同步后不一致: ' + ', '.join(diverged), file=sys.stderr)
+    if untraced:
+        print('SQL 统计检查失败，没有记录: ' + ', '.join(untraced), file=sys.stderr)
+    results = {}
+    for n in sizes:
+        path = prepare_database(data_dir, n, seed)
+        database.DB_PATH = path
+        database.init_db()
+        rng = random.Random(seed)
+        results[str(n)] = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cases = database_cases(n, rng, tmp_dir)
+            if main is not None:
+                cases += qt_cases(app, main)
+            for case in cases:
+                results[str(n)][case.name] = measure(case, repeat)
+                print(f"{n:>8} {case.name:<45} {results[str(n)][case.name]['median_ms']:>10.3f} ms", file=sys.stderr)
+        if main is not None:
+            main.wait_for_workers()
+        database.flush_reviews()
+        database.close_db()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    return {
+        'meta': {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'schema_version': database.SCHEMA_VERSION,
+            'repeat': repeat,
+            'seed': seed,
+            'qt': main is not None,
+        },
+        'sync_diverged': diverged,
+        'untraced_sql': untraced,
+        'results': results,
+        'not_covered': covered_functions(results),
+    }
+
+# 按中位数对比基线，两边都有的用例才比较
+def compare(report, baseline, threshold, min_delta):
+    comparisons, regressions = [], []
+    for size, cases in report['results'].items():
+        for name, current in cases.items():
+            before = baseline.get('results', {}).get(size, {}).get(name)
+            if before is None:
+                continue
+            ratio = current['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+            entry = {'size': int(size), 'case': name, 'baseline_ms': before['median_ms'],
+                     'current_ms': current['median_ms'], 'ratio': round(ratio, 3)}
+            comparisons.append(entry)
+            if ratio > threshold and current['median_ms'] - before['median_ms'] > min_delta:
+                regressions.append(entry)
+    return comparisons, regressions
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description='行测错题助手性能基准')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='逗号分隔的每表行数')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'xingce_benchmark'))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='与这个基线 JSON 对比')
+    parser.add_argument('--save-baseline', help='把本次结果另存为基线')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--min-delta-ms', type=float, default=MIN_DELTA_MS)
+    parser.add_argument('--no-qt', action='store_true', help='不测回顾页')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    report = run(sizes, args.repeat, args.data_dir, args.seed, not args.no_qt)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            comparisons, regressions = compare(report, json.load(file), args.threshold, args.min_delta_ms)
+        report['comparison'] = {'baseline': args.baseline, 'threshold': args.threshold,
+                                'cases': comparisons, 'regressions': regressions}
+        for entry in regressions:
+            print(f"回退 {entry['size']:>8} {entry['case']:<45} {entry['baseline_ms']:.3f} -> {entry['current_ms']:.3f} ms"
+                  f" (x{entry['ratio']})", file=sys.stderr)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    if report['not_covered']:
+        print('未计时的函数: ' + ', '.join(report['not_covered']), file=sys.stderr)
+    return 1 if regressions or report['sync_diverged'] or report['untraced_sql'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
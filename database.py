@@ -1,17 +1,408 @@
 import sqlite3
+import bisect
+import csv
+import gzip
+import hashlib
+import heapq
+import json
+import logging
 import os
-from datetime import datetime
+import random
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # 没装 pypinyin 时成语补全只按汉字前缀匹配
+    lazy_pinyin = None
 
 DB_PATH = 'question_data.db'
 
+log = logging.getLogger('xingce.database')
+
 # 删除现有的数据库文件
 # if os.path.exists(DB_PATH):
 #     os.remove(DB_PATH)
 
-def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS questions
+# 连接调优参数：WAL 下 synchronous=NORMAL 只在检查点时 fsync，提交不再逐次落盘
+PRAGMAS = [
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -32000),  # 负数单位为 KiB，约 32MB 页缓存
+    ('temp_store', 'MEMORY'),
+    ('mmap_size', 256 * 1024 * 1024),
+]
+STATEMENT_CACHE_SIZE = 256  # 每个连接缓存的预编译语句数量
+
+# 查询统计：每条语句从 execute 到游标被释放（取完结果）算一次，耗时包含逐行取数
+# 按归一化的 SQL 汇总次数、总耗时、返回行数、SQLite 虚拟机步数和耗时分布；另外保留最慢的若干次及其参数，
+# 查看时再补上 EXPLAIN QUERY PLAN。步数来自 progress handler，每 PROGRESS_STEPS 条虚拟机指令回调一次
+LATENCY_BUCKETS_MS = (0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, 3000)  # 耗时分布的各桶上界，最后还有一个溢出桶
+SLOW_QUERY_MS = 100  # 超过这个耗时的语句写一条警告日志
+SLOW_QUERY_LIMIT = 20  # 保留最慢的多少次执行
+PROGRESS_STEPS = 1000
+_IN_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+_EXPLAINABLE = re.compile(r'\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+_stats_lock = threading.Lock()
+_query_stats = {}  # 归一化 SQL -> [次数, 总毫秒, 最大毫秒, 行数, 步数, 分布]
+_phase_stats = {}  # 界面阶段名 -> [次数, 总毫秒, 最大毫秒, 0, 0, 分布]
+_slowest = []  # 小顶堆 (毫秒, 序号, 记录)
+_slow_seq = 0
+_sql_keys = {}  # 原始 SQL -> 归一化 SQL 的缓存
+_sql_trace = False  # 为 True 时把每条执行的语句（包括触发器里的）写入调试日志
+
+def _sql_key(sql):
+    key = _sql_keys.get(sql)
+    if key is None:
+        if len(_sql_keys) > 2000:
+            _sql_keys.clear()
+        key = _sql_keys[sql] = _IN_LIST.sub('?, …', ' '.join(sql.split()))
+    return key
+
+def _add_sample(stats, key, ms, rows=0, steps=0):
+    entry = stats.get(key)
+    if entry is None:
+        entry = stats[key] = [0, 0.0, 0.0, 0, 0, [0] * (len(LATENCY_BUCKETS_MS) + 1)]
+    entry[0] += 1
+    entry[1] += ms
+    entry[2] = max(entry[2], ms)
+    entry[3] += rows
+    entry[4] += steps
+    entry[5][bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+
+def _record_query(sql, params, ms, rows, steps):
+    global _slow_seq
+    if sql.lstrip()[:7].upper() == 'EXPLAIN':
+        return
+    with _stats_lock:
+        _add_sample(_query_stats, _sql_key(sql), ms, rows, steps)
+        if len(_slowest) < SLOW_QUERY_LIMIT or ms > _slowest[0][0]:
+            _slow_seq += 1
+            record = {'sql': sql, 'params': params, 'ms': ms, 'rows': rows, 'steps': steps,
+                      'time': datetime.now().isoformat(timespec='seconds'), 'plan': None}
+            (heapq.heappush if len(_slowest) < SLOW_QUERY_LIMIT else heapq.heapreplace)(_slowest, (ms, _slow_seq, record))
+    if ms >= SLOW_QUERY_MS:
+        log.warning('慢查询 %.1f ms，%d 行：%s', ms, rows, _sql_key(sql))
+
+def _trace_sql(statement):
+    if _sql_trace:
+        log.debug('SQL %s', statement)
+
+class _TracedCursor(sqlite3.Cursor):
+    _record = None  # [sql, 参数, 开始时的步数, 累计毫秒, 行数]
+
+    def _finish(self):
+        record, self._record = self._record, None
+        if record is not None:
+            _record_query(record[0], record[1], record[3], record[4], (self.connection.steps - record[2]) * PROGRESS_STEPS)
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._record is not None:
+                self._record[3] += (time.perf_counter() - started) * 1000
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._record = [sql, parameters, self.connection.steps, 0.0, 0]
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        self._record = [sql, None, self.connection.steps, 0.0, 0]
+        result = self._timed(super().executemany, sql, seq_of_parameters)
+        self._record[4] = max(self.rowcount, 0)
+        return result
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is not None and self._record is not None:
+            self._record[4] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._record is not None:
+            self._record[4] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._record is not None:
+            self._record[4] += len(rows)
+        return rows
+
+    def __next__(self):
+        row = self._timed(super().__next__)
+        if self._record is not None:
+            self._record[4] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:  # 解释器退出或连接已关闭
+            pass
+
+class _TracedConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.steps = 0
+        self.set_progress_handler(self._count_steps, PROGRESS_STEPS)
+        self.set_trace_callback(_trace_sql)
+
+    def _count_steps(self):
+        self.steps += 1
+        return 0
+
+    def cursor(self, factory=_TracedCursor):
+        return super().cursor(factory)
+
+    # sqlite3 自带的 conn.execute 在内部建游标，不经过 _TracedCursor，这里改走 self.cursor() 才能计入统计
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+def set_sql_trace(enabled):
+    global _sql_trace
+    _sql_trace = enabled
+
+def record_phase(name, ms):  # 界面等非 SQL 阶段的耗时
+    with _stats_lock:
+        _add_sample(_phase_stats, name, ms)
+
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, (time.perf_counter() - started) * 1000)
+
+# 分布里第一个累计达到 fraction 的桶的上界，溢出桶返回最大耗时
+def _percentile(histogram, fraction, max_ms):
+    target, seen = fraction * sum(histogram), 0
+    for bound, count in zip(LATENCY_BUCKETS_MS + (max_ms,), histogram):
+        seen += count
+        if count and seen >= target:
+            return min(bound, max_ms)
+    return max_ms
+
+def _stats_rows(stats):
+    with _stats_lock:
+        items = [(key, list(entry)) for key, entry in stats.items()]
+    rows = [{'name': key, 'count': count, 'total_ms': total, 'mean_ms': total / count, 'max_ms': max_ms,
+             'p95_ms': _percentile(histogram, 0.95, max_ms), 'rows': rows, 'steps': steps,
+             'histogram': dict(zip([f'<={b}' for b in LATENCY_BUCKETS_MS] + ['>'], histogram))}
+            for key, (count, total, max_ms, rows, steps, histogram) in items]
+    return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+def query_stats():  # 按总耗时从高到低
+    return _stats_rows(_query_stats)
+
+def phase_stats():
+    return _stats_rows(_phase_stats)
+
+# 最慢的若干次执行，按耗时从高到低；查询计划在第一次查看时用当前线程的连接补上
+def slow_queries():
+    with _stats_lock:
+        records = [record for _, _, record in sorted(_slowest, reverse=True)]
+    conn = get_conn()
+    for record in records:
+        if record['plan'] is None:
+            if record['params'] is None or not _EXPLAINABLE.match(record['sql']):
+                record['plan'] = ''  # executemany 没有保留参数，建表等语句没有查询计划
+                continue
+            try:
+                plan = conn.execute('EXPLAIN QUERY PLAN ' + record['sql'], record['params']).fetchall()
+                depth = {0: -1}
+                lines = []
+                for node, parent, _, detail in plan:
+                    depth[node] = depth.get(parent, -1) + 1
+                    lines.append('  ' * depth[node] + detail)
+                record['plan'] = '\n'.join(lines)
+            except sqlite3.Error as e:
+                record['plan'] = f'（无法获取查询计划: {e}）'
+    return records
+
+def reset_stats():
+    with _stats_lock:
+        _query_stats.clear()
+        _phase_stats.clear()
+        _slowest.clear()
+
+def diagnostics_report(limit=20):  # 纯文本摘要，写日志或复制给别人看
+    lines = ['== SQL 统计（按总耗时）==']
+    lines += [f"{row['count']:>7} 次 {row['total_ms']:>10.1f} ms 平均 {row['mean_ms']:.2f} p95≤{row['p95_ms']:.1f} "
+              f"最大 {row['max_ms']:.1f} 行 {row['rows']}  {row['name']}" for row in query_stats()[:limit]]
+    lines.append('== 界面阶段 ==')
+    lines += [f"{row['count']:>7} 次 {row['total_ms']:>10.1f} ms 平均 {row['mean_ms']:.2f} 最大 {row['max_ms']:.1f}  {row['name']}"
+              for row in phase_stats()[:limit]]
+    lines.append('== 最慢的执行 ==')
+    for record in slow_queries():
+        lines.append(f"{record['ms']:.1f} ms，{record['rows']} 行，{record['time']}  {_sql_key(record['sql'])}  参数 {record['params']!r}")
+        lines += ['    ' + line for line in (record['plan'] or '').splitlines()]
+    return '\n'.join(lines)
+
+_local = threading.local()
+_connections = []  # 所有线程打开的长连接，关闭程序时统一释放
+_connections_lock = threading.Lock()
+_generation = 0  # close_db 之后递增，各线程据此丢弃已关闭的连接
+
+def _open_connection(path):
+    conn = sqlite3.connect(path, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False, factory=_TracedConnection)
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    conn.create_function('fts_tokens', 1, fts_tokens, deterministic=True)  # 全文索引触发器要用
+    conn.create_function('shuffle_key', 2, shuffle_key, deterministic=True)
+    conn.create_function('question_hash', 2, question_hash, deterministic=True)  # 迁移回填内容哈希要用
+    return conn
+
+# 返回当前线程的长连接，首次调用或 DB_PATH 变化时才真正打开
+# 用法与 sqlite3.connect 相同：with get_conn() as conn: 结束时提交或回滚，但不关闭连接
+def get_conn():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.generation == _generation and _local.path == DB_PATH:
+        return conn
+    if conn is not None:
+        _release(conn)
+    conn = _open_connection(DB_PATH)
+    _claim_replica(conn)
+    _local.conn = conn
+    _local.path = DB_PATH
+    _local.generation = _generation
+    with _connections_lock:
+        _connections.append(conn)
+    return conn
+
+# 复制出来的库第一次打开就换上自己的副本 ID，之后的修改不会记在原库名下；还没迁移出 replica.path 的库跳过
+def _claim_replica(conn):
+    try:
+        with conn:
+            _check_replica(conn.cursor())
+    except sqlite3.OperationalError:
+        pass
+
+def _release(conn):
+    with _connections_lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    try:
+        conn.execute('PRAGMA optimize')
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+def close_db():  # 关闭所有线程的长连接，程序退出时调用
+    global _generation
+    with _connections_lock:
+        conns = list(_connections)
+        _generation += 1
+    for conn in conns:
+        _release(conn)
+    _local.conn = None
+
+# 关键词全文索引：中文没有空格分词，写入前把连续的汉字切成重叠的二元组
+# 例如“排列组合”存成“排列 列组 组合 合”，末尾单字也收录，单字查询用前缀匹配即可命中
+# 触发器里调用 fts_tokens，所以只能通过 get_conn 打开的连接写这几张表
+FTS_COLUMNS = {
+    'questions': ('content', 'answer', 'analysis'),
+    'idioms': ('name', 'meaning', 'context', 'example'),
+    'essay_papers': ('content',),
+}
+_CJK_RUN = re.compile(r'([㐀-䶿一-鿿豈-﫿]+)')
+_WORD = re.compile(r'[^\W_]+')
+_fts_tables = {}  # (DB_PATH, 表名) -> 是否建了全文索引，迁移后清空
+
+def fts_tokens(text):
+    if not text:
+        return ''
+    parts = []
+    for i, part in enumerate(_CJK_RUN.split(str(text))):
+        if i % 2:  # split 带捕获组，奇数位是汉字片段
+            parts.extend(part[j:j + 2] for j in range(len(part) - 1))
+            parts.append(part[-1])
+        else:
+            parts.append(part)
+    return ' '.join(parts)
+
+# 把搜索框里的关键词转成 FTS5 查询：汉字片段转成二元组短语，其他词做前缀匹配，各部分之间是 AND
+def fts_query(keyword):
+    terms = []
+    for i, part in enumerate(_CJK_RUN.split(keyword)):
+        if i % 2:
+            if len(part) == 1:
+                terms.append(f'"{part}"*')
+            else:
+                terms.append('"' + ' '.join(part[j:j + 2] for j in range(len(part) - 1)) + '"')
+        else:
+            terms.extend(f'"{word}"*' for word in _WORD.findall(part))
+    return ' '.join(terms) or None
+
+def _create_fts(c):
+    for table, columns in FTS_COLUMNS.items():
+        fts = f'{table}_fts'
+        cols = ', '.join(columns)
+        tokens_new = ', '.join(f'fts_tokens(new.{col})' for col in columns)
+        tokens_row = ', '.join(f'fts_tokens({col})' for col in columns)
+        try:
+            c.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, tokenize='unicode61')")
+        except sqlite3.OperationalError:  # SQLite 未编译 FTS5，关键词搜索退回 LIKE
+            return
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                          INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {tokens_new});
+                      END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+                          UPDATE {fts} SET ({cols}) = ({tokens_new}) WHERE rowid = new.id;
+                      END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                          DELETE FROM {fts} WHERE rowid = old.id;
+                      END''')
+        c.execute(f'INSERT INTO {fts}(rowid, {cols}) SELECT id, {tokens_row} FROM {table}')
+
+# 迁移：全文索引加上一字、二字前缀索引，单字查询（"第"*）和两字前缀不用扫描整个词典
+# 旧索引里存的已经是切好的词，先倒到临时表再写回，不用对每行重新调用 fts_tokens；触发器按名字引用，重建后照常工作
+def _fts_prefix_index(c):
+    for table, columns in FTS_COLUMNS.items():
+        fts = f'{table}_fts'
+        if c.execute('SELECT 1 FROM sqlite_master WHERE name = ?', (fts,)).fetchone() is None:
+            continue  # SQLite 未编译 FTS5，一直走 LIKE
+        cols = ', '.join(columns)
+        c.execute(f'CREATE TEMP TABLE fts_rows AS SELECT rowid AS id, {cols} FROM {fts}')
+        c.execute(f'DROP TABLE {fts}')
+        c.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, tokenize='unicode61', prefix='1 2')")
+        c.execute(f'INSERT INTO {fts}(rowid, {cols}) SELECT id, {cols} FROM fts_rows')
+        c.execute('DROP TABLE fts_rows')
+
+def _has_fts(conn, table):
+    key = (DB_PATH, table)
+    if key not in _fts_tables:
+        row = conn.execute('SELECT 1 FROM sqlite_master WHERE name = ?', (f'{table}_fts',)).fetchone()
+        _fts_tables[key] = row is not None
+    return _fts_tables[key]
+
+# 建表语句，迁移 1 使用；已有数据库里表都已存在，IF NOT EXISTS 保证可重复执行
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS questions
                      (id INTEGER PRIMARY KEY AUTOINCREMENT,
                       module TEXT NOT NULL,
                       source TEXT NOT NULL,
@@ -21,8 +412,8 @@ def init_db():
                       question_type TEXT,
                       reviews INTEGER DEFAULT 0,
                       create_time DATETIME,
-                      entry_time DATETIME)''')  # 添加 entry_time 字段
-        c.execute('''CREATE TABLE IF NOT EXISTS idioms
+                      entry_time DATETIME)''',
+    '''CREATE TABLE IF NOT EXISTS idioms
                      (id INTEGER PRIMARY KEY AUTOINCREMENT,
                       category TEXT NOT NULL,
                       name TEXT NOT NULL UNIQUE,
@@ -31,8 +422,8 @@ def init_db():
                       collocation TEXT,
                       example TEXT,
                       create_time DATETIME,
-                      entry_time DATETIME)''')  # 添加 entry_time 字段
-        c.execute('''CREATE TABLE IF NOT EXISTS exam_papers
+                      entry_time DATETIME)''',
+    '''CREATE TABLE IF NOT EXISTS exam_papers
                      (id INTEGER PRIMARY KEY AUTOINCREMENT,
                       year INTEGER NOT NULL,
                       completion_date DATETIME NOT NULL,
@@ -58,8 +449,8 @@ def init_db():
                       total_correct INTEGER,
                       total_questions INTEGER,
                       score REAL,
-                      create_time DATETIME)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS essay_papers
+                      create_time DATETIME)''',
+    '''CREATE TABLE IF NOT EXISTS essay_papers
                      (id INTEGER PRIMARY KEY AUTOINCREMENT,
                       year INTEGER NOT NULL,
                       province TEXT NOT NULL,
@@ -68,147 +459,1742 @@ def init_db():
                       date DATETIME NOT NULL,
                       content TEXT NOT NULL,
                       completion_status TEXT NOT NULL,
-                      entry_time DATETIME)''')
+                      entry_time DATETIME)''',
+]
+
+# 回顾页筛选、排序用到的二级索引；单列索引隐含 id，可以同时满足 WHERE col = ? ORDER BY id
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_questions_module ON questions(module)',
+    'CREATE INDEX IF NOT EXISTS idx_questions_source ON questions(source)',
+    'CREATE INDEX IF NOT EXISTS idx_questions_question_type ON questions(question_type)',
+    'CREATE INDEX IF NOT EXISTS idx_questions_entry_time ON questions(entry_time)',
+    'CREATE INDEX IF NOT EXISTS idx_questions_reviews ON questions(reviews)',
+    'CREATE INDEX IF NOT EXISTS idx_questions_create_time ON questions(create_time)',
+    'CREATE INDEX IF NOT EXISTS idx_idioms_category ON idioms(category)',
+    'CREATE INDEX IF NOT EXISTS idx_idioms_create_time ON idioms(create_time)',
+    'CREATE INDEX IF NOT EXISTS idx_exam_papers_year ON exam_papers(year)',
+    'CREATE INDEX IF NOT EXISTS idx_exam_papers_completion_date ON exam_papers(completion_date)',
+    'CREATE INDEX IF NOT EXISTS idx_exam_papers_create_time ON exam_papers(create_time)',
+    'CREATE INDEX IF NOT EXISTS idx_essay_papers_year ON essay_papers(year)',
+    'CREATE INDEX IF NOT EXISTS idx_essay_papers_province ON essay_papers(province)',
+    'CREATE INDEX IF NOT EXISTS idx_essay_papers_question_type ON essay_papers(question_type)',
+    'CREATE INDEX IF NOT EXISTS idx_essay_papers_source ON essay_papers(source)',
+    'CREATE INDEX IF NOT EXISTS idx_essay_papers_date ON essay_papers(date)',
+    'CREATE INDEX IF NOT EXISTS idx_essay_papers_entry_time ON essay_papers(entry_time)',
+    'ANALYZE',
+]
+
+# 间隔复习（SM-2）：每道题记录难度系数、当前间隔天数、连续答对次数和下次到期时间
+# 已有题目按录入先后立即到期；到期队列按 due 索引取前 N 条
+SCHEDULER = [
+    'ALTER TABLE questions ADD COLUMN ease REAL NOT NULL DEFAULT 2.5',
+    'ALTER TABLE questions ADD COLUMN interval_days INTEGER NOT NULL DEFAULT 0',
+    'ALTER TABLE questions ADD COLUMN repetitions INTEGER NOT NULL DEFAULT 0',
+    'ALTER TABLE questions ADD COLUMN due DATETIME',
+    "UPDATE questions SET due = COALESCE(create_time, datetime('now', 'localtime'))",
+    'CREATE INDEX IF NOT EXISTS idx_questions_due ON questions(due)',
+]
+
+# 复习记录：每次复习一行，result 为 SM-2 评分（只标记复盘时为空），duration 为用时秒数
+REVIEW_EVENTS = [
+    '''CREATE TABLE IF NOT EXISTS review_events
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      question_id INTEGER NOT NULL,
+                      reviewed_at DATETIME NOT NULL,
+                      result INTEGER,
+                      duration REAL)''',
+    'CREATE INDEX IF NOT EXISTS idx_review_events_question ON review_events(question_id, reviewed_at)',
+    'CREATE INDEX IF NOT EXISTS idx_review_events_reviewed_at ON review_events(reviewed_at)',
+]
+
+# 题目查重：题干加答案归一化后的 64 位哈希，录入和导入时按索引查找，已有的重复题不强制合并，所以不建唯一索引
+_NOT_WORD = re.compile(r'[\W_]+')
+
+def question_hash(content, answer):
+    text = '\x1f'.join(_NOT_WORD.sub('', unicodedata.normalize('NFKC', value or '').casefold()) for value in (content, answer))
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+CONTENT_HASH = [
+    'ALTER TABLE questions ADD COLUMN content_hash INTEGER',
+    'UPDATE questions SET content_hash = question_hash(content, answer)',
+    'CREATE INDEX IF NOT EXISTS idx_questions_content_hash ON questions(content_hash)',
+]
+
+# 题目图片：文件按内容 SHA-256 存在数据库旁的 attachments 目录，表里只记引用，题目表和列表查询不受图片大小影响
+# 同一张图多次添加只存一份；删除题目时触发器清掉引用，文件由 _prune_attachment_files 在没有引用后删除
+ATTACHMENT_DIR = 'attachments'
+ATTACHMENT_EXTS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')
+ATTACHMENTS = [
+    '''CREATE TABLE IF NOT EXISTS attachments
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      question_id INTEGER NOT NULL,
+                      sha256 TEXT NOT NULL,
+                      name TEXT,
+                      ext TEXT NOT NULL,
+                      size INTEGER NOT NULL,
+                      create_time DATETIME)''',
+    'CREATE INDEX IF NOT EXISTS idx_attachments_question ON attachments(question_id, id)',
+    'CREATE INDEX IF NOT EXISTS idx_attachments_sha256 ON attachments(sha256)',
+    '''CREATE TRIGGER IF NOT EXISTS attachments_question_ad AFTER DELETE ON questions BEGIN
+           DELETE FROM attachments WHERE question_id = old.id;
+       END''',
+]
+
+# 变更日志：四张表的增删改由触发器记进 changes，每行只保留最近一次变更，seq 单调递增且不复用
+# 删除留下 op='delete' 的记录；导出“某个序号之后的变更”只需按 seq 索引扫描，代价与变更行数成正比
+# 套卷的模块明细改动都经过 update_exam_paper，会同时改到 exam_papers 本身，所以不单独给 exam_sections 建触发器
+CHANGE_TABLES = ('questions', 'idioms', 'exam_papers', 'essay_papers')
+
+def _create_change_log(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS changes
+                 (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                  table_name TEXT NOT NULL,
+                  row_id INTEGER NOT NULL,
+                  op TEXT NOT NULL,
+                  changed_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')))''')
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_changes_row ON changes(table_name, row_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_changes_table_seq ON changes(table_name, seq)')
+    # 增量导出和同步各自记下已经处理到的序号
+    c.execute('CREATE TABLE IF NOT EXISTS change_watermarks (name TEXT PRIMARY KEY, seq INTEGER NOT NULL)')
+    for table in CHANGE_TABLES:
+        for event, op, ref in (('INSERT', 'insert', 'new'), ('UPDATE', 'update', 'new'), ('DELETE', 'delete', 'old')):
+            c.execute(f'''CREATE TRIGGER IF NOT EXISTS changes_{table}_{op} AFTER {event} ON {table} BEGIN
+                              DELETE FROM changes WHERE table_name = '{table}' AND row_id = {ref}.id;
+                              INSERT INTO changes (table_name, row_id, op) VALUES ('{table}', {ref}.id, '{op}');
+                          END''')
+        # 已有数据记作一次插入，从序号 0 开始的增量导出就等于一次完整导出
+        c.execute(f"INSERT INTO changes (table_name, row_id, op) SELECT '{table}', id, 'insert' FROM {table} ORDER BY id")
+
+# 同步：每行有跨库不变的 uid，变更日志记下 uid、版本戳 stamp 和产生变更的副本 origin，删除留下墓碑
+# stamp 是微秒时间戳，但不小于本库见过的最大戳加一，所以本机的新修改总排在已同步来的修改之后
+# 已有行的 uid 由表名、行号和创建时间算出：同一个库复制出的两份得到相同的 uid，各自录入的行不会撞上
+SYNC_KEY_COLUMNS = {
+    'questions': 'create_time',
+    'idioms': 'create_time',
+    'exam_papers': 'create_time',
+    'essay_papers': 'entry_time, date',  # 申论没有创建时间
+}
+_CHANGE_STAMP = ("MAX(CAST((julianday('now') - 2440587.5) * 86400000000 AS INTEGER), "
+                 "COALESCE((SELECT MAX(stamp) FROM changes), 0) + 1)")
+
+def _sync_key(table, *values):
+    return hashlib.blake2b(repr((table,) + values).encode('utf-8'), digest_size=16).hexdigest()
+
+def _change_triggers(c, table):
+    new_uid = f'(SELECT uid FROM {table} WHERE id = new.id)'
+    values = f"'{table}', {{ref}}.id, {{uid}}, '{{op}}', {_CHANGE_STAMP}, (SELECT id FROM replica)"
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS changes_{table}_insert AFTER INSERT ON {table} BEGIN
+                      UPDATE {table} SET uid = lower(hex(randomblob(16))) WHERE id = new.id AND uid IS NULL;
+                      DELETE FROM changes WHERE table_name = '{table}' AND row_id = new.id;
+                      DELETE FROM changes WHERE table_name = '{table}' AND uid = {new_uid};
+                      INSERT INTO changes (table_name, row_id, uid, op, stamp, origin)
+                      VALUES ({values.format(ref='new', uid=new_uid, op='insert')});
+                  END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS changes_{table}_update AFTER UPDATE ON {table} WHEN old.uid IS NOT NULL BEGIN
+                      DELETE FROM changes WHERE table_name = '{table}' AND row_id = new.id;
+                      DELETE FROM changes WHERE table_name = '{table}' AND uid = new.uid;
+                      INSERT INTO changes (table_name, row_id, uid, op, stamp, origin)
+                      VALUES ({values.format(ref='new', uid='new.uid', op='update')});
+                  END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS changes_{table}_delete AFTER DELETE ON {table} BEGIN
+                      DELETE FROM changes WHERE table_name = '{table}' AND row_id = old.id;
+                      DELETE FROM changes WHERE table_name = '{table}' AND uid = old.uid;
+                      INSERT INTO changes (table_name, row_id, uid, op, stamp, origin)
+                      VALUES ({values.format(ref='old', uid='old.uid', op='delete')});
+                  END''')
+
+def _create_sync(c):
+    c.execute('CREATE TABLE IF NOT EXISTS replica (id TEXT NOT NULL)')  # 本库的副本 ID，只有一行
+    c.execute('INSERT INTO replica (id) SELECT lower(hex(randomblob(8))) WHERE NOT EXISTS (SELECT 1 FROM replica)')
+    for table in CHANGE_TABLES:
+        for op in ('insert', 'update', 'delete'):
+            c.execute(f'DROP TRIGGER IF EXISTS changes_{table}_{op}')
+        c.execute(f'ALTER TABLE {table} ADD COLUMN uid TEXT')
+        rows = c.execute(f'SELECT id, {SYNC_KEY_COLUMNS[table]} FROM {table}').fetchall()
+        c.executemany(f'UPDATE {table} SET uid = ? WHERE id = ?', [(_sync_key(table, *row), row[0]) for row in rows])
+        c.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_uid ON {table}(uid)')
+    # 对方删除了本机从没有过的行时只留墓碑，没有本机行号，所以 row_id 改为可空，重建变更日志
+    c.execute('''CREATE TABLE changes_new
+                 (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                  table_name TEXT NOT NULL,
+                  row_id INTEGER,
+                  uid TEXT,
+                  op TEXT NOT NULL,
+                  changed_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+                  stamp INTEGER NOT NULL DEFAULT 0,
+                  origin TEXT NOT NULL DEFAULT '')''')
+    c.execute('''INSERT INTO changes_new (seq, table_name, row_id, op, changed_at)
+                 SELECT seq, table_name, row_id, op, changed_at FROM changes ORDER BY seq''')
+    c.execute('DROP TABLE changes')
+    c.execute('ALTER TABLE changes_new RENAME TO changes')
+    for table in CHANGE_TABLES:  # 迁移前的墓碑找不到 uid，只留给增量导出用
+        c.execute(f"UPDATE changes SET uid = (SELECT uid FROM {table} WHERE id = changes.row_id) "
+                  f"WHERE table_name = '{table}' AND op != 'delete'")
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_changes_row ON changes(table_name, row_id)')
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_changes_uid ON changes(table_name, uid)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_changes_table_seq ON changes(table_name, seq)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_changes_stamp ON changes(stamp)')
+    for table in CHANGE_TABLES:
+        _change_triggers(c, table)
+    # 新行由触发器补上 uid 时会再改一次 exam_papers，合计统计只在影响统计的列变化时才重算
+    c.execute('DROP TRIGGER IF EXISTS exam_papers_stats_au')
+    c.execute(f"CREATE TRIGGER exam_papers_stats_au AFTER UPDATE OF year, completion_date, total_correct, total_questions ON exam_papers BEGIN "
+              f"{_EXAM_STATS_REMOVE.format(rows=_exam_stat_rows(_total_stat_base('old')))} "
+              f"{_EXAM_STATS_ADD.format(rows=_exam_stat_rows(_total_stat_base('new')))} END")
+
+# 副本 ID 存在库文件里，复制出来的库带着同一个 ID；记下库文件的路径，路径对不上时由 _check_replica 换新 ID
+# replica_knowledge 记录本库已经包含了各副本（origin）的哪些版本：该副本写出的版本戳不超过 stamp 的都见过
+def _bind_replica(c):
+    c.execute('ALTER TABLE replica ADD COLUMN path TEXT')
+    c.execute('CREATE TABLE IF NOT EXISTS replica_knowledge (origin TEXT PRIMARY KEY, stamp INTEGER NOT NULL)')
+    _refresh_knowledge(c)
+
+# 行测套卷的题型模块：(名称, 显示名)，按此顺序显示和导入导出；每套卷每个模块在 exam_sections 里一行，
+# 新增模块只需在这里追加，不用改表结构
+EXAM_SECTIONS = [
+    ('politics', '政治'),
+    ('general_knowledge', '常识'),
+    ('logic', '逻辑'),
+    ('fragment', '片段'),
+    ('quantitative', '数量关系'),
+    ('graphic_reasoning', '图推'),
+    ('definition', '定义'),
+    ('analogy', '类比'),
+    ('data_analysis', '资料分析'),
+]
+# 统计里整套卷的合计记作 'total'，取自套卷的总题量和总正确数
+EXAM_TOTAL_SECTION = ('total', '总计')
+EXAM_STAT_SECTIONS = EXAM_SECTIONS + [EXAM_TOTAL_SECTION]
+
+# 迁移 7、8 执行时 exam_papers 还是宽表，按这张固定的对照表读旧列：(名称, 总题数列, 正确数列)
+_WIDE_EXAM_COLUMNS = [(name, f'{name}_total', f'{name}_correct') for name in (
+    'politics', 'general_knowledge', 'logic', 'fragment', 'quantitative',
+    'graphic_reasoning', 'definition', 'analogy', 'data_analysis')] + [('total', 'total_questions', 'total_correct')]
+
+# 统计口径：全部、按年、按月（完成日期 yyyy-MM-dd 的前 7 位）
+EXAM_STAT_PERIODS = {
+    'all': "''",
+    'year': 'CAST(s.year AS TEXT)',
+    'month': 'substr(s.completion_date, 1, 7)',
+}
+
+# 把 base 查询给出的 (section, year, completion_date, total, correct) 展开到每个统计周期，
+# 得到 (section, period_type, period, total, correct)
+def _exam_stat_rows(base):
+    periods = ' UNION ALL '.join(f"SELECT '{key}' AS period_type" for key in EXAM_STAT_PERIODS)
+    period = 'CASE t.period_type ' + ' '.join(f"WHEN '{key}' THEN {expr}" for key, expr in EXAM_STAT_PERIODS.items()) + ' END'
+    return (f'SELECT s.section AS section, t.period_type AS period_type, {period} AS period, s.total AS total, s.correct AS correct '
+            f'FROM ({base}) AS s CROSS JOIN ({periods}) AS t')
+
+# 宽表时期的一套卷拆成每个模块一行，p 是 new/old 或 FROM 子句里的别名
+def _wide_exam_rows(p, source=''):
+    return ' UNION ALL '.join(
+        f"SELECT '{name}' AS section, {p}.year AS year, {p}.completion_date AS completion_date, "
+        f"COALESCE({p}.{total}, 0) AS total, COALESCE({p}.{correct}, 0) AS correct {source}"
+        for name, total, correct in _WIDE_EXAM_COLUMNS)
+
+_EXAM_STATS_ADD = '''INSERT INTO exam_stats (section, period_type, period, papers, total, correct)
+                     SELECT section, period_type, period, 1, total, correct FROM ({rows}) WHERE true
+                     ON CONFLICT (section, period_type, period) DO UPDATE
+                     SET papers = papers + 1, total = total + excluded.total, correct = correct + excluded.correct;'''
+_EXAM_STATS_REMOVE = '''UPDATE exam_stats SET papers = exam_stats.papers - 1, total = exam_stats.total - d.total, correct = exam_stats.correct - d.correct
+                        FROM ({rows}) AS d
+                        WHERE exam_stats.section = d.section AND exam_stats.period_type = d.period_type AND exam_stats.period = d.period;
+                        DELETE FROM exam_stats WHERE papers <= 0;'''
+
+# 套卷统计汇总表：每个模块在每个统计周期内的套数、总题数、正确数，由触发器随 exam_papers 的增删改维护
+# 统计页直接读汇总表，不再逐套卷重新计算
+def _create_exam_stats(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS exam_stats
+                     (section TEXT NOT NULL,
+                      period_type TEXT NOT NULL,
+                      period TEXT NOT NULL,
+                      papers INTEGER NOT NULL,
+                      total INTEGER NOT NULL,
+                      correct INTEGER NOT NULL,
+                      PRIMARY KEY (section, period_type, period)) WITHOUT ROWID''')
+    add = _EXAM_STATS_ADD.format(rows=_exam_stat_rows(_wide_exam_rows('new')))
+    remove = _EXAM_STATS_REMOVE.format(rows=_exam_stat_rows(_wide_exam_rows('old')))
+    c.execute(f'CREATE TRIGGER IF NOT EXISTS exam_stats_ai AFTER INSERT ON exam_papers BEGIN {add} END')
+    c.execute(f'CREATE TRIGGER IF NOT EXISTS exam_stats_ad AFTER DELETE ON exam_papers BEGIN {remove} END')
+    c.execute(f'CREATE TRIGGER IF NOT EXISTS exam_stats_au AFTER UPDATE ON exam_papers BEGIN {remove} {add} END')
+    c.execute('DELETE FROM exam_stats')
+    c.execute(f'''INSERT INTO exam_stats (section, period_type, period, papers, total, correct)
+                  SELECT section, period_type, period, COUNT(*), SUM(total), SUM(correct)
+                  FROM ({_exam_stat_rows(_wide_exam_rows('e', 'FROM exam_papers AS e'))})
+                  GROUP BY section, period_type, period''')
+
+# exam_sections 的一行（r 为 new/old）连同所属套卷的年份和完成日期
+def _section_stat_base(r):
+    return (f'SELECT {r}.section AS section, p.year AS year, p.completion_date AS completion_date, '
+            f'{r}.total AS total, {r}.correct AS correct FROM exam_papers AS p WHERE p.id = {r}.paper_id')
+
+# 套卷的合计行；source 为空时 p 是 new/old
+def _total_stat_base(p, source=''):
+    return (f"SELECT 'total' AS section, {p}.year AS year, {p}.completion_date AS completion_date, "
+            f'COALESCE({p}.total_questions, 0) AS total, COALESCE({p}.total_correct, 0) AS correct {source}')
+
+# 套卷的所有模块行，按 p（new/old）的年份和完成日期归入统计周期
+def _paper_sections_stat_base(p):
+    return (f'SELECT x.section AS section, {p}.year AS year, {p}.completion_date AS completion_date, '
+            f'x.total AS total, x.correct AS correct FROM exam_sections AS x WHERE x.paper_id = new.id')
+
+# 宽表拆成 exam_papers（每套卷一行）和 exam_sections（每套卷每个模块一行），统计触发器改挂到两张表上
+# 删除套卷前先删它的模块行，模块行的触发器还能查到套卷所属的统计周期
+def _normalize_exam_papers(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS exam_sections
+                     (paper_id INTEGER NOT NULL,
+                      section TEXT NOT NULL,
+                      total INTEGER NOT NULL DEFAULT 0,
+                      correct INTEGER NOT NULL DEFAULT 0,
+                      PRIMARY KEY (paper_id, section)) WITHOUT ROWID''')
+    c.execute('INSERT INTO exam_sections (paper_id, section, total, correct) ' + ' UNION ALL '.join(
+        f"SELECT id, '{name}', COALESCE({total}, 0), COALESCE({correct}, 0) FROM exam_papers"
+        for name, total, correct in _WIDE_EXAM_COLUMNS if name != 'total'))
+    seq = c.execute("SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'exam_papers'), 0), "
+                    "COALESCE((SELECT MAX(id) FROM exam_papers), 0))").fetchone()[0]
+    c.execute('''CREATE TABLE exam_papers_new
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      year INTEGER NOT NULL,
+                      completion_date DATETIME NOT NULL,
+                      paper_name TEXT NOT NULL,
+                      total_correct INTEGER,
+                      total_questions INTEGER,
+                      score REAL,
+                      create_time DATETIME)''')
+    c.execute('''INSERT INTO exam_papers_new (id, year, completion_date, paper_name, total_correct, total_questions, score, create_time)
+                 SELECT id, year, completion_date, paper_name, total_correct, total_questions, score, create_time FROM exam_papers''')
+    c.execute('DROP TABLE exam_papers')  # 旧的索引和统计触发器随表删除
+    c.execute('ALTER TABLE exam_papers_new RENAME TO exam_papers')
+    c.execute("DELETE FROM sqlite_sequence WHERE name = 'exam_papers'")  # 保留自增计数，删掉的编号不再复用
+    c.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('exam_papers', ?)", (seq,))
+    c.execute('CREATE INDEX IF NOT EXISTS idx_exam_papers_year ON exam_papers(year)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_exam_papers_completion_date ON exam_papers(completion_date)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_exam_papers_create_time ON exam_papers(create_time)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_exam_sections_section ON exam_sections(section, total, correct)')
+
+    def add(base):
+        return _EXAM_STATS_ADD.format(rows=_exam_stat_rows(base))
+
+    def remove(base):
+        return _EXAM_STATS_REMOVE.format(rows=_exam_stat_rows(base))
+
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS exam_sections_stats_ai AFTER INSERT ON exam_sections BEGIN {add(_section_stat_base('new'))} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS exam_sections_stats_ad AFTER DELETE ON exam_sections BEGIN {remove(_section_stat_base('old'))} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS exam_sections_stats_au AFTER UPDATE ON exam_sections BEGIN "
+              f"{remove(_section_stat_base('old'))} {add(_section_stat_base('new'))} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS exam_papers_stats_ai AFTER INSERT ON exam_papers BEGIN {add(_total_stat_base('new'))} END")
+    c.execute('CREATE TRIGGER IF NOT EXISTS exam_papers_sections_bd BEFORE DELETE ON exam_papers BEGIN '
+              'DELETE FROM exam_sections WHERE paper_id = old.id; END')
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS exam_papers_stats_ad AFTER DELETE ON exam_papers BEGIN {remove(_total_stat_base('old'))} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS exam_papers_stats_au AFTER UPDATE ON exam_papers BEGIN "
+              f"{remove(_total_stat_base('old'))} {add(_total_stat_base('new'))} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS exam_papers_period_au AFTER UPDATE OF year, completion_date ON exam_papers "
+              f"WHEN old.year IS NOT new.year OR old.completion_date IS NOT new.completion_date BEGIN "
+              f"{remove(_paper_sections_stat_base('old'))} {add(_paper_sections_stat_base('new'))} END")
+    c.execute('DELETE FROM exam_stats')
+    sections = ('SELECT x.section AS section, p.year AS year, p.completion_date AS completion_date, x.total AS total, x.correct AS correct '
+                'FROM exam_sections AS x JOIN exam_papers AS p ON p.id = x.paper_id UNION ALL '
+                + _total_stat_base('p', 'FROM exam_papers AS p'))
+    c.execute(f'''INSERT INTO exam_stats (section, period_type, period, papers, total, correct)
+                  SELECT section, period_type, period, COUNT(*), SUM(total), SUM(correct)
+                  FROM ({_exam_stat_rows(sections)})
+                  GROUP BY section, period_type, period''')
+
+# 回顾页和导出仍按宽表的列顺序展示：每个模块用主键查 exam_sections 取总数和正确数
+EXAM_WIDE_COLUMNS = ('id, year, completion_date, paper_name, ' + ', '.join(
+    f"(SELECT {field} FROM exam_sections WHERE paper_id = exam_papers.id AND section = '{name}') AS {name}_{field}"
+    for name, _ in EXAM_SECTIONS for field in ('total', 'correct')) + ', total_correct, total_questions, score')
+
+# 按 PRAGMA user_version 依次执行的迁移：第 n 项把库从版本 n 升级到 n+1
+# 每一项可以是 SQL 列表，也可以是接收游标的函数；只允许追加，不要修改已发布的项
+MIGRATIONS = [
+    SCHEMA,
+    INDEXES,
+    _create_fts,
+    SCHEDULER,
+    REVIEW_EVENTS,
+    _create_exam_stats,
+    _normalize_exam_papers,
+    CONTENT_HASH,
+    ATTACHMENTS,
+    _create_change_log,
+    _create_sync,
+    _bind_replica,
+    _fts_prefix_index,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+# 在一个事务里把数据库升级到最新版本，任何一步失败都整体回滚，库保持原版本
+def migrate(conn):
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return
+    conn.execute('BEGIN IMMEDIATE')  # 先拿写锁，避免两个进程同时迁移
+    try:
+        c = conn.cursor()
+        version = get_schema_version(conn)
+        for step in MIGRATIONS[version:]:
+            if callable(step):
+                step(c)
+            else:
+                for sql in step:
+                    c.execute(sql)
+        c.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        c.execute('ANALYZE')  # 迁移可能重建了表和索引，统计信息按现在的数据量重新收集
         conn.commit()
+        _fts_tables.clear()
+    except Exception:
+        conn.rollback()
+        raise
+
+def init_db():
+    conn = get_conn()
+    migrate(conn)
+    _claim_replica(conn)  # 刚迁移出 replica.path 的库
+
+# 记录类型：按列顺序存值的元组子类（namedtuple 的 __slots__ 为空），每行不比普通元组多占内存
+# 既能 row[0] 按位置读，也能 row.name 按列名读；由游标的 row_factory 从查询结果直接构造，不用 fetchall 之后再转一遍
+# intern 的列是取值很少的分类列（模块、来源、日期……）：sqlite3 每个单元格都新建一个字符串，
+# 构造时用 sys.intern 换成共用的对象，几万行同一个来源只占一份内存，比较时也先比对象身份
+def _record_type(name, fields, intern=''):
+    cls = namedtuple(name, fields)
+    positions = [cls._fields.index(field) for field in intern.split()]
+    new = tuple.__new__
+    if positions:
+        def factory(cursor, row):
+            row = list(row)
+            for i in positions:
+                if row[i].__class__ is str:
+                    row[i] = sys.intern(row[i])
+            return new(cls, row)
+    else:
+        def factory(cursor, row):
+            return new(cls, row)
+    cls.row_factory = staticmethod(factory)
+    return cls
+
+# 回顾页列表的行，列与 QUERY_SPECS 的 columns 一一对应，长文本列只是预览；get_all_* 用同样的类型返回完整内容
+QuestionRow = _record_type('QuestionRow', 'id module source content answer reviews question_type entry_time',
+                           'module source question_type entry_time')
+IdiomRow = _record_type('IdiomRow', 'id category name meaning context collocation example entry_time', 'category entry_time')
+ExamPaperRow = _record_type('ExamPaperRow', 'id year completion_date paper_name ' + ' '.join(
+    f'{name}_{field}' for name, _ in EXAM_SECTIONS for field in ('total', 'correct')) + ' total_correct total_questions score',
+    'completion_date')
+EssayRow = _record_type('EssayRow', 'id year province question_type source date content completion_status entry_time',
+                        'province question_type source date completion_status entry_time')
+# 详情和编辑对话框读的完整记录（get_question 等），不含 id
+Question = _record_type('Question', 'module source content answer analysis question_type entry_time')
+Idiom = _record_type('Idiom', 'category name meaning context collocation example entry_time')
+ExamPaper = _record_type('ExamPaper', 'year completion_date paper_name total_correct total_questions score')
+EssayPaper = _record_type('EssayPaper', 'year province question_type source date content completion_status entry_time')
+
+# 回顾页查询：筛选、排序、分页都在 SQL 里完成，界面只拿到要显示的行
+# columns: 返回给界面的列，record 是对应的行类型；filters: 允许精确匹配的列；keyword: 没有全文索引时用 LIKE 匹配的文本列
+# orders: 排序方式，另有 'rank' 表示按关键词相关度排序，没有关键词时退回 default
+# 长文本列只取前 PREVIEW_CHARS 个字用于列表显示，完整内容由 get_question 等在详情/编辑对话框里读取
+PREVIEW_CHARS = 100
+QUERY_SPECS = {
+    'questions': {
+        'columns': f'id, module, source, substr(content, 1, {PREVIEW_CHARS}), answer, reviews, question_type, entry_time',
+        'record': QuestionRow,
+        'filters': ('id', 'module', 'source', 'question_type', 'entry_time', 'reviews'),
+        'keyword': ('content', 'answer', 'analysis'),
+        'orders': {'asc': 'id ASC', 'desc': 'id DESC', 'newest': 'create_time DESC'},
+        'default': 'asc',
+    },
+    'idioms': {
+        'columns': f'id, category, name, substr(meaning, 1, {PREVIEW_CHARS}), substr(context, 1, {PREVIEW_CHARS}), substr(collocation, 1, {PREVIEW_CHARS}), substr(example, 1, {PREVIEW_CHARS}), entry_time',
+        'record': IdiomRow,
+        'filters': ('id', 'category'),
+        'keyword': ('name', 'meaning', 'context', 'example'),
+        'orders': {'asc': 'id ASC', 'desc': 'id DESC', 'newest': 'create_time DESC'},
+        'default': 'newest',
+    },
+    'exam_papers': {
+        'columns': EXAM_WIDE_COLUMNS,
+        'record': ExamPaperRow,
+        'filters': ('id', 'year', 'completion_date'),
+        'keyword': ('paper_name',),
+        'orders': {'asc': 'id ASC', 'desc': 'id DESC', 'newest': 'create_time DESC'},
+        'default': 'newest',
+    },
+    'essay_papers': {
+        'columns': f'id, year, province, question_type, source, date, substr(content, 1, {PREVIEW_CHARS}), completion_status, entry_time',
+        'record': EssayRow,
+        'filters': ('id', 'year', 'province', 'question_type', 'source', 'date'),
+        'keyword': ('content',),
+        'orders': {'asc': 'id ASC', 'desc': 'id DESC', 'newest': 'entry_time DESC'},
+        'default': 'newest',
+    },
+}
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# 根据筛选条件拼出 FROM 和参数化的 WHERE 子句；值为 None 或空字符串的条件视为“全部”
+# 有关键词且建了全文索引时连接 FTS5 的命中结果，返回值第三项表示能否按相关度排序
+# 给了 page=(limit, offset) 且只有关键词条件、排序能在全文索引里完成时，排序和分页放进全文索引的子查询，
+# 只有这一页的命中回表；第四项表示分页已经做了
+_FTS_ORDERS = {'rank': 'rank', 'asc': 'rowid', 'desc': 'rowid DESC'}
+
+def _filter_clauses(table, filters):
+    clauses, params = [], []
+    for col in QUERY_SPECS[table]['filters']:
+        value = filters.get(col)
+        if value is not None and value != '':
+            clauses.append(f'{col} = ?')
+            params.append(value)
+    return clauses, params
+
+def _build_from(conn, table, filters, order=None, page=None):
+    spec = QUERY_SPECS[table]
+    filters = filters or {}
+    keyword = (filters.get('keyword') or '').strip()
+    clauses, params = _filter_clauses(table, filters)
+    if keyword and table in FTS_COLUMNS and _has_fts(conn, table):
+        match = fts_query(keyword)
+        keyword = ''
+        if match:
+            hits = f'SELECT rowid AS hit_id, rank AS hit_rank FROM {table}_fts WHERE {table}_fts MATCH ?'
+            paged = page is not None and not clauses and order in _FTS_ORDERS
+            if paged:
+                hits += f' ORDER BY {_FTS_ORDERS[order]} LIMIT ? OFFSET ?'
+            # CROSS JOIN 固定先查全文索引，再按主键回表
+            source = f'({hits}) CROSS JOIN {table} ON {table}.id = hit_id'
+            params = [match] + ([-1 if page[0] is None else page[0], page[1]] if paged else []) + params
+            return source + (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params, True, paged
+    if keyword:
+        pattern = f'%{_escape_like(keyword)}%'
+        clauses.append('(' + ' OR '.join(f"{col} LIKE ? ESCAPE '\\'" for col in spec['keyword']) + ')')
+        params.extend([pattern] * len(spec['keyword']))
+    return table + (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params, False, False
+
+# 随机顺序按 shuffle_key(id, seed) 排序：同一个 seed 下顺序固定，分页不会重复或漏行
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+def shuffle_key(rowid, seed):  # splitmix64 混洗，结果限制在 SQLite 的有符号 64 位整数范围内
+    x = (rowid * 0x9E3779B97F4A7C15 + seed) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return (x ^ (x >> 31)) >> 1
+
+# 排好的随机顺序按 (库, 表, 筛选, seed) 缓存，翻页时只按主键取这一页，不用每页都对全部结果算 shuffle_key 再排序
+# 表的最大变更序号变了（有写入）就重新排；id 存成 array，10 万行不到 1 MB
+SHUFFLE_CACHE_SIZE = 4
+_shuffle_orders = OrderedDict()
+_shuffle_lock = threading.Lock()
+
+def _shuffled_ids(conn, table, source, params, seed):
+    version = conn.execute('SELECT MAX(seq) FROM changes WHERE table_name = ?', (table,)).fetchone()[0]
+    key = (DB_PATH, table, source, tuple(params), seed)
+    with _shuffle_lock:
+        cached = _shuffle_orders.get(key)
+        if cached is not None and cached[0] == version:
+            _shuffle_orders.move_to_end(key)
+            return cached[1]
+    c = conn.cursor()
+    c.execute(f'SELECT {table}.id FROM {source}', params)
+    ids = [row[0] for row in c.fetchall()]
+    ids.sort(key=lambda rowid: shuffle_key(rowid, seed))  # 在 Python 里排，省掉 SQLite 回调 UDF 的开销
+    ids = array('q', ids)
+    with _shuffle_lock:
+        _shuffle_orders[key] = (version, ids)
+        _shuffle_orders.move_to_end(key)
+        while len(_shuffle_orders) > SHUFFLE_CACHE_SIZE:
+            _shuffle_orders.popitem(last=False)
+    return ids
+
+def _query(table, filters, order, limit, offset, seed=None):
+    spec = QUERY_SPECS[table]
+    with get_conn() as conn:
+        page = (limit, offset) if limit is not None or offset else None
+        source, params, ranked, paged = _build_from(conn, table, filters, order, page)
+        if order == 'random':
+            ids = _shuffled_ids(conn, table, source, params, int(seed or 0))
+            ids = ids[offset or 0:None if limit is None else (offset or 0) + limit]
+            c = conn.cursor()
+            c.row_factory = spec['record'].row_factory
+            rows = {}
+            for start in range(0, len(ids), SAMPLE_BATCH):
+                chunk = ids[start:start + SAMPLE_BATCH]
+                c.execute(f"SELECT {spec['columns']} FROM {table} WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+                rows.update((row[0], row) for row in c.fetchall())
+            return [rows[qid] for qid in ids if qid in rows]  # 按排好的顺序返回
+        if order == 'rank':
+            order_by = 'hit_rank' if ranked else spec['orders'][spec['default']]
+        else:
+            order_by = spec['orders'][order]
+        sql = f"SELECT {spec['columns']} FROM {source} ORDER BY {order_by}"
+        if page is not None and not paged:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [-1 if limit is None else limit, offset]
+        c = conn.cursor()
+        c.row_factory = spec['record'].row_factory
+        c.execute(sql, params)
+        return c.fetchall()
+
+def _count(table, filters):
+    with get_conn() as conn:
+        source, params, _, _ = _build_from(conn, table, filters)
+        c = conn.cursor()
+        c.execute(f'SELECT COUNT(*) FROM {source}', params)
+        return c.fetchone()[0]
+
+# 数据变更通知：写操作提交后按 (table, op, id) 通知订阅者，回顾页据此只更新受影响的那一行
+# op 为 'insert' / 'update' / 'delete'；批量导入等无法逐行通知的操作发送 'reset'，id 为 None
+# 回调在执行写操作的线程里同步调用，界面需要自己转回 GUI 线程
+ChangeEvent = namedtuple('ChangeEvent', 'table op id')
+_listeners = []
+
+def subscribe(listener):
+    _listeners.append(listener)
+
+def unsubscribe(listener):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+def _notify(table, op, row_id=None):
+    event = ChangeEvent(table, op, row_id)
+    for listener in list(_listeners):
+        listener(event)
+
+# CSV 批量导入：列顺序与导出文件一致，第 0 列是原 ID，导入时重新编号
+# 每张表给出写入的列、对应 CSV 列的类型转换，以及统一取导入开始时间的列（create_time，题目还有到期时间 due）
+IMPORT_SPECS = {
+    'questions': ('module, source, content, answer, analysis, question_type, entry_time', (str,) * 7, ('create_time', 'due')),
+    'idioms': ('category, name, meaning, context, collocation, example, entry_time', (str,) * 7, ('create_time',)),
+    'exam_papers': ('year, completion_date, paper_name, total_correct, total_questions, score',  # 各模块见 _exam_import_rows
+                    (int, str, str) + (int,) * (2 * len(EXAM_SECTIONS) + 2) + (float,), ('create_time',)),
+    'essay_papers': ('year, province, question_type, source, date, content, completion_status, entry_time', (int,) + (str,) * 7, ()),
+}
+IMPORT_CHUNK_SIZE = 500
+ImportResult = namedtuple('ImportResult', 'imported skipped')  # skipped: 与库里或文件前文重复而跳过的行数
+
+class TransferCancelled(Exception):  # 导入导出被取消
+    pass
+
+class ImportRowError(Exception):
+    def __init__(self, line, message):
+        super().__init__(f'第 {line} 行: {message}')
+        self.line = line
+
+# 按行读取二进制文件并记录已读字节数，进度按文件大小计算，不用先数一遍行数
+def _read_lines(file, counter):
+    for i, line in enumerate(file):
+        counter[0] += len(line)
+        yield line.decode('utf-8-sig' if i == 0 else 'utf-8')
+
+# 整个文件在一个事务里写入：每块 IMPORT_CHUNK_SIZE 行用一次 executemany
+# 出错时定位到具体行号并整体回滚，已导入的部分不会留在库里；取消同样回滚
+# progress(已导入行数, 0~1 的进度) 每块调用一次，cancelled() 返回 True 时中止
+def import_csv(table, path, progress=None, cancelled=None, chunk_size=IMPORT_CHUNK_SIZE):
+    columns, converters, stamped = IMPORT_SPECS[table]
+    width = len(converters)
+    columns = ', '.join((columns,) + stamped)
+    sql = f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' * len(columns.split(',')))})"
+    expand = _IMPORT_EXPANDERS.get(table, lambda c, chunk: [(sql, chunk)])
+    now = datetime.now()
+    total_bytes = os.path.getsize(path) or 1
+    read = [0]
+    imported = rows = 0
+    with open(path, 'rb') as file, get_conn() as conn:
+        c = conn.cursor()
+        c.execute('BEGIN IMMEDIATE')
+        reader = csv.reader(_read_lines(file, read))
+        next(reader, None)  # 跳过表头
+        while True:
+            chunk, lines = [], []
+            for row in reader:
+                if not any(row):  # 空行
+                    continue
+                try:
+                    values = [convert(value) for convert, value in zip(converters, row[1:width + 1])]
+                except ValueError as e:
+                    raise ImportRowError(reader.line_num, e)
+                if len(values) < width:
+                    raise ImportRowError(reader.line_num, f'列数不足，需要 {width + 1} 列')
+                values.extend([now] * len(stamped))
+                chunk.append(values)
+                lines.append(reader.line_num)
+                if len(chunk) >= chunk_size:
+                    break
+            if not chunk:
+                break
+            if cancelled is not None and cancelled():
+                raise TransferCancelled()
+            imported += _insert_chunk(c, expand, chunk, lines)
+            rows += len(chunk)
+            if progress is not None:
+                progress(imported, min(read[0] / total_bytes, 1.0))
+    if imported:
+        with get_conn() as conn:
+            conn.execute('ANALYZE')  # 批量导入后表的规模变了，重新收集统计信息，优化器才不会按导入前的行数选索引
+    _notify(table, 'reset')
+    return ImportResult(imported, rows - imported)
+
+# expand(c, chunk) 返回要执行的 [(sql, 行列表)]，第一条语句的行数计为导入条数
+# executemany 失败时回到块开始的保存点，逐行重试找出出错的那一行
+def _insert_chunk(c, expand, chunk, lines):
+    c.execute('SAVEPOINT import_chunk')
+    try:
+        statements = expand(c, chunk)
+        for sql, rows in statements:
+            c.executemany(sql, rows)
+    except sqlite3.DatabaseError as e:
+        if isinstance(e, sqlite3.OperationalError):  # 被中断或数据库被锁，不是数据问题
+            raise
+        c.execute('ROLLBACK TO import_chunk')
+        for values, line in zip(chunk, lines):
+            try:
+                for sql, rows in expand(c, [values]):
+                    c.executemany(sql, rows)
+            except sqlite3.DatabaseError as row_error:
+                raise ImportRowError(line, row_error)
+        raise
+    c.execute('RELEASE import_chunk')
+    return len(statements[0][1])
+
+# 套卷 CSV 是宽表：年份、完成日期、卷名、各模块的总数和正确数、总正确数、总题量、成绩
+# 拆成套卷一行和每个模块一行；主键在导入事务里预先分配，不必逐行取 lastrowid
+def _exam_import_rows(c, chunk):
+    next_id = c.execute("SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'exam_papers'), 0), "
+                        "COALESCE((SELECT MAX(id) FROM exam_papers), 0)) + 1").fetchone()[0]
+    n = len(EXAM_SECTIONS)
+    papers, sections = [], []
+    for paper_id, values in enumerate(chunk, next_id):
+        papers.append([paper_id] + values[:3] + values[3 + 2 * n:])
+        sections.extend((paper_id, name, values[3 + 2 * i], values[4 + 2 * i]) for i, (name, _) in enumerate(EXAM_SECTIONS))
+    return [('INSERT INTO exam_papers (id, year, completion_date, paper_name, total_correct, total_questions, score, create_time) '
+             'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', papers),
+            ('INSERT INTO exam_sections (paper_id, section, total, correct) VALUES (?, ?, ?, ?)', sections)]
+
+# 题目按内容哈希查重：每块用一次 IN 查询对照库里已有的题，文件内的重复靠集合去掉
+# 前面的块已经写入同一事务，逐行重试时前面的行也已写入，都能被查到
+def _question_import_rows(c, chunk):
+    hashes = [question_hash(values[2], values[3]) for values in chunk]
+    seen = {row[0] for row in c.execute(f"SELECT content_hash FROM questions WHERE content_hash IN ({', '.join('?' * len(hashes))})", hashes)}
+    rows = []
+    for values, content_hash in zip(chunk, hashes):
+        if content_hash not in seen:
+            seen.add(content_hash)
+            rows.append(values + [content_hash])
+    columns, _, stamped = IMPORT_SPECS['questions']
+    columns = ', '.join((columns,) + stamped + ('content_hash',))
+    return [(f"INSERT INTO questions ({columns}) VALUES ({', '.join('?' * len(columns.split(',')))})", rows)]
+
+# 成语名称唯一：按名称对照库里已有的成语，重复的跳过，导入本程序导出的文件不会因 UNIQUE(name) 整体回滚
+def _idiom_import_rows(c, chunk):
+    names = [values[1] for values in chunk]
+    seen = {row[0] for row in c.execute(f"SELECT name FROM idioms WHERE name IN ({', '.join('?' * len(names))})", names)}
+    rows = []
+    for values in chunk:
+        if values[1] not in seen:
+            seen.add(values[1])
+            rows.append(values)
+    columns, _, stamped = IMPORT_SPECS['idioms']
+    columns = ', '.join((columns,) + stamped)
+    return [(f"INSERT INTO idioms ({columns}) VALUES ({', '.join('?' * len(columns.split(',')))})", rows)]
+
+_IMPORT_EXPANDERS = {'questions': _question_import_rows, 'idioms': _idiom_import_rows, 'exam_papers': _exam_import_rows}
+
+# 导出：按游标分批读取、边读边写，内存占用与表大小无关
+# 按文件后缀选择格式：.csv / .jsonl，再加 .gz 为 gzip 压缩；JSON Lines 以列名为键
+EXPORT_SPECS = {
+    'questions': ('id, module, source, content, answer, reviews, question_type, entry_time', 'create_time DESC'),
+    'idioms': ('id, category, name, meaning, context, collocation, example, entry_time', 'create_time DESC'),
+    'exam_papers': (EXAM_WIDE_COLUMNS, 'create_time DESC'),
+    'essay_papers': ('id, year, province, question_type, source, date, content, completion_status, entry_time', 'entry_time DESC'),
+}
+EXPORT_BATCH_SIZE = 500
+
+def _open_export(path, compressed):
+    if compressed:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+# 先写到临时文件，完成后再替换目标文件，取消或出错时不会留下半截文件
+# query 返回 (总行数, 已执行查询的游标)，按 batch_size 分批写出
+def _write_export(path, names, headers, query, progress=None, cancelled=None, batch_size=EXPORT_BATCH_SIZE):
+    as_json = path.endswith(('.jsonl', '.jsonl.gz'))
+    partial = path + '.part'
+    exported = 0
+    last = None
+    try:
+        with _open_export(partial, path.endswith('.gz')) as file, get_conn() as conn:
+            total, c = query(conn.cursor())
+            total = total or 1
+            if not as_json:
+                writer = csv.writer(file)
+                writer.writerow(headers or names)
+            while True:
+                rows = c.fetchmany(batch_size)
+                if not rows:
+                    break
+                if cancelled is not None and cancelled():
+                    raise TransferCancelled()
+                if as_json:
+                    file.writelines(json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n' for row in rows)
+                else:
+                    writer.writerows(rows)
+                exported += len(rows)
+                last = rows[-1]
+                if progress is not None:
+                    progress(exported, min(exported / total, 1.0))
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return exported, last
+
+def _export_names(columns):
+    return [col.rsplit(' AS ', 1)[-1].strip() for col in columns.split(',')]
+
+def export_table(table, path, headers=None, progress=None, cancelled=None, batch_size=EXPORT_BATCH_SIZE):
+    columns, order = EXPORT_SPECS[table]
+
+    def query(c):
+        total = c.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        return total, c.execute(f'SELECT {columns} FROM {table} ORDER BY {order}')
+
+    return _write_export(path, _export_names(columns), headers, query, progress, cancelled, batch_size)[0]
+
+ChangeExport = namedtuple('ChangeExport', 'exported since last_seq')
+CHANGE_EXPORT_COLUMNS = ['seq', 'op']  # 增量导出在表的导出列前面加上变更序号和操作
+
+def current_change_seq():
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute('SELECT COALESCE(MAX(seq), 0) FROM changes')
+        return c.fetchone()[0]
+
+def get_change_watermark(name):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute('SELECT seq FROM change_watermarks WHERE name = ?', (name,))
+        row = c.fetchone()
+        return row[0] if row else 0
+
+def _set_watermark(c, name, seq):
+    c.execute('INSERT INTO change_watermarks (name, seq) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET seq = excluded.seq',
+              (name, seq))
+
+def set_change_watermark(name, seq):
+    with get_conn() as conn:
+        _set_watermark(conn.cursor(), name, seq)
+
+# 导出序号 since 之后这张表的变更，按 seq 排序；删除的行只有 id，其余列为空
+# since 为 None 时接着上次增量导出的位置，导出成功后记下新的位置；headers 要包含序号和操作两列；返回 ChangeExport
+def export_changes(table, path, since=None, headers=None, progress=None, cancelled=None, batch_size=EXPORT_BATCH_SIZE):
+    columns, _ = EXPORT_SPECS[table]
+    record = since is None
+    if record:
+        since = get_change_watermark(table)
+    names = CHANGE_EXPORT_COLUMNS + _export_names(columns)
+    rest = columns.split(',', 1)[1]  # 导出列都以 id 开头，删除的行 id 取自变更日志
+
+    def query(c):
+        total = c.execute('SELECT COUNT(*) FROM changes WHERE table_name = ? AND seq > ?', (table, since)).fetchone()[0]
+        return total, c.execute(f'''SELECT ch.seq, ch.op, ch.row_id, {rest} FROM changes ch
+                                      LEFT JOIN {table} ON {table}.id = ch.row_id AND ch.op != 'delete'
+                                      WHERE ch.table_name = ? AND ch.seq > ? ORDER BY ch.seq''', (table, since))
+
+    exported, last = _write_export(path, names, headers, query, progress, cancelled, batch_size)
+    last_seq = last[0] if last else since
+    if record:
+        set_change_watermark(table, last_seq)
+    return ChangeExport(exported, since, last_seq)
+
+# 两个库之间的增量同步：各自取出上次同步以来的变更，逐条按 (stamp, origin) 比较，较新的一方覆盖较旧的一方
+# 两边改了同一行时结果只取决于版本戳，谁先发起同步都一样；删除和修改冲突时同样按版本戳决定
+# 对方可以是另一台电脑上的库文件，也可以是放在同步盘里、两台电脑轮流同步的中转库（不存在时自动创建）
+# 不同步的内容：题目图片文件、复习记录明细（review_events）
+SyncChange = namedtuple('SyncChange', 'table row_id uid op stamp origin')  # row_id 是变更所在库的行号
+SyncResult = namedtuple('SyncResult', 'sent received conflicts')
+
+def _replica_file(c):  # 库文件的真实路径，内存库为空字符串
+    path = next(row[2] for row in c.execute('PRAGMA database_list').fetchall() if row[1] == 'main')
+    return os.path.normcase(os.path.realpath(path)) if path else ''
+
+# 库文件被复制或移动过时换一个新的副本 ID，再返回副本 ID；宁可多同步一遍，也不让两份库共用一个 ID 和一条水位
+def _check_replica(c):
+    replica_id, path = c.execute('SELECT id, path FROM replica').fetchone()
+    current = _replica_file(c)
+    if path != current:
+        _refresh_knowledge(c)  # 复制时带过来的版本都算见过，本库之后的修改会覆盖掉其中一些
+        replica_id = os.urandom(8).hex()
+        c.execute('UPDATE replica SET id = ?, path = ?', (replica_id, current))
+    return replica_id
+
+# 把本库现有的版本并入 replica_knowledge；被同步覆盖的版本在覆盖之前已经记进去了
+def _refresh_knowledge(c):
+    c.execute('''INSERT INTO replica_knowledge (origin, stamp) SELECT origin, MAX(stamp) FROM changes WHERE true GROUP BY origin
+                 ON CONFLICT(origin) DO UPDATE SET stamp = max(stamp, excluded.stamp)''')
+    return dict(c.execute('SELECT origin, stamp FROM replica_knowledge').fetchall())
+
+def _knows(knowledge, change):  # 这一版本是否已经包含在对方的库里
+    return change.stamp <= knowledge.get(change.origin, 0)
+
+def _watermark(c, name):
+    row = c.execute('SELECT seq FROM change_watermarks WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else 0
+
+def _sync_columns(c, table):  # 除本地行号外要同步的列，uid 单独处理
+    return [row[1] for row in c.execute(f'PRAGMA table_info({table})').fetchall() if row[1] not in ('id', 'uid')]
+
+# 只取版本信息，行内容等确定要写到对方时再读，两边版本相同的行不用读
+def _collect_changes(c, since):
+    c.execute('SELECT table_name, row_id, uid, op, stamp, origin FROM changes WHERE seq > ? AND uid IS NOT NULL ORDER BY seq',
+              (since,))
+    return {(row[0], row[2]): SyncChange(*row) for row in c.fetchall()}
+
+def _read_row(c, change, columns):  # (列值, 套卷的模块明细)
+    values = c.execute(f'SELECT {", ".join(columns[change.table])} FROM {change.table} WHERE id = ?', (change.row_id,)).fetchone()
+    sections = None
+    if change.table == 'exam_papers':
+        sections = c.execute('SELECT section, total, correct FROM exam_sections WHERE paper_id = ?', (change.row_id,)).fetchall()
+    return values, sections
+
+# 目标库里对应的行号：先按 uid 找，成语名称唯一，两边各自录入的同名成语按名称合并成一条
+def _target_row(c, change, values, columns):
+    c.execute(f'SELECT id FROM {change.table} WHERE uid = ?', (change.uid,))
+    row = c.fetchone()
+    if row is None and change.table == 'idioms' and values is not None:
+        c.execute('SELECT id FROM idioms WHERE name = ?', (values[columns['idioms'].index('name')],))
+        row = c.fetchone()
+    return row[0] if row else None
+
+# 目标库没有这个 uid 的版本时，和按名称合并到的那一行的版本比较
+def _is_newer(c, change, row_id):
+    c.execute('SELECT stamp, origin FROM changes WHERE table_name = ? AND uid = ?', (change.table, change.uid))
+    row = c.fetchone()
+    if row is None and row_id is not None:
+        c.execute('SELECT stamp, origin FROM changes WHERE table_name = ? AND row_id = ?', (change.table, row_id))
+        row = c.fetchone()
+    return row is None or (change.stamp, change.origin) > tuple(row)
+
+# 成语改名撞上目标库里另一条同名成语（对方改名的同时这边录入了同名的）：按 (stamp, origin) 较新的一方保留，
+# 较旧的那一行删掉，删除触发器记下新版本戳的墓碑，下次同步对方也会删掉它；返回 False 表示这条变更输了，不再写入
+def _resolve_name_clash(c, change, row_id, values, columns):
+    name = values[columns['idioms'].index('name')]
+    holder = c.execute('SELECT id FROM idioms WHERE name = ? AND id IS NOT ?', (name, row_id)).fetchone()
+    if holder is None:
+        return True
+    version = c.execute("SELECT stamp, origin FROM changes WHERE table_name = 'idioms' AND row_id = ?", holder).fetchone()
+    if version is None or (change.stamp, change.origin) > tuple(version):
+        c.execute('DELETE FROM idioms WHERE id = ?', holder)
+        return True
+    c.execute('DELETE FROM idioms WHERE id = ?', (row_id,))  # 有同名行时 row_id 一定是按 uid 找到的
+    return False
+
+# files 收集被删题目的图片，提交后再清理没有引用的文件
+def _apply_change(c, change, row_id, values, sections, columns, files):
+    table, cols = change.table, columns[change.table]
+    if table == 'idioms' and change.op != 'delete' and not _resolve_name_clash(c, change, row_id, values, columns):
+        return
+    if change.op == 'delete':
+        if row_id is not None:
+            if table == 'questions':
+                files.extend(c.execute('SELECT DISTINCT sha256, ext FROM attachments WHERE question_id = ?', (row_id,)).fetchall())
+            c.execute(f'DELETE FROM {table} WHERE id = ?', (row_id,))
+        else:  # 目标库从没有过这一行，只记墓碑，之后同步给别的库
+            c.execute('DELETE FROM changes WHERE table_name = ? AND uid = ?', (table, change.uid))
+            c.execute("INSERT INTO changes (table_name, uid, op) VALUES (?, ?, 'delete')", (table, change.uid))
+    else:
+        if row_id is not None:
+            old_uid = c.execute(f'SELECT uid FROM {table} WHERE id = ?', (row_id,)).fetchone()[0]
+            c.execute(f'UPDATE {table} SET {", ".join(f"{col} = ?" for col in cols)}, uid = ? WHERE id = ?',
+                      (*values, change.uid, row_id))
+            if old_uid != change.uid:  # 按名称合并的成语换成了对方的 uid，原来的 uid 记墓碑，对方那边有这一条的话也删掉
+                c.execute(f"INSERT INTO changes (table_name, uid, op, stamp, origin) "
+                          f"VALUES (?, ?, 'delete', {_CHANGE_STAMP}, (SELECT id FROM replica))", (table, old_uid))
+        else:
+            c.execute(f'INSERT INTO {table} ({", ".join(cols)}, uid) VALUES ({", ".join("?" * (len(cols) + 1))})',
+                      (*values, change.uid))
+            row_id = c.lastrowid
+        if sections is not None:
+            c.execute('DELETE FROM exam_sections WHERE paper_id = ?', (row_id,))
+            c.executemany('INSERT INTO exam_sections (paper_id, section, total, correct) VALUES (?, ?, ?, ?)',
+                          [(row_id, *section) for section in sections])
+    # 触发器记下的是目标库的新版本戳，改回变更原来的版本，两边才会认为是同一个版本
+    c.execute('UPDATE changes SET stamp = ?, origin = ? WHERE table_name = ? AND uid = ?',
+              (change.stamp, change.origin, table, change.uid))
+
+# 把 src 的变更写进 dst，dst 已有相同或更新版本的跳过；返回 (实际写入的变更数, 涉及的表, 累计处理数)
+def _apply_changes(src, dst, changes, columns, files, done, total, progress, cancelled):
+    applied = 0
+    tables = set()
+    for change in changes:
+        if cancelled is not None and cancelled():
+            raise TransferCancelled()
+        values = sections = None
+        row_id = _target_row(dst, change, None, columns)
+        if row_id is None and change.table == 'idioms' and change.op != 'delete':
+            values, sections = _read_row(src, change, columns)
+            row_id = _target_row(dst, change, values, columns)
+        if _is_newer(dst, change, row_id):
+            if values is None and change.op != 'delete':
+                values, sections = _read_row(src, change, columns)
+            _apply_change(dst, change, row_id, values, sections, columns, files)
+            applied += 1
+            tables.add(change.table)
+        done += 1
+        if progress is not None and done % IMPORT_CHUNK_SIZE == 0:
+            progress(done, done / total)
+    return applied, tables, done
+
+# 与 path 指向的库双向同步，两边都在各自的一个事务里完成，出错或取消时都不改动；返回 SyncResult
+# conflicts 只数两边自上次交换以来都改过的记录：一边的版本对方已经见过时，只是对方还没收到更新，不算冲突
+def sync_with(path, progress=None, cancelled=None):
+    if os.path.abspath(path) == os.path.abspath(DB_PATH):
+        raise ValueError('不能和当前数据库自己同步')
+    flush_reviews()  # 写缓冲里的复习也一起同步
+    local = get_conn()
+    peer = _open_connection(path)
+    local_files, peer_files = [], []  # 同步删掉的题目留下的图片文件
+    try:
+        migrate(peer)
+        lc, pc = local.cursor(), peer.cursor()
+        local.execute('BEGIN IMMEDIATE')  # 同步期间两边都不接受别的写入，收集到的变更和写回时的状态一致
+        try:
+            peer.execute('BEGIN IMMEDIATE')
+            local_id, peer_id = _check_replica(lc), _check_replica(pc)
+            if local_id == peer_id:  # 两份库记下的路径也相同（例如换了挂载点），仍然给对方换一个副本 ID
+                pc.execute('UPDATE replica SET id = ?', (os.urandom(8).hex(),))
+                peer_id = _check_replica(pc)
+            local_knowledge, peer_knowledge = _refresh_knowledge(lc), _refresh_knowledge(pc)
+            columns = {table: _sync_columns(lc, table) for table in CHANGE_TABLES}
+            outgoing = _collect_changes(lc, _watermark(lc, f'sync:{peer_id}'))
+            incoming = _collect_changes(pc, _watermark(pc, f'sync:{local_id}'))
+            conflicts = sum(outgoing[key][4:] != incoming[key][4:]
+                            and not _knows(peer_knowledge, outgoing[key]) and not _knows(local_knowledge, incoming[key])
+                            for key in outgoing.keys() & incoming.keys())
+            total = max(len(outgoing) + len(incoming), 1)
+            # 两边的变更清单都在写入之前取出；行内容写入时才读，对方被覆盖的行对应的变更一定较旧，不会再被读到
+            sent, _, done = _apply_changes(lc, pc, outgoing.values(), columns, peer_files, 0, total, progress, cancelled)
+            received, tables, _ = _apply_changes(pc, lc, incoming.values(), columns, local_files, done, total, progress, cancelled)
+            # 刚写进去的变更已经在对方那里有了，水位放到写入之后，下次不会再发回去
+            _set_watermark(pc, f'sync:{local_id}', pc.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0])
+            _set_watermark(lc, f'sync:{peer_id}', lc.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0])
+            # 交换之后两边都包含了对方见过的所有版本
+            knowledge = [(origin, max(stamp, peer_knowledge.get(origin, 0))) for origin, stamp in local_knowledge.items()]
+            knowledge += [(origin, stamp) for origin, stamp in peer_knowledge.items() if origin not in local_knowledge]
+            for c in (lc, pc):
+                c.executemany('INSERT OR REPLACE INTO replica_knowledge (origin, stamp) VALUES (?, ?)', knowledge)
+            peer.commit()
+        except BaseException:
+            peer.rollback()
+            local.rollback()
+            raise
+        local.commit()
+        _prune_attachment_files(peer_files, peer, path)
+    finally:
+        peer.close()
+    _prune_attachment_files(local_files)
+    for table in tables:
+        _notify(table, 'reset')
+    return SyncResult(sent, received, conflicts)
 
 def get_all_questions():
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
+        c.row_factory = QuestionRow.row_factory
         c.execute('SELECT id, module, source, content, answer, reviews, question_type, entry_time FROM questions ORDER BY create_time DESC')  # 确保返回 entry_time 字段
         return c.fetchall()
 
+def query_questions(filters=None, order='asc', limit=None, offset=0, seed=None):
+    return _query('questions', filters, order, limit, offset, seed)
+
+def count_questions(filters=None):
+    return _count('questions', filters)
+
+def get_question(qid):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.row_factory = Question.row_factory
+        c.execute('SELECT module, source, content, answer, analysis, question_type, entry_time FROM questions WHERE id=?', (qid,))
+        return c.fetchone()
+
 def add_question(module, source, content, answer, analysis, question_type, entry_time):
-    with sqlite3.connect(DB_PATH) as conn:
+    now = datetime.now()
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('''INSERT INTO questions 
-                     (module, source, content, answer, analysis, question_type, create_time, entry_time)
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                  (module, source, content, answer, analysis, question_type, datetime.now(), entry_time))  # 添加 entry_time
-        conn.commit()  # 确保提交事务
-        return c.lastrowid  # 返回新插入记录的ID
+                     (module, source, content, answer, analysis, question_type, create_time, entry_time, due, content_hash)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                  (module, source, content, answer, analysis, question_type, now, entry_time, now,  # 新题立即进入复习队列
+                   question_hash(content, answer)))
+        new_id = c.lastrowid
+    _notify('questions', 'insert', new_id)
+    return new_id  # 返回新插入记录的ID
 
 def update_question(qid, module, source, content, answer, analysis, question_type, entry_time):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('''UPDATE questions 
-                     SET module = ?, source = ?, content = ?, answer = ?, analysis = ?, question_type = ?, entry_time = ?
+                     SET module = ?, source = ?, content = ?, answer = ?, analysis = ?, question_type = ?, entry_time = ?, content_hash = ?
                      WHERE id = ?''',
-                  (module, source, content, answer, analysis, question_type, entry_time, qid))
-        conn.commit()
+                  (module, source, content, answer, analysis, question_type, entry_time, question_hash(content, answer), qid))
+    _notify('questions', 'update', qid)
 
-def update_review(qid):
-    with sqlite3.connect(DB_PATH) as conn:
+# 返回题干和答案相同（忽略空白、标点和全半角差异）的已有题目 ID，没有则返回 None；编辑时用 exclude_id 排除自身
+def check_duplicate_question(content, answer, exclude_id=None):
+    with get_conn() as conn:
         c = conn.cursor()
-        c.execute('UPDATE questions SET reviews = reviews + 1 WHERE id = ?', (qid,))
-        conn.commit()
+        c.execute('SELECT id FROM questions WHERE content_hash = ? AND id IS NOT ? LIMIT 1',
+                  (question_hash(content, answer), exclude_id))
+        row = c.fetchone()
+        return row[0] if row else None
+
+def update_review(qid):
+    review_question(qid, None)
 
 def delete_question(qid):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
+        c.execute('SELECT DISTINCT sha256, ext FROM attachments WHERE question_id = ?', (qid,))
+        files = c.fetchall()
         c.execute('DELETE FROM questions WHERE id = ?', (qid,))
-        conn.commit()
+    _prune_attachment_files(files)
+    _notify('questions', 'delete', qid)
+
+ATTACHMENT_COPY_CHUNK = 1 << 20
+Attachment = namedtuple('Attachment', 'id name path size')
+
+def attachment_dir(db_path=None):  # 跟着 DB_PATH 走，换库时图片目录也跟着换；db_path 给出别的库时取那个库旁边的目录
+    return os.path.join(os.path.dirname(os.path.abspath(db_path or DB_PATH)), ATTACHMENT_DIR)
+
+def attachment_path(sha256, ext, db_path=None):
+    return os.path.join(attachment_dir(db_path), sha256[:2], sha256 + ext)
+
+# 边复制边算哈希，写完再改名，中途失败不会留下半个文件；同样内容的文件已存在时不再复制
+def _store_attachment_file(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in ATTACHMENT_EXTS:
+        raise ValueError(f'不支持的图片格式: {ext or path}')
+    os.makedirs(attachment_dir(), exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    part = os.path.join(attachment_dir(), f'.{os.getpid()}.{threading.get_ident()}.part')
+    try:
+        with open(path, 'rb') as src, open(part, 'wb') as dst:
+            for chunk in iter(lambda: src.read(ATTACHMENT_COPY_CHUNK), b''):
+                digest.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        target = attachment_path(sha256, ext)
+        if os.path.exists(target):
+            os.remove(part)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(part, target)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    return sha256, ext, size
+
+def add_attachment(question_id, path):
+    sha256, ext, size = _store_attachment_file(path)
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute('INSERT INTO attachments (question_id, sha256, name, ext, size, create_time) VALUES (?, ?, ?, ?, ?, ?)',
+                  (question_id, sha256, os.path.basename(path), ext, size, datetime.now()))
+        new_id = c.lastrowid
+    _notify('questions', 'update', question_id)
+    return new_id
+
+def get_attachments(question_id):  # 按添加顺序
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute('SELECT id, name, sha256, ext, size FROM attachments WHERE question_id = ? ORDER BY id', (question_id,))
+        return [Attachment(aid, name, attachment_path(sha256, ext), size) for aid, name, sha256, ext, size in c.fetchall()]
+
+# 列表缩略图用：每道题的第一张图 {题目ID: 文件路径}，只查当前页的题目
+def get_first_attachments(question_ids):
+    ids = list(question_ids)
+    if not ids:
+        return {}
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute(f'''SELECT a.question_id, a.sha256, a.ext FROM attachments a
+                      JOIN (SELECT MIN(id) AS id FROM attachments WHERE question_id IN ({','.join('?' * len(ids))})
+                            GROUP BY question_id) f ON f.id = a.id''', ids)
+        return {qid: attachment_path(sha256, ext) for qid, sha256, ext in c.fetchall()}
+
+def delete_attachment(attachment_id):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute('SELECT question_id, sha256, ext FROM attachments WHERE id = ?', (attachment_id,))
+        row = c.fetchone()
+        if row is None:
+            return
+        c.execute('DELETE FROM attachments WHERE id = ?', (attachment_id,))
+    _prune_attachment_files([row[1:]])
+    _notify('questions', 'update', row[0])
+
+# 删除已经没有任何引用的图片文件；同步时 conn 和 db_path 指向对方的库
+def _prune_attachment_files(files, conn=None, db_path=None):
+    with conn or get_conn() as conn:
+        c = conn.cursor()
+        for sha256, ext in files:
+            c.execute('SELECT 1 FROM attachments WHERE sha256 = ? AND ext = ? LIMIT 1', (sha256, ext))
+            if c.fetchone() is None:
+                try:
+                    os.remove(attachment_path(sha256, ext, db_path))
+                except FileNotFoundError:
+                    pass
+
+# SM-2 评分：0~5，低于 3 视为没记住，间隔从头开始；难度系数按评分调整，最低 1.3
+REVIEW_GRADES = {'again': 1, 'hard': 3, 'good': 4, 'easy': 5}
+MIN_EASE = 1.3
+MAX_INTERVAL_DAYS = 36500  # 间隔上限，防止连续答对后到期时间溢出
+
+def sm2_schedule(ease, interval_days, repetitions, grade):
+    if grade < 3:
+        repetitions = 0
+        interval_days = 1
+    else:
+        if repetitions == 0:
+            interval_days = 1
+        elif repetitions == 1:
+            interval_days = 6
+        else:
+            interval_days = min(MAX_INTERVAL_DAYS, max(1, round(interval_days * ease)))
+        repetitions += 1
+    ease = max(MIN_EASE, round(ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02), 2))
+    return ease, interval_days, repetitions
+
+# 把一次复习计入题目：累加复盘次数，有评分时按 SM-2 更新调度状态和下次到期时间
+def _apply_review(c, qid, grade, when):
+    if grade is None:
+        c.execute('UPDATE questions SET reviews = reviews + 1 WHERE id = ?', (qid,))
+        return None
+    c.execute('SELECT ease, interval_days, repetitions FROM questions WHERE id = ?', (qid,))
+    row = c.fetchone()
+    if row is None:
+        return None
+    ease, interval_days, repetitions = sm2_schedule(row[0], row[1], row[2], grade)
+    due = when + timedelta(days=interval_days)
+    c.execute('''UPDATE questions
+                 SET ease = ?, interval_days = ?, repetitions = ?, due = ?, reviews = reviews + 1
+                 WHERE id = ?''',
+              (ease, interval_days, repetitions, due, qid))
+    return due
+
+# 立即写入一次复习；复习界面连续评分时用 record_review，不必每次等磁盘
+def review_question(qid, grade, now=None, duration=None):
+    now = now or datetime.now()
+    with get_conn() as conn:
+        c = conn.cursor()
+        due = _apply_review(c, qid, grade, now)
+        c.execute('INSERT INTO review_events (question_id, reviewed_at, result, duration) VALUES (?, ?, ?, ?)',
+                  (qid, now, grade, duration))
+    _notify('questions', 'update', qid)
+    return due
+
+# 复习记录的写缓冲：record_review 只追加到内存，flush_reviews 在一个事务里写入记录并更新题目的统计
+# 界面定时、复习结束和退出时各调用一次 flush；同一道题的多次复习按发生顺序计入
+_review_buffer = []
+_review_lock = threading.Lock()
+_flush_lock = threading.Lock()  # 同一时间只有一个 flush，保证先记录的复习先计入
+
+def record_review(qid, grade=None, duration=None, when=None):
+    with _review_lock:
+        _review_buffer.append((qid, when or datetime.now(), grade, duration))
+
+def pending_reviews():
+    with _review_lock:
+        return len(_review_buffer)
+
+def flush_reviews():
+    with _flush_lock:
+        with _review_lock:
+            events = _review_buffer[:]
+            del _review_buffer[:]
+        if not events:
+            return 0
+        try:
+            with get_conn() as conn:
+                c = conn.cursor()
+                c.executemany('INSERT INTO review_events (question_id, reviewed_at, result, duration) VALUES (?, ?, ?, ?)', events)
+                for qid, when, grade, _ in events:
+                    _apply_review(c, qid, grade, when)
+        except Exception:
+            with _review_lock:  # 写入失败时放回缓冲区，下次再试
+                _review_buffer[:0] = events
+            raise
+    for qid in dict.fromkeys(event[0] for event in events):
+        _notify('questions', 'update', qid)
+    return len(events)
+
+def get_review_events(qid):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute('SELECT reviewed_at, result, duration FROM review_events WHERE question_id = ? ORDER BY reviewed_at', (qid,))
+        return c.fetchall()
+
+# 复习界面用到的列，到期队列和随机抽题返回同样的行
+REVIEW_COLUMNS = 'id, module, source, content, answer, analysis, question_type, reviews, interval_days, due'
+ReviewRow = _record_type('ReviewRow', REVIEW_COLUMNS.replace(',', ''), 'module source question_type')
+
+# 到期队列：沿 due 索引取最早到期的 n 道题，不扫描整张表；先写入缓冲的复习，刚评过分的题不会再出现
+def get_due_questions(n, now=None):
+    flush_reviews()
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.row_factory = ReviewRow.row_factory
+        c.execute(f'SELECT {REVIEW_COLUMNS} FROM questions WHERE due <= ? ORDER BY due LIMIT ?',
+                  (now or datetime.now(), n))
+        return c.fetchall()
+
+def count_due_questions(now=None):
+    flush_reviews()  # 缓冲里的复习会推迟到期时间，先写入再数
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute('SELECT COUNT(*) FROM questions WHERE due <= ?', (now or datetime.now(),))
+        return c.fetchone()[0]
+
+# 随机抽题：不读全表，同一个 seed 在数据不变时抽出同样的题，练习可以复现
+# 只有列筛选（模块、来源……）时先在符合条件的 id 范围 [MIN(id), MAX(id)] 里随机取 id 按主键读取，空号和不符合条件的丢弃重抽；
+# 符合条件的行在范围里太稀疏或重抽几轮仍不够时，改为沿筛选列的索引随机取第 n 行（LIMIT 1 OFFSET n），都不读出 id 列表
+# 有关键词时，或要抽的题超过符合条件的一半时，才读出符合条件的 id（走索引，不读题目内容）再抽样
+# weight='reviews' 时按复盘次数加权，复盘越多越容易被抽到；stratify 为 'module' 或 'source' 时按该列的题量比例分层抽取
+SAMPLE_WEIGHTS = {'reviews': ('reviews + 1', 'SELECT MAX(reviews) + 1 FROM questions')}
+SAMPLE_STRATA = ('module', 'source')
+SAMPLE_ROUNDS = 8  # 随机取 id 的最多轮数；加权时随机取第 n 行最多试 SAMPLE_ROUNDS 倍的题数
+SAMPLE_MIN_DENSITY = 1 / 16  # 符合条件的行占 id 范围的比例低于它时不随机取 id
+SAMPLE_BATCH = 500  # 每轮按主键读取的 id 数上限，不超过 SQLite 的参数个数限制
+
+def sample_questions(k, filters=None, weight=None, stratify=None, seed=None):
+    rng = random.Random(seed)
+    with get_conn() as conn:
+        if stratify:
+            return _sample_strata(conn, k, filters or {}, weight, stratify, rng)
+        return _sample(conn, k, filters or {}, weight, rng)
+
+def _fetch_review_rows(conn, ids, clauses=(), params=()):
+    if not ids:
+        return {}
+    c = conn.cursor()
+    c.row_factory = ReviewRow.row_factory
+    where = ' AND '.join([*clauses, f"id IN ({', '.join('?' * len(ids))})"])
+    c.execute(f'SELECT {REVIEW_COLUMNS} FROM questions WHERE {where}', [*params, *ids])
+    return {row.id: row for row in c.fetchall()}
+
+def _accept(row, max_weight, rng):  # 加权抽样按 reviews + 1 占最大权重的比例接受
+    return max_weight is None or rng.random() * max_weight < row.reviews + 1
+
+# count 为符合条件的题数，分层抽样时已经按组数过，不用再数一遍
+def _sample(conn, k, filters, weight, rng, count=None):
+    if k <= 0:
+        return []
+    chosen = {}
+    if not (filters.get('keyword') or '').strip():
+        clauses, params = _filter_clauses('questions', filters)
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        low = conn.execute(f'SELECT MIN(id) FROM questions{where}', params).fetchone()[0]
+        if low is None:
+            return []
+        top = conn.execute(f'SELECT MAX(id) FROM questions{where}', params).fetchone()[0]
+        max_weight = conn.execute(SAMPLE_WEIGHTS[weight][1]).fetchone()[0] if weight else None
+        if count is None and clauses:
+            count = conn.execute(f'SELECT COUNT(*) FROM questions{where}', params).fetchone()[0]
+        span = top - low + 1
+        density = count / span if count is not None else 1.0  # 没有筛选时不数行数，空号靠重抽
+        for _ in range(SAMPLE_ROUNDS if density >= SAMPLE_MIN_DENSITY and k * 2 < span * density else 0):
+            need = k - len(chosen)
+            draws = min(int(need * 2 / density) + 8, SAMPLE_BATCH)
+            candidates = list(dict.fromkeys(rng.randint(low, top) for _ in range(draws)))
+            rows = _fetch_review_rows(conn, [qid for qid in candidates if qid not in chosen], clauses, params)
+            for qid in candidates:
+                row = rows.get(qid)
+                if row is None or qid in chosen or not _accept(row, max_weight, rng):
+                    continue
+                chosen[qid] = row
+                if len(chosen) == k:
+                    return list(chosen.values())
+        if count is None:
+            count = conn.execute('SELECT COUNT(*) FROM questions').fetchone()[0]
+        if k * 2 < count:
+            # 不加权时每个位置只取一次；加权时被拒绝的位置还能再抽到，总次数有上限
+            c = conn.cursor()
+            c.row_factory = ReviewRow.row_factory
+            probe = f'SELECT {REVIEW_COLUMNS} FROM questions{where} ORDER BY id LIMIT 1 OFFSET ?'
+            tried = set()
+            budget = SAMPLE_ROUNDS * k
+            while len(chosen) < k and budget > 0 and len(tried) < count:
+                position = rng.randrange(count)
+                if position in tried:
+                    continue
+                budget -= 1
+                row = c.execute(probe, [*params, position]).fetchone()
+                if row is None or row.id in chosen:
+                    tried.add(position)
+                elif _accept(row, max_weight, rng):
+                    tried.add(position)
+                    chosen[row.id] = row
+            if len(chosen) == k:
+                return list(chosen.values())
+    source, params, _, _ = _build_from(conn, 'questions', filters)
+    weight_expr = SAMPLE_WEIGHTS[weight][0] if weight else '1'
+    c = conn.cursor()
+    c.execute(f'SELECT questions.id, {weight_expr} FROM {source} ORDER BY questions.id', params)
+    pool = [(qid, w) for qid, w in c.fetchall() if qid not in chosen]
+    need = k - len(chosen)
+    if weight:  # 加权无放回抽样：每个 id 取 u^(1/w)，保留最大的 need 个
+        picked = heapq.nlargest(need, pool, key=lambda item: rng.random() ** (1.0 / item[1]))
+        ids = [qid for qid, _ in picked]
+    else:
+        ids = [qid for qid, _ in rng.sample(pool, min(need, len(pool)))]
+    rows = _fetch_review_rows(conn, ids)
+    return list(chosen.values()) + [rows[qid] for qid in ids if qid in rows]
+
+def _sample_strata(conn, k, filters, weight, column, rng):
+    if column not in SAMPLE_STRATA:
+        raise ValueError(f'不支持按 {column} 分层')
+    source, params, _, _ = _build_from(conn, 'questions', filters)
+    c = conn.cursor()
+    c.execute(f'SELECT {column}, COUNT(*) FROM {source} GROUP BY {column} ORDER BY {column}', params)
+    strata = [(value, count) for value, count in c.fetchall() if value]  # 空值无法作为筛选条件，不参与分层
+    total = sum(count for _, count in strata)
+    if not total:
+        return []
+    k = min(k, total)
+    quotas = [k * count // total for _, count in strata]
+    remainders = sorted(range(len(strata)), key=lambda i: (-(k * strata[i][1] % total), i))
+    for i in remainders[:k - sum(quotas)]:  # 最大余数法分配剩下的名额
+        quotas[i] += 1
+    result = []
+    for (value, count), quota in zip(strata, quotas):
+        result.extend(_sample(conn, quota, dict(filters, **{column: value}), weight, rng, count))
+    rng.shuffle(result)
+    return result
 
 def get_all_sources():
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('SELECT DISTINCT source FROM questions')
         return [row[0] for row in c.fetchall()]
 
 def add_idiom(category, name, meaning, context, collocation, example, entry_time):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('''INSERT INTO idioms 
                      (category, name, meaning, context, collocation, example, create_time, entry_time)
                      VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
                   (category, name, meaning, context, collocation, example, datetime.now(), entry_time))  # 添加 entry_time
-        conn.commit()  # 确保提交事务
-        return c.lastrowid  # 返回新插入记录的ID
+        new_id = c.lastrowid
+    _notify('idioms', 'insert', new_id)
+    return new_id  # 返回新插入记录的ID
 
 def update_idiom(qid, category, name, meaning, context, collocation, example, entry_time):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('''UPDATE idioms 
                      SET category = ?, name = ?, meaning = ?, context = ?, collocation = ?, example = ?, entry_time = ?
                      WHERE id = ?''',
                   (category, name, meaning, context, collocation, example, entry_time, qid))
-        conn.commit()
+    _notify('idioms', 'update', qid)
 
 def get_all_idioms():
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
-        c.execute('SELECT * FROM idioms ORDER BY create_time DESC')
+        c.row_factory = IdiomRow.row_factory
+        c.execute('SELECT id, category, name, meaning, context, collocation, example, entry_time FROM idioms ORDER BY create_time DESC')
         return c.fetchall()
 
+def query_idioms(filters=None, order='newest', limit=None, offset=0):
+    return _query('idioms', filters, order, limit, offset)
+
+def count_idioms(filters=None):
+    return _count('idioms', filters)
+
+def get_idiom(qid):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.row_factory = Idiom.row_factory
+        c.execute('SELECT category, name, meaning, context, collocation, example, entry_time FROM idioms WHERE id=?', (qid,))
+        return c.fetchone()
+
 def delete_idiom(qid):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('DELETE FROM idioms WHERE id = ?', (qid,))
-        conn.commit()
+    _notify('idioms', 'delete', qid)
 
 def check_duplicate_idiom(name):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('SELECT COUNT(*) FROM idioms WHERE name = ?', (name,))
         return c.fetchone()[0] > 0
 
-def add_exam_paper(year, completion_date, paper_name, politics_total, politics_correct, general_knowledge_total, general_knowledge_correct, logic_total, logic_correct, fragment_total, fragment_correct, quantitative_total, quantitative_correct, graphic_reasoning_total, graphic_reasoning_correct, definition_total, definition_correct, analogy_total, analogy_correct, data_analysis_total, data_analysis_correct, total_correct, total_questions, score):
-    with sqlite3.connect(DB_PATH) as conn:
+# 成语名称补全：内存里的前缀树，键是成语名称、全拼和拼音首字母（需要 pypinyin），节点的 None 键存成语 ID
+# 第一次查询时从库里整体加载，之后按变更通知逐条增删；批量导入发出 'reset' 后下次查询重新加载
+IDIOM_COMPLETION_LIMIT = 10
+
+class _IdiomIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._root = None  # None 表示还没加载
+        self._path = None
+        self._names = {}  # id -> 名称
+        self._ids = {}  # 名称 -> id
+
+    @staticmethod
+    def _keys(name):
+        keys = {name.casefold()}
+        if lazy_pinyin is not None:
+            keys.add(''.join(lazy_pinyin(name)).casefold())
+            keys.add(''.join(lazy_pinyin(name, style=Style.FIRST_LETTER)).casefold())
+        return keys
+
+    def _add(self, qid, name):
+        self._names[qid] = name
+        self._ids[name] = qid
+        for key in self._keys(name):
+            node = self._root
+            for char in key:
+                node = node.setdefault(char, {})
+            node.setdefault(None, set()).add(qid)
+
+    def _remove(self, qid):
+        name = self._names.pop(qid, None)
+        if name is None:
+            return
+        if self._ids.get(name) == qid:
+            del self._ids[name]
+        for key in self._keys(name):
+            path, node = [], self._root
+            for char in key:
+                path.append((node, char))
+                node = node[char]
+            node[None].discard(qid)
+            if not node[None]:
+                del node[None]
+            for parent, char in reversed(path):  # 删掉不再通向任何成语的空节点
+                if parent[char]:
+                    break
+                del parent[char]
+
+    def _ensure_loaded(self):
+        if self._root is None or self._path != DB_PATH:
+            self._root, self._names, self._ids, self._path = {}, {}, {}, DB_PATH
+            with get_conn() as conn:
+                for qid, name in conn.execute('SELECT id, name FROM idioms'):
+                    self._add(qid, name)
+
+    def load(self):  # 在后台线程建索引
+        with self._lock:
+            self._ensure_loaded()
+
+    def ready(self):
+        return self._root is not None and self._path == DB_PATH
+
+    # complete 和 find 在界面线程随输入调用：索引还没建好或正被别的线程占用时不等待，
+    # 补全返回 []、查找返回 None，索引由 load 在后台建好后界面再刷新
+    def _try_lock(self):
+        if not self._lock.acquire(blocking=False):
+            return False
+        if not self.ready():
+            self._lock.release()
+            return False
+        return True
+
+    # 按层遍历前缀下面的节点，名称越短越靠前，凑够 limit 个就停
+    def complete(self, prefix, limit):
+        prefix = ''.join(prefix.split()).casefold()
+        if not prefix or not self._try_lock():
+            return []
+        try:
+            node = self._root
+            for char in prefix:
+                node = node.get(char)
+                if node is None:
+                    return []
+            found, level = {}, [node]
+            while level and len(found) < limit:
+                next_level = []
+                for node in level:
+                    for child_key, child in node.items():
+                        if child_key is None:
+                            found.update(dict.fromkeys(sorted(child, key=self._names.get)))
+                        else:
+                            next_level.append(child)
+                level = next_level
+            return [self._names[qid] for qid in list(found)[:limit]]
+        finally:
+            self._lock.release()
+
+    def find(self, name):
+        if not self._try_lock():
+            return None
+        try:
+            return self._ids.get(name.strip())
+        finally:
+            self._lock.release()
+
+    def on_change(self, event):
+        if event.table != 'idioms':
+            return
+        with self._lock:
+            if self._root is None:
+                return
+            if event.op == 'reset':
+                self._root = None
+                return
+            self._remove(event.id)
+            if event.op in ('insert', 'update'):
+                with get_conn() as conn:
+                    row = conn.execute('SELECT name FROM idioms WHERE id = ?', (event.id,)).fetchone()
+                if row is not None:
+                    self._add(event.id, row[0])
+
+_idiom_index = _IdiomIndex()
+subscribe(_idiom_index.on_change)
+
+def load_idiom_index():  # 在后台线程调用；批量导入、同步等 'reset' 之后索引作废，需要重新调用
+    _idiom_index.load()
+
+def idiom_index_ready():
+    return _idiom_index.ready()
+
+def complete_idioms(prefix, limit=IDIOM_COMPLETION_LIMIT):  # 索引没建好时返回 []
+    return _idiom_index.complete(prefix, limit)
+
+def find_idiom(name):  # 名称完全相同的成语 ID，没有或索引没建好时返回 None
+    return _idiom_index.find(name)
+
+# sections: {模块名: (总题数, 正确数)}，模块名见 EXAM_SECTIONS
+def _exam_section_rows(paper_id, sections):
+    return [(paper_id, name, int(total or 0), int(correct or 0)) for name, (total, correct) in sections.items()]
+
+def add_exam_paper(year, completion_date, paper_name, sections, total_correct, total_questions, score):
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('''INSERT INTO exam_papers 
-                     (year, completion_date, paper_name, politics_total, politics_correct, general_knowledge_total, general_knowledge_correct, logic_total, logic_correct, fragment_total, fragment_correct, quantitative_total, quantitative_correct, graphic_reasoning_total, graphic_reasoning_correct, definition_total, definition_correct, analogy_total, analogy_correct, data_analysis_total, data_analysis_correct, total_correct, total_questions, score, create_time)
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                  (year, completion_date, paper_name, politics_total, politics_correct, general_knowledge_total, general_knowledge_correct, logic_total, logic_correct, fragment_total, fragment_correct, quantitative_total, quantitative_correct, graphic_reasoning_total, graphic_reasoning_correct, definition_total, definition_correct, analogy_total, analogy_correct, data_analysis_total, data_analysis_correct, total_correct, total_questions, score, datetime.now()))
-        conn.commit()
-        return c.lastrowid  # 返回新插入记录的ID
+                     (year, completion_date, paper_name, total_correct, total_questions, score, create_time)
+                     VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                  (year, completion_date, paper_name, total_correct, total_questions, score, datetime.now()))
+        new_id = c.lastrowid
+        c.executemany('INSERT INTO exam_sections (paper_id, section, total, correct) VALUES (?, ?, ?, ?)',
+                      _exam_section_rows(new_id, sections))
+    _notify('exam_papers', 'insert', new_id)
+    return new_id  # 返回新插入记录的ID
 
-def update_exam_paper(qid, year, completion_date, paper_name, politics_total, politics_correct, general_knowledge_total, general_knowledge_correct, logic_total, logic_correct, fragment_total, fragment_correct, quantitative_total, quantitative_correct, graphic_reasoning_total, graphic_reasoning_correct, definition_total, definition_correct, analogy_total, analogy_correct, data_analysis_total, data_analysis_correct, total_correct, total_questions, score):
-    with sqlite3.connect(DB_PATH) as conn:
+def update_exam_paper(qid, year, completion_date, paper_name, sections, total_correct, total_questions, score):
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('''UPDATE exam_papers 
-                     SET year = ?, completion_date = ?, paper_name = ?, politics_total = ?, politics_correct = ?, general_knowledge_total = ?, general_knowledge_correct = ?, logic_total = ?, logic_correct = ?, fragment_total = ?, fragment_correct = ?, quantitative_total = ?, quantitative_correct = ?, graphic_reasoning_total = ?, graphic_reasoning_correct = ?, definition_total = ?, definition_correct = ?, analogy_total = ?, analogy_correct = ?, data_analysis_total = ?, data_analysis_correct = ?, total_correct = ?, total_questions = ?, score = ?
+                     SET year = ?, completion_date = ?, paper_name = ?, total_correct = ?, total_questions = ?, score = ?
                      WHERE id = ?''',
-                  (year, completion_date, paper_name, politics_total, politics_correct, general_knowledge_total, general_knowledge_correct, logic_total, logic_correct, fragment_total, fragment_correct, quantitative_total, quantitative_correct, graphic_reasoning_total, graphic_reasoning_correct, definition_total, definition_correct, analogy_total, analogy_correct, data_analysis_total, data_analysis_correct, total_correct, total_questions, score, qid))
-        conn.commit()
+                  (year, completion_date, paper_name, total_correct, total_questions, score, qid))
+        c.executemany('''INSERT INTO exam_sections (paper_id, section, total, correct) VALUES (?, ?, ?, ?)
+                         ON CONFLICT (paper_id, section) DO UPDATE SET total = excluded.total, correct = excluded.correct''',
+                      _exam_section_rows(qid, sections))
+    _notify('exam_papers', 'update', qid)
 
 def get_all_exam_papers():
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
-        c.execute('SELECT * FROM exam_papers ORDER BY create_time DESC')
+        c.row_factory = ExamPaperRow.row_factory
+        c.execute(f'SELECT {EXAM_WIDE_COLUMNS} FROM exam_papers ORDER BY create_time DESC')
         return c.fetchall()
 
+def query_exam_papers(filters=None, order='newest', limit=None, offset=0):
+    return _query('exam_papers', filters, order, limit, offset)
+
+def count_exam_papers(filters=None):
+    return _count('exam_papers', filters)
+
+def get_exam_paper(qid):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.row_factory = ExamPaper.row_factory
+        c.execute('''SELECT year, completion_date, paper_name, total_correct, total_questions, score 
+                     FROM exam_papers WHERE id=?''', (qid,))
+        return c.fetchone()
+
+def get_exam_sections(qid):  # {模块名: (总题数, 正确数)}
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute('SELECT section, total, correct FROM exam_sections WHERE paper_id = ?', (qid,))
+        return {section: (total, correct) for section, total, correct in c.fetchall()}
+
 def delete_exam_paper(qid):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('DELETE FROM exam_papers WHERE id = ?', (qid,))
-        conn.commit()
+    _notify('exam_papers', 'delete', qid)
+
+# 统计页：按周期读汇总表，返回 (period, section, papers, total, correct)，周期从新到旧
+def get_exam_stats(period_type='year'):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute('SELECT period, section, papers, total, correct FROM exam_stats WHERE period_type = ? ORDER BY period DESC',
+                  (period_type,))
+        return c.fetchall()
+
+# 最近 n 套卷（按完成日期）的各模块合计：沿 completion_date 索引取这 n 套，再按模块 GROUP BY；
+# 返回 EXAM_STAT_SECTIONS 顺序的 (section, papers, total, correct)
+def get_exam_rolling_stats(n):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT x.section, COUNT(*), SUM(x.total), SUM(x.correct)
+                     FROM (SELECT id FROM exam_papers ORDER BY completion_date DESC, id DESC LIMIT ?) AS p
+                     JOIN exam_sections AS x ON x.paper_id = p.id
+                     GROUP BY x.section''', (n,))
+        stats = {row[0]: row[1:] for row in c.fetchall()}
+        c.execute('''SELECT COUNT(*), SUM(total_questions), SUM(total_correct)
+                     FROM (SELECT total_questions, total_correct FROM exam_papers ORDER BY completion_date DESC, id DESC LIMIT ?)''', (n,))
+        stats['total'] = c.fetchone()
+    return [(name,) + tuple(value or 0 for value in stats.get(name, (0, 0, 0))) for name, _ in EXAM_STAT_SECTIONS]
 
 def add_essay_paper(year, province, question_type, source, date, content, completion_status, entry_time):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('''INSERT INTO essay_papers 
                      (year, province, question_type, source, date, content, completion_status, entry_time)
                      VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
                   (year, province, question_type, source, date, content, completion_status, entry_time))
-        conn.commit()
-        return c.lastrowid
+        new_id = c.lastrowid
+    _notify('essay_papers', 'insert', new_id)
+    return new_id  # 返回新插入记录的ID
 
 def update_essay_paper(qid, year, province, question_type, source, date, content, completion_status, entry_time):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('''UPDATE essay_papers 
                      SET year = ?, province = ?, question_type = ?, source = ?, date = ?, content = ?, completion_status = ?, entry_time = ?
                      WHERE id = ?''',
                   (year, province, question_type, source, date, content, completion_status, entry_time, qid))
-        conn.commit()
+    _notify('essay_papers', 'update', qid)
 
 def get_all_essay_papers():
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
-        c.execute('SELECT * FROM essay_papers ORDER BY entry_time DESC')
+        c.row_factory = EssayRow.row_factory
+        c.execute('SELECT id, year, province, question_type, source, date, content, completion_status, entry_time FROM essay_papers ORDER BY entry_time DESC')
         return c.fetchall()
 
+def query_essay_papers(filters=None, order='newest', limit=None, offset=0):
+    return _query('essay_papers', filters, order, limit, offset)
+
+def count_essay_papers(filters=None):
+    return _count('essay_papers', filters)
+
+def get_essay_paper(qid):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.row_factory = EssayPaper.row_factory
+        c.execute('SELECT year, province, question_type, source, date, content, completion_status, entry_time FROM essay_papers WHERE id=?', (qid,))
+        return c.fetchone()
+
 def delete_essay_paper(qid):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute('DELETE FROM essay_papers WHERE id = ?', (qid,))
-        conn.commit()
+    _notify('essay_papers', 'delete', qid)
@@ -1,10 +1,576 @@
 import sys
-import csv
+import time
+import random
+import logging
+from collections import OrderedDict
+from logging.handlers import RotatingFileHandler
 from PyQt5.QtWidgets import *
-from PyQt5.QtCore import Qt, QDate  # 添加 QDate 导入
+from PyQt5.QtCore import Qt, QDate, QAbstractTableModel, QModelIndex, QObject, QSize, QStringListModel, QTimer, pyqtSignal  # 添加 QDate 导入
+from PyQt5.QtGui import QBrush, QIcon, QImageReader, QKeySequence, QPixmap
 from database import *
+from workers import run_in_background, run_image_task, run_write, wait_for_workers, TaskCancelled
+from repository import get_record, prefetch_records
 
-init_db()
+log = logging.getLogger('xingce.ui')
+LOG_FILE = 'xingce.log'  # 诊断日志，写在数据库旁边（当前目录），超过 1MB 轮换
+
+class RecordTableModel(QAbstractTableModel):
+    # 回顾页表格的数据模型：按页从数据库取行，滚动到底部时再取下一页，只为可见单元格生成显示数据
+    # 查询都在后台线程执行；新的筛选到来时打断还没返回的旧查询，过期的结果直接丢弃
+    # 数据库的增删改通知经 CHANGE_BUS 送到 apply_change，只更新受影响的一行
+    PAGE_SIZE = 200
+    statusChanged = pyqtSignal(str)  # 加载状态文字，空字符串表示空闲
+
+    def __init__(self, table, headers, query, highlight_column=None, thumbnail_column=None):
+        super().__init__()
+        self.table = table  # 对应的数据库表名，用来过滤变更通知
+        self.headers = headers
+        self.query = query  # query(filters, order, limit, offset, ...)，即 database.query_* 函数
+        self.highlight_column = highlight_column  # 红色显示的列
+        self.thumbnail_column = thumbnail_column  # 显示题目第一张图缩略图的列，只用于题目表
+        self.thumbs = {}  # {行ID: 图片路径}，只记有图的已加载行，图片本身在 THUMBNAILS 里
+        self.rows = []
+        self.positions = None  # {行ID: 行号}，按 ID 找行时才建立，行的位置整体变化时作废
+        self.filters = {}
+        self.order = None
+        self.seed = None
+        self.has_more = False
+        self.task = None  # 正在执行的后台查询
+        self.request = 0  # 每发起一次查询加一，用来识别过期的结果
+        self.epoch = 0  # 每次整表重新加载加一，单行刷新的结果跨过重新加载就作废
+        self.resetting = False  # 整表重新加载的查询还没返回
+        CHANGE_BUS.changed.connect(self.apply_change)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            value = self.rows[index.row()][index.column()]
+            return "" if value is None else str(value)
+        if role == Qt.ForegroundRole and index.column() == self.highlight_column:
+            return QBrush(Qt.red)
+        if role == Qt.DecorationRole and index.column() == self.thumbnail_column:
+            path = self.thumbs.get(self.rows[index.row()][0])
+            return None if path is None else THUMBNAILS.get(path)  # 只有可见单元格才会解码
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def set_query(self, filters, order=None):
+        self.filters = filters
+        self.order = order
+        if order == "random":
+            self.seed = random.getrandbits(48)  # 每次重新筛选换一个随机顺序，分页期间保持不变
+        self._start(0, True)
+
+    def reload(self):  # 保持当前筛选、排序和随机种子重新加载
+        self._start(0, True)
+
+    def _start(self, offset, reset):
+        if self.task is not None:
+            self.task.cancel()
+        self.request += 1
+        request = self.request
+        if reset:
+            self.epoch += 1
+            self.resetting = True
+        kwargs = {'limit': self.PAGE_SIZE, 'offset': offset}
+        if self.order is not None:  # None 表示使用 query 函数的默认排序
+            kwargs['order'] = self.order
+        if self.order == "random":
+            kwargs['seed'] = self.seed
+        started = time.perf_counter()
+        self.task = run_in_background(
+            self.query, self.filters, **kwargs,
+            on_done=lambda rows: self._loaded(request, rows, reset, started),
+            on_error=lambda error: self._failed(request, error),
+        )
+        self.statusChanged.emit("正在加载…")
+
+    def _loaded(self, request, rows, reset, started):
+        if request != self.request:
+            return  # 已被更新的查询取代
+        record_phase(f"{self.table} 加载", (time.perf_counter() - started) * 1000)  # 含排队和线程切换
+        with timed(f"{self.table} 填充表格"):
+            self._apply_rows(rows, reset)
+        self.statusChanged.emit("")
+
+    def _apply_rows(self, rows, reset):
+        self.task = None
+        self.has_more = len(rows) == self.PAGE_SIZE
+        if reset:
+            self.resetting = False
+            self.beginResetModel()
+            self.rows = rows
+            self.positions = None
+            self.thumbs = {}
+            self.endResetModel()
+        else:
+            positions = self._positions()
+            rows = [row for row in rows if row[0] not in positions]  # 翻页期间顶部插入了新行，偏移会错一位
+            if rows:
+                self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+                for pos, row in enumerate(rows, len(self.rows)):
+                    positions[row[0]] = pos
+                self.rows.extend(rows)
+                self.endInsertRows()
+        self._load_thumbs([row[0] for row in rows])
+
+    # 表格行只带文本列，哪些行有图另查一次附件表的索引，结果到了再刷新缩略图列
+    def _load_thumbs(self, ids):
+        if self.thumbnail_column is None or not ids:
+            return
+        epoch = self.epoch
+        run_in_background(get_first_attachments, ids, on_done=lambda paths: self._thumbs_loaded(epoch, ids, paths))
+
+    def _thumbs_loaded(self, epoch, ids, paths):
+        if epoch != self.epoch:
+            return
+        for row_id in ids:
+            if row_id in paths:
+                self.thumbs[row_id] = paths[row_id]
+            else:
+                self.thumbs.pop(row_id, None)  # 图片被删光了
+        self.refresh_thumbs()
+
+    def refresh_thumbs(self):
+        if self.thumbnail_column is not None and self.rows:
+            self.dataChanged.emit(self.index(0, self.thumbnail_column),
+                                  self.index(len(self.rows) - 1, self.thumbnail_column), [Qt.DecorationRole])
+
+    def _failed(self, request, error):
+        if request != self.request or isinstance(error, TaskCancelled):
+            return
+        log.error("加载 %s 失败: %r", self.table, error)
+        self.task = None
+        self.has_more = False
+        self.resetting = False
+        self.statusChanged.emit(f"加载失败: {error}")
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more and self.task is None
+
+    def fetchMore(self, parent=QModelIndex()):
+        self._start(len(self.rows), False)
+
+    def row_id(self, row):
+        return self.rows[row][0]
+
+    def _positions(self):
+        if self.positions is None:
+            self.positions = {row[0]: pos for pos, row in enumerate(self.rows)}
+        return self.positions
+
+    def _find(self, row_id):
+        return self._positions().get(row_id)
+
+    def _remove(self, pos):
+        self.beginRemoveRows(QModelIndex(), pos, pos)
+        self.thumbs.pop(self.rows[pos][0], None)
+        del self.rows[pos]
+        self.positions = None
+        self.endRemoveRows()
+
+    def apply_change(self, event):
+        if event.table != self.table:
+            return
+        if event.op == 'reset' or self.resetting:
+            self.reload()  # 整表都可能变了，或者正在加载的结果可能不包含这次修改
+            return
+        if event.op == 'delete':
+            pos = self._find(event.id)
+            if pos is not None:
+                self._remove(pos)
+            return
+        # 插入和修改：按当前筛选条件只查这一行，判断它该出现、更新还是从列表里移除
+        epoch = self.epoch
+        run_in_background(self.query, dict(self.filters, id=event.id),
+                          on_done=lambda rows: self._apply_row(epoch, event.id, rows[0] if rows else None))
+
+    def _apply_row(self, epoch, row_id, row):
+        if epoch != self.epoch:
+            return  # 期间整表已重新加载，新结果里已经包含这次修改
+        pos = self._find(row_id)
+        if row is None:
+            if pos is not None:
+                self._remove(pos)  # 修改后不再满足筛选条件
+        elif self.order in ("rank", "random"):
+            self.reload()  # 相关度和随机键不在行里，定不出这一行该排在哪，重新取第一页
+            return
+        elif pos is not None:
+            self.rows[pos] = row
+            self.dataChanged.emit(self.index(pos, 0), self.index(pos, len(self.headers) - 1))
+        else:
+            if self.order == "asc":
+                if self.has_more:
+                    return  # 新行排在还没加载的部分，翻到那里时自然会出现
+                pos = len(self.rows)
+            else:
+                pos = 0  # 倒序和最新优先排序下新行放在最上面
+            self.beginInsertRows(QModelIndex(), pos, pos)
+            self.rows.insert(pos, row)
+            self.positions = None
+            self.endInsertRows()
+        self._load_thumbs([row_id])
+
+class ChangeBus(QObject):
+    # 把 database 的变更通知转成 Qt 信号，写操作发生在后台线程时也能排队回到界面线程处理
+    changed = pyqtSignal(object)
+
+CHANGE_BUS = ChangeBus()
+subscribe(CHANGE_BUS.changed.emit)
+
+FILTER_DEBOUNCE_MS = 300  # 筛选控件停止变化多久后才真正查询
+
+class FilterController(QObject):
+    # 回顾页共用的筛选控制器：合并短时间内的多次筛选变化，只按最新的筛选条件查询
+    # 还没返回的旧查询由 RecordTableModel.set_query 打断并丢弃结果
+    def __init__(self, collect, apply, parent=None, delay=FILTER_DEBOUNCE_MS):
+        super().__init__(parent)
+        self.collect = collect  # 读取当前筛选条件，返回 dict
+        self.apply = apply  # apply(filters) 按筛选条件刷新表格
+        self.applied = None  # 上一次查询用的筛选条件
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self._run)
+
+    def set_delay(self, delay):
+        self.timer.setInterval(delay)
+
+    def schedule(self, *args):  # 接在筛选控件的变化信号上，每次变化都重新计时，信号参数忽略
+        self.timer.start()
+
+    def refresh(self):  # 立即按当前条件重新查询：首次加载、编辑保存后、切换排序
+        self.timer.stop()
+        self._run(force=True)
+
+    def _run(self, force=False):
+        filters = self.collect()
+        if not force and filters == self.applied:
+            return  # 条件和上次一样（例如输入一个字又删掉），不用重查
+        self.applied = filters
+        self.apply(filters)
+
+PREFETCH_ROWS = 3  # 选中一行时把上下各几行的完整记录预先读进缓存，双击打开对话框时不用再查库
+
+def enable_prefetch(table_view, model):
+    def prefetch(current, _previous):
+        if current.isValid():
+            rows = range(max(current.row() - PREFETCH_ROWS, 0), min(current.row() + PREFETCH_ROWS + 1, model.rowCount()))
+            run_in_background(prefetch_records, model.table, [model.row_id(row) for row in rows])
+    table_view.selectionModel().currentRowChanged.connect(prefetch)
+
+def make_status_label(model):  # 表格上方的加载状态提示，空闲时隐藏
+    label = QLabel()
+    label.setVisible(False)
+
+    def show_status(text):
+        label.setText(text)
+        label.setVisible(bool(text))
+
+    model.statusChanged.connect(show_status)
+    return label
+
+def selected_record_id(table):
+    rows = table.selectionModel().selectedRows()
+    if rows:
+        return table.model().row_id(rows[0].row())
+    return None
+
+# 在后台执行导入导出这类长任务，进度条上的“取消”会中止任务并回滚
+def run_with_progress(parent, label, fn, *args, on_done=None, on_error=None):
+    dialog = QProgressDialog(label, "取消", 0, 1000, parent)
+    dialog.setWindowModality(Qt.WindowModal)
+    dialog.setMinimumDuration(300)
+    dialog.setAutoClose(False)
+    dialog.setAutoReset(False)
+
+    def progress(count, fraction):
+        dialog.setLabelText(f"{label}（{count} 条）")
+        dialog.setValue(int(fraction * 1000))
+
+    def finish(callback, value):
+        dialog.close()
+        if callback is not None:
+            callback(value)
+
+    task = run_in_background(fn, *args, on_progress=progress,
+                             on_done=lambda result: finish(on_done, result),
+                             on_error=lambda error: finish(on_error, error))
+    dialog.canceled.connect(task.cancel)
+    return task
+
+# 单条记录的增删改放到写线程执行，界面线程不等磁盘；写完之前禁用 parent，防止重复提交
+# 成功时调用 on_done(返回值)，失败时弹出“{action}时出错”
+def write_in_background(parent, action, fn, *args, on_done=None):
+    parent.setEnabled(False)
+
+    def done(result):
+        parent.setEnabled(True)
+        if on_done is not None:
+            on_done(result)
+
+    def failed(error):
+        parent.setEnabled(True)
+        log.error("%s失败: %r", action, error)
+        QMessageBox.critical(parent, "错误", f"{action}时出错: {error}")
+
+    return run_write(fn, *args, on_done=done, on_error=failed)
+
+def import_csv_file(parent, table, noun):
+    path, _ = QFileDialog.getOpenFileName(parent, f"导入{noun}", "", "CSV Files (*.csv)")
+    if not path:
+        return
+
+    def failed(error):
+        if isinstance(error, (TaskCancelled, TransferCancelled)):
+            QMessageBox.information(parent, "已取消", f"导入已取消，没有写入任何{noun}。")
+        else:
+            QMessageBox.critical(parent, "错误", f"导入{noun}失败，已全部回滚: {error}")
+
+    def done(result):
+        message = f"已导入 {result.imported} 条{noun}！"
+        if result.skipped:
+            message += f"\n跳过重复的{noun} {result.skipped} 条。"
+        QMessageBox.information(parent, "成功", message)
+
+    run_with_progress(parent, f"正在导入{noun}…", import_csv, table, path, on_done=done, on_error=failed)
+
+EXPORT_FILTERS = {
+    "CSV Files (*.csv)": '.csv',
+    "JSON Lines (*.jsonl)": '.jsonl',
+    "gzip 压缩 CSV (*.csv.gz)": '.csv.gz',
+    "gzip 压缩 JSON Lines (*.jsonl.gz)": '.jsonl.gz',
+}
+
+CHANGE_EXPORT_HEADERS = ["变更序号", "操作"]
+
+def choose_export_path(parent, title):  # 没有写扩展名时按选中的格式补上，取消返回 None
+    path, selected = QFileDialog.getSaveFileName(parent, title, "", ";;".join(EXPORT_FILTERS))
+    if not path:
+        return None
+    if not path.endswith(tuple(EXPORT_FILTERS.values())):
+        path += EXPORT_FILTERS.get(selected, '.csv')
+    return path
+
+def export_failed(parent, noun):
+    def failed(error):
+        if isinstance(error, (TaskCancelled, TransferCancelled)):
+            QMessageBox.information(parent, "已取消", "导出已取消。")
+        else:
+            QMessageBox.critical(parent, "错误", f"导出{noun}失败: {error}")
+    return failed
+
+def export_table_file(parent, table, noun, headers):
+    path = choose_export_path(parent, f"导出{noun}")
+    if not path:
+        return
+    run_with_progress(parent, f"正在导出{noun}…", export_table, table, path, headers,
+                      on_done=lambda count: QMessageBox.information(parent, "成功", f"已导出 {count} 条{noun}！"),
+                      on_error=export_failed(parent, noun))
+
+# 只导出上次增量导出之后增删改过的记录；改了起始序号时是一次性的补导，不移动记下的位置
+def export_changes_file(parent, table, noun, headers):
+    watermark = get_change_watermark(table)
+    latest = current_change_seq()
+    since, ok = QInputDialog.getInt(parent, f"导出{noun}变更",
+                                    f"导出变更序号大于以下值的{noun}（上次导出到 {watermark}，当前最新 {latest}）:",
+                                    watermark, 0, max(latest, watermark))
+    if not ok:
+        return
+    path = choose_export_path(parent, f"导出{noun}变更")
+    if not path:
+        return
+
+    def done(result):
+        QMessageBox.information(parent, "成功", f"已导出 {result.exported} 条{noun}变更（序号 {result.since} 之后，到 {result.last_seq}）！")
+
+    run_with_progress(parent, f"正在导出{noun}变更…", export_changes, table, path,
+                      None if since == watermark else since, CHANGE_EXPORT_HEADERS + headers,
+                      on_done=done, on_error=export_failed(parent, noun))
+
+# 题干和答案与已有题目相同时询问是否仍然保存，返回 True 表示继续保存
+def confirm_duplicate_question(parent, content, answer, exclude_id=None):
+    duplicate = check_duplicate_question(content, answer, exclude_id)
+    if duplicate is None:
+        return True
+    reply = QMessageBox.question(parent, "重复", f"题库中已有相同的题目（ID {duplicate}），仍然保存吗？",
+                                 QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+    return reply == QMessageBox.Yes
+
+THUMBNAIL_SIZE = 32  # 回顾页表格里的缩略图边长
+ATTACHMENT_ICON_SIZE = 96  # 编辑和详情对话框里图片列表的图标边长
+THUMBNAIL_CACHE_BYTES = 16 * 1024 * 1024  # 缩略图缓存上限，按解码后的像素字节数计
+IMAGE_FILTER = "图片文件 (" + " ".join(f"*{ext}" for ext in ATTACHMENT_EXTS) + ")"
+
+# 读取图片，给了 size 时让解码器直接缩小到该边长以内（JPEG 能少解码大部分像素）
+# 只用 QImage，不碰 QPixmap，所以可以在后台线程里调用
+def decode_image(path, size=None):
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    if size is not None:
+        full = reader.size()
+        if full.isValid() and (full.width() > size or full.height() > size):
+            reader.setScaledSize(full.scaled(size, size, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"无法读取图片 {path}: {reader.errorString()}")
+    return image
+
+class ThumbnailCache(QObject):
+    # 缩略图的 LRU 缓存：按 (路径, 边长) 缓存解码结果，总字节数超过上限时淘汰最久没用的
+    # get 没命中时返回 None 并在后台解码，解码完成发出 ready，表格据此重绘
+    ready = pyqtSignal(str)
+
+    def __init__(self, max_bytes=THUMBNAIL_CACHE_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.images = OrderedDict()  # (路径, 边长) -> (QPixmap, 字节数)
+        self.pending = set()
+        self.failed = set()  # 读不出来的图不再重试
+
+    def get(self, path, size=THUMBNAIL_SIZE):
+        key = (path, size)
+        cached = self.images.get(key)
+        if cached is not None:
+            self.images.move_to_end(key)
+            return cached[0]
+        if key not in self.pending and key not in self.failed:
+            self.pending.add(key)
+            run_image_task(decode_image, path, size,
+                           on_done=lambda image: self._decoded(key, image),
+                           on_error=lambda error: self._failed(key, error))
+        return None
+
+    def _decoded(self, key, image):
+        self.pending.discard(key)
+        size = image.sizeInBytes()
+        self.images[key] = (QPixmap.fromImage(image), size)  # QPixmap 只能在界面线程创建
+        self.bytes += size
+        while self.bytes > self.max_bytes and len(self.images) > 1:
+            _, (_, old_size) = self.images.popitem(last=False)
+            self.bytes -= old_size
+        self.ready.emit(key[0])
+
+    def _failed(self, key, error):
+        self.pending.discard(key)
+        if not isinstance(error, TaskCancelled):
+            log.warning("缩略图解码失败: %s", error)
+            self.failed.add(key)
+
+    def clear(self):
+        self.images.clear()
+        self.bytes = 0
+        self.failed.clear()
+
+THUMBNAILS = ThumbnailCache()
+
+class ImageViewer(QDialog):
+    # 原图只在这里解码，关闭对话框后随之释放
+    def __init__(self, path, title="查看图片"):
+        super().__init__()
+        self.setWindowTitle(title)
+        self.resize(800, 600)
+        label = QLabel()
+        label.setAlignment(Qt.AlignCenter)
+        try:
+            label.setPixmap(QPixmap.fromImage(decode_image(path)))
+        except Exception as e:
+            label.setText(str(e))
+        scroll = QScrollArea()
+        scroll.setWidget(label)
+        scroll.setWidgetResizable(True)
+        layout = QVBoxLayout()
+        layout.addWidget(scroll)
+        self.setLayout(layout)
+
+class AttachmentPanel(QWidget):
+    # 题目图片列表：图标用缩略图缓存，双击看原图；editable 时可以添加和删除，改动立即写入数据库
+    def __init__(self, qid=None, editable=True):
+        super().__init__()
+        self.qid = qid
+        self.editable = editable
+        self.attachments = []
+        self.list = QListWidget()
+        self.list.setViewMode(QListWidget.IconMode)
+        self.list.setIconSize(QSize(ATTACHMENT_ICON_SIZE, ATTACHMENT_ICON_SIZE))
+        self.list.setResizeMode(QListWidget.Adjust)
+        self.list.setFixedHeight(ATTACHMENT_ICON_SIZE + 40)
+        self.list.itemDoubleClicked.connect(self.open_image)
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.list)
+        if editable:
+            buttons = QVBoxLayout()
+            add_btn = QPushButton("添加图片")
+            add_btn.clicked.connect(self.add_images)
+            delete_btn = QPushButton("删除图片")
+            delete_btn.clicked.connect(self.delete_image)
+            buttons.addWidget(add_btn)
+            buttons.addWidget(delete_btn)
+            buttons.addStretch()
+            layout.addLayout(buttons)
+        self.setLayout(layout)
+        THUMBNAILS.ready.connect(self.update_icons)
+        self.load(qid)
+
+    def load(self, qid):
+        self.qid = qid
+        self.attachments = get_attachments(qid) if qid is not None else []
+        self.list.clear()
+        for attachment in self.attachments:
+            item = QListWidgetItem(attachment.name)
+            item.setToolTip(f"{attachment.name} ({attachment.size // 1024} KB)")
+            self.list.addItem(item)
+        self.update_icons()
+        if not self.editable and (not self.attachments or self.parentWidget() is not None):
+            self.setVisible(bool(self.attachments))  # 只读时没有图就不占位置；放进布局之前 show 会变成独立窗口
+
+    def update_icons(self, path=None):
+        for row, attachment in enumerate(self.attachments):
+            if path is None or attachment.path == path:
+                pixmap = THUMBNAILS.get(attachment.path, ATTACHMENT_ICON_SIZE)
+                if pixmap is not None:
+                    self.list.item(row).setIcon(QIcon(pixmap))
+
+    def add_images(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "添加图片", "", IMAGE_FILTER)
+        if not paths:
+            return
+        qid = self.qid
+
+        def add_all():
+            for path in paths:
+                add_attachment(qid, path)
+
+        task = write_in_background(self, "添加图片", add_all, on_done=lambda _: self.load(qid))
+        task.signals.failed.connect(lambda _: self.load(qid))  # 出错前已经加上的图片照样显示
+
+    def delete_image(self):
+        row = self.list.currentRow()
+        if row < 0:
+            QMessageBox.warning(self, "警告", "请先选择要删除的图片")
+            return
+        reply = QMessageBox.question(self, "确认", "确定要删除这张图片吗？", QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            qid = self.qid
+            write_in_background(self, "删除图片", delete_attachment, self.attachments[row].id,
+                                on_done=lambda _: self.load(qid))
+
+    def open_image(self, item):
+        attachment = self.attachments[self.list.row(item)]
+        ImageViewer(attachment.path, attachment.name).exec_()
 
 class InputTab(QWidget):
     def __init__(self):
@@ -34,6 +600,18 @@ class InputTab(QWidget):
         form_layout.addRow("错题解析:", self.analysis)  # 新增错题解析字段
         form_layout.addRow("题型:", self.question_type)  # 新增题型字段
         form_layout.addRow("录入时间:", self.entry_time)  # 新增录入时间字段
+
+        self.images = []  # 待保存的图片路径，题目保存后再复制进图片目录
+        self.images_label = QLabel("未添加图片")
+        image_btn = QPushButton("添加图片")
+        image_btn.clicked.connect(self.choose_images)
+        clear_images_btn = QPushButton("清除图片")
+        clear_images_btn.clicked.connect(lambda: self.set_images([]))
+        image_layout = QHBoxLayout()
+        image_layout.addWidget(self.images_label, 1)
+        image_layout.addWidget(image_btn)
+        image_layout.addWidget(clear_images_btn)
+        form_layout.addRow("题目图片:", image_layout)
         
         submit_btn = QPushButton("保存题目")
         submit_btn.clicked.connect(self.save)
@@ -42,30 +620,49 @@ class InputTab(QWidget):
         layout.addWidget(submit_btn)
         self.setLayout(layout)
 
+    def choose_images(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "添加图片", "", IMAGE_FILTER)
+        if paths:
+            self.set_images(self.images + paths)
+
+    def set_images(self, paths):
+        self.images = paths
+        self.images_label.setText(f"已添加 {len(paths)} 张图片" if paths else "未添加图片")
+
     def save(self):
-        try:
-            new_id = add_question(
-                self.module.currentText(),
-                self.source.text(),
-                self.content.toPlainText(),
-                self.answer.text(),
-                self.analysis.toPlainText(),  # 保存错题解析
-                self.question_type.text(),  # 保存题型
-                self.entry_time.date().toString("yyyy-MM-dd")  # 保存录入时间
-            )
-            QMessageBox.information(self, "成功", "题目已保存！")
-            self.source.clear()
-            self.content.clear()
-            self.answer.clear()
-            self.analysis.clear()  # 清空错题解析字段
-            self.question_type.clear()  # 清空题型字段
-            self.entry_time.setDate(QDate.currentDate())  # 重置录入时间字段
-            self.parentWidget().parentWidget().parentWidget().review_tab.load_data()  # 确保正确调用 load_data
-        except Exception as e:
-            print(f"Error: {e}")  # 添加调试信息
-            QMessageBox.critical(self, "错误", f"保存题目时出错: {e}")
+        if not confirm_duplicate_question(self, self.content.toPlainText(), self.answer.text()):
+            return
+        values = (
+            self.module.currentText(),
+            self.source.text(),
+            self.content.toPlainText(),
+            self.answer.text(),
+            self.analysis.toPlainText(),  # 保存错题解析
+            self.question_type.text(),  # 保存题型
+            self.entry_time.date().toString("yyyy-MM-dd")  # 保存录入时间
+        )
+        images = list(self.images)
+
+        def write():
+            new_id = add_question(*values)
+            for path in images:
+                add_attachment(new_id, path)
+
+        write_in_background(self, "保存题目", write, on_done=self.saved)
+
+    def saved(self, _):
+        QMessageBox.information(self, "成功", "题目已保存！")
+        self.source.clear()
+        self.content.clear()
+        self.answer.clear()
+        self.analysis.clear()  # 清空错题解析字段
+        self.question_type.clear()  # 清空题型字段
+        self.entry_time.setDate(QDate.currentDate())  # 重置录入时间字段
+        self.set_images([])
 
 class ReviewTab(QWidget):
+    EXPORT_HEADERS = ["ID", "题型模块", "题目来源", "题目内容", "正确答案", "复盘次数", "题型", "录入时间"]
+
     def __init__(self):
         super().__init__()
         self.setup_ui()
@@ -73,24 +670,26 @@ class ReviewTab(QWidget):
 
     def setup_ui(self):
         layout = QVBoxLayout()
+        self.filter_controller = FilterController(self.current_filters, self.apply_filters, self)
         
         filter_layout = QHBoxLayout()
         
         self.filter_input = QLineEdit()
         self.filter_input.setPlaceholderText("输入关键词筛选题目")
-        self.filter_input.textChanged.connect(self.load_data)  # 绑定筛选事件
+        self.filter_input.textChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
 
         self.module_filter = QComboBox()
         self.module_filter.addItems(["全部", "言语理解", "数量关系", "判断推理", "资料分析", "常识判断"])
-        self.module_filter.currentIndexChanged.connect(self.load_data)  # 绑定筛选事件
+        self.module_filter.currentIndexChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
 
         self.source_filter = QComboBox()
-        self.source_filter.addItems(["全部"] + get_all_sources())
-        self.source_filter.currentIndexChanged.connect(self.load_data)  # 绑定筛选事件
+        self.source_filter.addItem("全部")
+        run_in_background(get_all_sources, on_done=self.source_filter.addItems)  # 来源列表在后台读取
+        self.source_filter.currentIndexChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
 
         self.question_type_filter = QLineEdit()
         self.question_type_filter.setPlaceholderText("输入题型筛选")
-        self.question_type_filter.textChanged.connect(self.load_data)  # 绑定筛选事件
+        self.question_type_filter.textChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
 
         self.entry_time_filter = QComboBox()
         self.entry_time_filter.addItems(["全部时间", "选择日期"])
@@ -100,11 +699,11 @@ class ReviewTab(QWidget):
         self.entry_time_date.setCalendarPopup(True)
         self.entry_time_date.setDisplayFormat("yyyy-MM-dd")
         self.entry_time_date.setVisible(False)
-        self.entry_time_date.dateChanged.connect(self.load_data)  # 绑定筛选事件
+        self.entry_time_date.dateChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
 
         self.reviews_filter = QLineEdit()
         self.reviews_filter.setPlaceholderText("输入复盘次数筛选")
-        self.reviews_filter.textChanged.connect(self.load_data)  # 绑定筛选事件
+        self.reviews_filter.textChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
 
         self.sort_order = "asc"
         self.sort_button = QPushButton("ID排序: 正序")
@@ -125,12 +724,16 @@ class ReviewTab(QWidget):
         filter_layout.addWidget(self.reviews_filter)
         filter_layout.addWidget(self.sort_button)
         
-        self.table = QTableWidget()
-        self.table.setColumnCount(8)  # 修改列数为8
-        self.table.setHorizontalHeaderLabels(["ID", "题型模块", "题目来源", "题目内容", "正确答案", "复盘次数", "题型", "录入时间"])  # 修改表头
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)  # 设置选择行为为选择行
-        self.table.setSelectionMode(QTableWidget.SingleSelection)  # 设置选择模式为单选
-        self.table.cellDoubleClicked.connect(self.edit_question)
+        self.model = RecordTableModel("questions", ["ID", "题型模块", "题目来源", "题目内容", "正确答案", "复盘次数", "题型", "录入时间"], query_questions, 4, 3)  # 正确答案列标红，题目内容列显示缩略图
+        THUMBNAILS.ready.connect(lambda _: self.model.refresh_thumbs())
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        enable_prefetch(self.table, self.model)
+        self.table.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.table.verticalHeader().setDefaultSectionSize(THUMBNAIL_SIZE + 4)
+        self.table.setSelectionBehavior(QTableView.SelectRows)  # 设置选择行为为选择行
+        self.table.setSelectionMode(QTableView.SingleSelection)  # 设置选择模式为单选
+        self.table.doubleClicked.connect(self.edit_question)
 
         delete_btn = QPushButton("删除题目")
         delete_btn.clicked.connect(self.delete_question)
@@ -138,13 +741,26 @@ class ReviewTab(QWidget):
         export_btn = QPushButton("导出题目")
         export_btn.clicked.connect(self.export_data)
 
+        export_changes_btn = QPushButton("导出题目变更")
+        export_changes_btn.clicked.connect(self.export_changes)
+
         import_btn = QPushButton("导入题目")
         import_btn.clicked.connect(self.import_data)
 
+        session_btn = QPushButton("开始复习到期题目")
+        session_btn.clicked.connect(self.start_session)
+
+        drill_btn = QPushButton("按当前筛选随机抽题")
+        drill_btn.clicked.connect(self.start_drill)
+
         layout.addLayout(filter_layout)
+        layout.addWidget(make_status_label(self.model))
         layout.addWidget(self.table)
+        layout.addWidget(session_btn)
+        layout.addWidget(drill_btn)
         layout.addWidget(delete_btn)
         layout.addWidget(export_btn)
+        layout.addWidget(export_changes_btn)
         layout.addWidget(import_btn)
         self.setLayout(layout)
 
@@ -153,38 +769,29 @@ class ReviewTab(QWidget):
             self.entry_time_date.setVisible(True)
         else:
             self.entry_time_date.setVisible(False)
-            self.load_data()
+            self.filter_controller.schedule()
 
     def load_data(self):
+        self.filter_controller.refresh()
+
+    def current_filters(self):
         filter_text = self.filter_input.text()
         selected_module = self.module_filter.currentText()
         selected_source = self.source_filter.currentText()
         selected_question_type = self.question_type_filter.text()
         selected_entry_time = self.entry_time_date.date().toString("yyyy-MM-dd") if self.entry_time_filter.currentText() == "选择日期" else ""
         selected_reviews = self.reviews_filter.text()
-        self.table.setRowCount(0)
-        questions = get_all_questions()
-        if self.sort_order == "asc":
-            questions.sort(key=lambda x: x[0])
-        elif self.sort_order == "desc":
-            questions.sort(key=lambda x: x[0], reverse=True)
-        elif self.sort_order == "random":
-            import random
-            random.shuffle(questions)
-        for row in questions:
-            if (selected_module == "全部" or row[1] == selected_module) and \
-               (selected_source == "全部" or row[2] == selected_source) and \
-               (selected_question_type == "" or row[6] == selected_question_type) and \
-               (selected_entry_time == "" or row[7] == selected_entry_time) and \
-               (selected_reviews == "" or str(row[5]) == selected_reviews) and \
-               filter_text.lower() in str(row).lower():  # 根据关键词进行筛选
-                row_pos = self.table.rowCount()
-                self.table.insertRow(row_pos)
-                for col, item in enumerate(row):  # 确保处理所有字段，包括 entry_time
-                    table_item = QTableWidgetItem(str(item))
-                    if col == 4:  # 正确答案列
-                        table_item.setForeground(Qt.red)
-                    self.table.setItem(row_pos, col, table_item)
+        return {
+            'keyword': filter_text,
+            'module': "" if selected_module == "全部" else selected_module,
+            'source': "" if selected_source == "全部" else selected_source,
+            'question_type': selected_question_type,
+            'entry_time': selected_entry_time,
+            'reviews': selected_reviews,
+        }
+
+    def apply_filters(self, filters):
+        self.model.set_query(filters, self.sort_order)  # 筛选和排序交给 SQL
 
     def toggle_sort_order(self):
         if self.sort_order == "asc":
@@ -193,48 +800,129 @@ class ReviewTab(QWidget):
         elif self.sort_order == "desc":
             self.sort_order = "random"
             self.sort_button.setText("ID排序: 随机")
+        elif self.sort_order == "random":
+            self.sort_order = "rank"  # 按关键词相关度排序，没有关键词时按 ID 正序
+            self.sort_button.setText("排序: 相关度")
         else:
             self.sort_order = "asc"
             self.sort_button.setText("ID排序: 正序")
         self.load_data()
 
-    def edit_question(self, row):
-        qid = int(self.table.item(row, 0).text())
+    def edit_question(self, index):
+        qid = self.model.row_id(index.row())
         dialog = EditDialog(qid)
-        if dialog.exec_():
-            self.load_data()
+        dialog.exec_()  # 保存后由变更通知刷新对应的行
+
+    def start_session(self):
+        dialog = ReviewSessionDialog()
+        dialog.exec_()  # 复盘次数的变化由变更通知同步到表格
+
+    def start_drill(self):
+        count, ok = QInputDialog.getInt(self, "随机抽题", "抽题数量:", DRILL_SIZE, 1, 500)
+        if not ok:
+            return
+        filters = self.current_filters()
+        stratify = 'module' if not filters['module'] else None  # 不限模块时按各模块题量比例抽
+        seed = random.getrandbits(32)  # 显示在标题里，同样的种子可以复现这组题
+        run_in_background(sample_questions, count, filters, stratify=stratify, seed=seed,
+                          on_done=lambda rows: self.drill_loaded(rows, seed),
+                          on_error=lambda e: QMessageBox.critical(self, "错误", f"抽题时出错: {e}"))
+
+    def drill_loaded(self, rows, seed):
+        if not rows:
+            QMessageBox.information(self, "提示", "没有符合筛选条件的题目。")
+            return
+        dialog = ReviewSessionDialog(rows, f"随机抽题练习（种子 {seed}）")
+        dialog.exec_()
 
     def delete_question(self):
-        selected_items = self.table.selectedItems()
-        if selected_items:
-            qid = int(selected_items[0].text())
-            try:
-                delete_question(qid)
-                QMessageBox.information(self, "成功", "题目已删除！")
-                self.load_data()
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"删除题目时出错: {e}")
+        qid = selected_record_id(self.table)
+        if qid is not None:
+            write_in_background(self, "删除题目", delete_question, qid,
+                                on_done=lambda _: QMessageBox.information(self, "成功", "题目已删除！"))
 
     def export_data(self):
-        path, _ = QFileDialog.getSaveFileName(self, "导出题目", "", "CSV Files (*.csv)")
-        if path:
-            with open(path, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(["ID", "题型模块", "题目来源", "题目内容", "正确答案", "复盘次数", "题型", "录入时间"])
-                for row in get_all_questions():
-                    writer.writerow(row)
-            QMessageBox.information(self, "成功", "题目已导出！")
+        export_table_file(self, 'questions', "题目", self.EXPORT_HEADERS)
+
+    def export_changes(self):
+        export_changes_file(self, 'questions', "题目", self.EXPORT_HEADERS)
 
     def import_data(self):
-        path, _ = QFileDialog.getOpenFileName(self, "导入题目", "", "CSV Files (*.csv)")
-        if path:
-            with open(path, 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                next(reader)  # 跳过表头
-                for row in reader:
-                    add_question(row[1], row[2], row[3], row[4], row[5], row[6], row[7])
-            self.load_data()
-            QMessageBox.information(self, "成功", "题目已导入！")
+        import_csv_file(self, 'questions', "题目")
+
+class IdiomIndexLoader(QObject):
+    # 成语前缀索引在后台线程建立：第一次用到时建一次，批量导入、同步发出 'reset' 后再重建
+    # 补全和重名提示在索引建好之前不等待，收到 loaded 后按当前输入刷新
+    loaded = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.task = None
+        self.used = False
+        CHANGE_BUS.changed.connect(self.on_change)
+
+    def ensure(self):
+        self.used = True
+        if self.task is None and not idiom_index_ready():
+            self.task = run_in_background(load_idiom_index, on_done=self._done, on_error=self._failed)
+
+    def _done(self, _):
+        self.task = None
+        if idiom_index_ready():
+            self.loaded.emit()
+        else:
+            self.ensure()  # 建的过程中又收到了 'reset'
+
+    def _failed(self, error):  # 下一次用到时重试
+        self.task = None
+        log.error("加载成语补全索引失败: %r", error)
+
+    def on_change(self, event):
+        if event.table == 'idioms' and event.op == 'reset' and self.used:
+            self.ensure()
+
+IDIOM_INDEX = IdiomIndexLoader()
+
+class IdiomCompleter(QCompleter):
+    # 成语名称补全：汉字前缀、全拼、首字母都能匹配，候选由 database 的前缀索引给出，不用 Qt 自带的前缀过滤
+    def __init__(self, line_edit):
+        super().__init__(line_edit)
+        self.line_edit = line_edit
+        self.setModel(QStringListModel(self))
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        line_edit.setCompleter(self)
+        line_edit.textEdited.connect(self.update_candidates)
+        IDIOM_INDEX.loaded.connect(self.refresh)
+        IDIOM_INDEX.ensure()
+
+    def refresh(self):  # 索引建好时补上正在输入的候选
+        if self.line_edit.hasFocus():
+            self.update_candidates(self.line_edit.text())
+
+    def update_candidates(self, text):
+        self.model().setStringList(complete_idioms(text))
+        if text.strip():
+            self.complete()
+
+class DuplicateHint(QLabel):
+    # 输入的成语名称已存在时立即显示的提示
+    def __init__(self, line_edit, exclude_id=None):
+        super().__init__()
+        self.line_edit = line_edit
+        self.exclude_id = exclude_id
+        self.setStyleSheet("color: red")
+        self.setVisible(False)
+        line_edit.textChanged.connect(self.check)
+        IDIOM_INDEX.loaded.connect(self.refresh)
+        IDIOM_INDEX.ensure()
+
+    def refresh(self):
+        self.check(self.line_edit.text())
+
+    def check(self, text):
+        qid = find_idiom(text) if text.strip() else None
+        self.setText(f"成语已存在（ID {qid}）" if qid is not None and qid != self.exclude_id else "")
+        self.setVisible(bool(self.text()))
 
 class IdiomInputTab(QWidget):
     def __init__(self):
@@ -255,8 +943,11 @@ class IdiomInputTab(QWidget):
         self.entry_time = QDateEdit()  # 新增录入时间字段
         self.entry_time.setCalendarPopup(True)
         
+        self.name_completer = IdiomCompleter(self.name)
+        
         form_layout.addRow("成语分类:", self.category)
         form_layout.addRow("成语名称:", self.name)
+        form_layout.addRow("", DuplicateHint(self.name))
         form_layout.addRow("语义:", self.meaning)
         form_layout.addRow("常用语境:", self.context)
         form_layout.addRow("固定搭配:", self.collocation)
@@ -274,29 +965,31 @@ class IdiomInputTab(QWidget):
         if check_duplicate_idiom(self.name.text()):
             QMessageBox.warning(self, "重复", "成语已存在！")
             return
-        try:
-            new_id = add_idiom(
-                self.category.text(),
-                self.name.text(),
-                self.meaning.toPlainText(),
-                self.context.toPlainText(),
-                self.collocation.toPlainText(),
-                self.example.toPlainText(),
-                self.entry_time.date().toString("yyyy-MM-dd")  # 保存录入时间
-            )
-            QMessageBox.information(self, "成功", "成语已保存！")
-            self.category.clear()
-            self.name.clear()
-            self.meaning.clear()
-            self.context.clear()
-            self.collocation.clear()
-            self.example.clear()
-            self.entry_time.setDate(QDate.currentDate())  # 重置录入时间字段
-            self.parentWidget().parentWidget().parentWidget().idiom_review_tab.load_data()  # 确保正确调用 load_data
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"保存成语时出错: {e}")
+        write_in_background(
+            self, "保存成语", add_idiom,
+            self.category.text(),
+            self.name.text(),
+            self.meaning.toPlainText(),
+            self.context.toPlainText(),
+            self.collocation.toPlainText(),
+            self.example.toPlainText(),
+            self.entry_time.date().toString("yyyy-MM-dd"),  # 保存录入时间
+            on_done=self.saved
+        )
+
+    def saved(self, _):
+        QMessageBox.information(self, "成功", "成语已保存！")
+        self.category.clear()
+        self.name.clear()
+        self.meaning.clear()
+        self.context.clear()
+        self.collocation.clear()
+        self.example.clear()
+        self.entry_time.setDate(QDate.currentDate())  # 重置录入时间字段
 
 class IdiomReviewTab(QWidget):
+    EXPORT_HEADERS = ["ID", "分类", "名称", "语义", "常用语境", "固定搭配", "例句", "录入时间"]
+
     def __init__(self):
         super().__init__()
         self.setup_ui()
@@ -304,28 +997,31 @@ class IdiomReviewTab(QWidget):
 
     def setup_ui(self):
         layout = QVBoxLayout()
+        self.filter_controller = FilterController(self.current_filters, self.apply_filters, self)
         
         filter_layout = QHBoxLayout()
         
         self.filter_input = QLineEdit()
         self.filter_input.setPlaceholderText("输入关键词筛选成语")
-        self.filter_input.textChanged.connect(self.load_data)  # 绑定筛选事件
+        self.filter_input.textChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
+        self.filter_completer = IdiomCompleter(self.filter_input)
 
         self.category_filter = QLineEdit()
         self.category_filter.setPlaceholderText("输入分类筛选成语")
-        self.category_filter.textChanged.connect(self.load_data)  # 绑定筛选事件
+        self.category_filter.textChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
         
         filter_layout.addWidget(QLabel("关键词:"))
         filter_layout.addWidget(self.filter_input)
         filter_layout.addWidget(QLabel("分类:"))
         filter_layout.addWidget(self.category_filter)
         
-        self.table = QTableWidget()
-        self.table.setColumnCount(8)  # 修改列数为8
-        self.table.setHorizontalHeaderLabels(["ID", "分类", "名称", "语义", "常用语境", "固定搭配", "例句", "录入时间"])  # 修改表头
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)  # 设置选择行为为选择行
-        self.table.setSelectionMode(QTableWidget.SingleSelection)  # 设置选择模式为单选
-        self.table.cellDoubleClicked.connect(self.edit_idiom)
+        self.model = RecordTableModel("idioms", ["ID", "分类", "名称", "语义", "常用语境", "固定搭配", "例句", "录入时间"], query_idioms)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        enable_prefetch(self.table, self.model)
+        self.table.setSelectionBehavior(QTableView.SelectRows)  # 设置选择行为为选择行
+        self.table.setSelectionMode(QTableView.SingleSelection)  # 设置选择模式为单选
+        self.table.doubleClicked.connect(self.edit_idiom)
 
         delete_btn = QPushButton("删除成语")
         delete_btn.clicked.connect(self.delete_idiom)
@@ -333,65 +1029,54 @@ class IdiomReviewTab(QWidget):
         export_btn = QPushButton("导出成语")
         export_btn.clicked.connect(self.export_data)
 
+        export_changes_btn = QPushButton("导出成语变更")
+        export_changes_btn.clicked.connect(self.export_changes)
+
         import_btn = QPushButton("导入成语")
         import_btn.clicked.connect(self.import_data)
 
         layout.addLayout(filter_layout)
+        layout.addWidget(make_status_label(self.model))
         layout.addWidget(self.table)
         layout.addWidget(delete_btn)
         layout.addWidget(export_btn)
+        layout.addWidget(export_changes_btn)
         layout.addWidget(import_btn)
         self.setLayout(layout)
 
     def load_data(self):
-        filter_text = self.filter_input.text()
-        selected_category = self.category_filter.text()
-        self.table.setRowCount(0)
-        for row in get_all_idioms():
-            if (selected_category == "" or row[1] == selected_category) and \
-               filter_text.lower() in str(row).lower():  # 根据关键词进行筛选
-                row_pos = self.table.rowCount()
-                self.table.insertRow(row_pos)
-                for col, item in enumerate(row[:8]):  # 修改列数为8
-                    self.table.setItem(row_pos, col, QTableWidgetItem(str(item)))
-
-    def edit_idiom(self, row):
-        qid = int(self.table.item(row, 0).text())
+        self.filter_controller.refresh()
+
+    def current_filters(self):
+        return {'keyword': self.filter_input.text(), 'category': self.category_filter.text()}
+
+    def apply_filters(self, filters):
+        self.model.set_query(filters, 'rank')
+
+    def edit_idiom(self, index):
+        qid = self.model.row_id(index.row())
         dialog = EditIdiomDialog(qid)
-        if dialog.exec_():
-            self.load_data()
+        dialog.exec_()  # 保存后由变更通知刷新对应的行
 
     def delete_idiom(self):
-        selected_items = self.table.selectedItems()
-        if selected_items:
-            qid = int(selected_items[0].text())
-            try:
-                delete_idiom(qid)
-                QMessageBox.information(self, "成功", "成语已删除！")
-                self.load_data()
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"删除成语时出错: {e}")
+        qid = selected_record_id(self.table)
+        if qid is not None:
+            write_in_background(self, "删除成语", delete_idiom, qid,
+                                on_done=lambda _: QMessageBox.information(self, "成功", "成语已删除！"))
 
     def export_data(self):
-        path, _ = QFileDialog.getSaveFileName(self, "导出成语", "", "CSV Files (*.csv)")
-        if path:
-            with open(path, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(["ID", "分类", "名称", "语义", "常用语境", "固定搭配", "例句", "录入时间"])
-                for row in get_all_idioms():
-                    writer.writerow(row)
-            QMessageBox.information(self, "成功", "成语已导出！")
+        export_table_file(self, 'idioms', "成语", self.EXPORT_HEADERS)
+
+    def export_changes(self):
+        export_changes_file(self, 'idioms', "成语", self.EXPORT_HEADERS)
 
     def import_data(self):
-        path, _ = QFileDialog.getOpenFileName(self, "导入成语", "", "CSV Files (*.csv)")
-        if path:
-            with open(path, 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                next(reader)  # 跳过表头
-                for row in reader:
-                    add_idiom(row[1], row[2], row[3], row[4], row[5], row[6], row[7])
-            self.load_data()
-            QMessageBox.information(self, "成功", "成语已导入！")
+        import_csv_file(self, 'idioms', "成语")
+
+# 套卷表格和导出的列头，与 EXAM_WIDE_COLUMNS 的宽表顺序一致
+EXAM_HEADERS = (["ID", "年份", "完成日期", "卷名"]
+                + [f"{label}{suffix}" for _, label in EXAM_SECTIONS for suffix in ("总数", "正确数")]
+                + ["总正确数", "总题量", "成绩"])
 
 class ExamInputTab(QWidget):
     def __init__(self):
@@ -406,49 +1091,19 @@ class ExamInputTab(QWidget):
         self.completion_date = QDateEdit()
         self.completion_date.setCalendarPopup(True)
         self.paper_name = QLineEdit()
-        self.politics_total = QLineEdit()  # 修改为 QLineEdit
-        self.politics_correct = QLineEdit()  # 修改为 QLineEdit
-        self.general_knowledge_total = QLineEdit()  # 修改为 QLineEdit
-        self.general_knowledge_correct = QLineEdit()  # 修改为 QLineEdit
-        self.logic_total = QLineEdit()  # 修改为 QLineEdit
-        self.logic_correct = QLineEdit()  # 修改为 QLineEdit
-        self.fragment_total = QLineEdit()  # 修改为 QLineEdit
-        self.fragment_correct = QLineEdit()  # 修改为 QLineEdit
-        self.quantitative_total = QLineEdit()  # 修改为 QLineEdit
-        self.quantitative_correct = QLineEdit()  # 修改为 QLineEdit
-        self.graphic_reasoning_total = QLineEdit()  # 修改为 QLineEdit
-        self.graphic_reasoning_correct = QLineEdit()  # 修改为 QLineEdit
-        self.definition_total = QLineEdit()  # 修改为 QLineEdit
-        self.definition_correct = QLineEdit()  # 修改为 QLineEdit
-        self.analogy_total = QLineEdit()  # 修改为 QLineEdit
-        self.analogy_correct = QLineEdit()  # 修改为 QLineEdit
-        self.data_analysis_total = QLineEdit()  # 修改为 QLineEdit
-        self.data_analysis_correct = QLineEdit()  # 修改为 QLineEdit
-        self.total_correct = QLineEdit()  # 修改为 QLineEdit
-        self.total_questions = QLineEdit()  # 修改为 QLineEdit
-        self.score = QLineEdit()  # 修改为 QLineEdit
+        self.sections = {}  # 模块名 -> (总数输入框, 正确数输入框)
+        self.total_correct = QLineEdit()
+        self.total_questions = QLineEdit()
+        self.score = QLineEdit()
         
         form_layout.addRow("年份:", self.year)
         form_layout.addRow("完成日期:", self.completion_date)
         form_layout.addRow("卷名:", self.paper_name)
-        form_layout.addRow("政治总数:", self.politics_total)
-        form_layout.addRow("政治正确数:", self.politics_correct)
-        form_layout.addRow("常识总数:", self.general_knowledge_total)
-        form_layout.addRow("常识正确数:", self.general_knowledge_correct)
-        form_layout.addRow("逻辑总数:", self.logic_total)
-        form_layout.addRow("逻辑正确数:", self.logic_correct)
-        form_layout.addRow("片段总数:", self.fragment_total)
-        form_layout.addRow("片段正确数:", self.fragment_correct)
-        form_layout.addRow("数量关系总数:", self.quantitative_total)
-        form_layout.addRow("数量关系正确数:", self.quantitative_correct)
-        form_layout.addRow("图推总数:", self.graphic_reasoning_total)
-        form_layout.addRow("图推正确数:", self.graphic_reasoning_correct)
-        form_layout.addRow("定义总数:", self.definition_total)
-        form_layout.addRow("定义正确数:", self.definition_correct)
-        form_layout.addRow("类比总数:", self.analogy_total)
-        form_layout.addRow("类比正确数:", self.analogy_correct)
-        form_layout.addRow("资料分析总数:", self.data_analysis_total)
-        form_layout.addRow("资料分析正确数:", self.data_analysis_correct)
+        for name, label in EXAM_SECTIONS:
+            total, correct = QLineEdit(), QLineEdit()
+            self.sections[name] = (total, correct)
+            form_layout.addRow(f"{label}总数:", total)
+            form_layout.addRow(f"{label}正确数:", correct)
         form_layout.addRow("总正确数:", self.total_correct)
         form_layout.addRow("总题量:", self.total_questions)
         form_layout.addRow("成绩:", self.score)
@@ -462,66 +1117,38 @@ class ExamInputTab(QWidget):
 
     def save(self):
         try:
-            new_id = add_exam_paper(
+            values = (
                 int(self.year.text()),
                 self.completion_date.date().toString("yyyy-MM-dd"),
                 self.paper_name.text(),
-                int(self.politics_total.text()),  # 转换为整数
-                int(self.politics_correct.text()),  # 转换为整数
-                int(self.general_knowledge_total.text()),  # 转换为整数
-                int(self.general_knowledge_correct.text()),  # 转换为整数
-                int(self.logic_total.text()),  # 转换为整数
-                int(self.logic_correct.text()),  # 转换为整数
-                int(self.fragment_total.text()),  # 转换为整数
-                int(self.fragment_correct.text()),  # 转换为整数
-                int(self.quantitative_total.text()),  # 转换为整数
-                int(self.quantitative_correct.text()),  # 转换为整数
-                int(self.graphic_reasoning_total.text()),  # 转换为整数
-                int(self.graphic_reasoning_correct.text()),  # 转换为整数
-                int(self.definition_total.text()),  # 转换为整数
-                int(self.definition_correct.text()),  # 转换为整数
-                int(self.analogy_total.text()),  # 转换为整数
-                int(self.analogy_correct.text()),  # 转换为整数
-                int(self.data_analysis_total.text()),  # 转换为整数
-                int(self.data_analysis_correct.text()),  # 转换为整数
+                {name: (int(total.text()), int(correct.text())) for name, (total, correct) in self.sections.items()},
                 int(self.total_correct.text()),  # 转换为整数
                 int(self.total_questions.text()),  # 转换为整数
                 float(self.score.text())  # 转换为浮点数
             )
-            QMessageBox.information(self, "成功", "套卷已保存！")
-            self.clear_fields()
-            self.parentWidget().parentWidget().parentWidget().exam_review_tab.load_data()
-        except Exception as e:
-            print(f"Error: {e}")
+        except ValueError as e:
             QMessageBox.critical(self, "错误", f"保存套卷时出错: {e}")
+            return
+        write_in_background(self, "保存套卷", add_exam_paper, *values, on_done=self.saved)
+
+    def saved(self, _):
+        QMessageBox.information(self, "成功", "套卷已保存！")
+        self.clear_fields()
 
     def clear_fields(self):
         self.year.clear()
         self.completion_date.setDate(QDate.currentDate())
         self.paper_name.clear()
-        self.politics_total.clear()
-        self.politics_correct.clear()
-        self.general_knowledge_total.clear()
-        self.general_knowledge_correct.clear()
-        self.logic_total.clear()
-        self.logic_correct.clear()
-        self.fragment_total.clear()
-        self.fragment_correct.clear()
-        self.quantitative_total.clear()
-        self.quantitative_correct.clear()
-        self.graphic_reasoning_total.clear()
-        self.graphic_reasoning_correct.clear()
-        self.definition_total.clear()
-        self.definition_correct.clear()
-        self.analogy_total.clear()
-        self.analogy_correct.clear()
-        self.data_analysis_total.clear()
-        self.data_analysis_correct.clear()
+        for total, correct in self.sections.values():
+            total.clear()
+            correct.clear()
         self.total_correct.clear()
         self.total_questions.clear()
         self.score.clear()
 
 class ExamReviewTab(QWidget):
+    EXPORT_HEADERS = EXAM_HEADERS
+
     def __init__(self):
         super().__init__()
         self.setup_ui()
@@ -529,16 +1156,17 @@ class ExamReviewTab(QWidget):
 
     def setup_ui(self):
         layout = QVBoxLayout()
+        self.filter_controller = FilterController(self.current_filters, self.apply_filters, self)
         
         filter_layout = QHBoxLayout()
         
         self.filter_input = QLineEdit()
         self.filter_input.setPlaceholderText("输入关键词筛选套卷")
-        self.filter_input.textChanged.connect(self.load_data)  # 绑定筛选事件
+        self.filter_input.textChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
 
         self.year_filter = QLineEdit()
         self.year_filter.setPlaceholderText("输入年份筛选")
-        self.year_filter.textChanged.connect(self.load_data)  # 绑定筛选事件
+        self.year_filter.textChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
 
         self.completion_date_filter = QComboBox()
         self.completion_date_filter.addItems(["全部时间", "选择日期"])
@@ -548,7 +1176,7 @@ class ExamReviewTab(QWidget):
         self.completion_date_date.setCalendarPopup(True)
         self.completion_date_date.setDisplayFormat("yyyy-MM-dd")
         self.completion_date_date.setVisible(False)
-        self.completion_date_date.dateChanged.connect(self.load_data)  # 绑定筛选事件
+        self.completion_date_date.dateChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
         
         filter_layout.addWidget(QLabel("关键词:"))
         filter_layout.addWidget(self.filter_input)
@@ -558,12 +1186,13 @@ class ExamReviewTab(QWidget):
         filter_layout.addWidget(self.completion_date_filter)
         filter_layout.addWidget(self.completion_date_date)
         
-        self.table = QTableWidget()
-        self.table.setColumnCount(25)  # 修改列数为25
-        self.table.setHorizontalHeaderLabels(["ID", "年份", "完成日期", "卷名", "政治总数", "政治正确数", "常识总数", "常识正确数", "逻辑总数", "逻辑正确数", "片段总数", "片段正确数", "数量关系总数", "数量关系正确数", "图推总数", "图推正确数", "定义总数", "定义正确数", "类比总数", "类比正确数", "资料分析总数", "资料分析正确数", "总正确数", "总题量", "成绩"])  # 修改表头
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)  # 设置选择行为为选择行
-        self.table.setSelectionMode(QTableWidget.SingleSelection)  # 设置选择模式为单选
-        self.table.cellDoubleClicked.connect(self.edit_exam_paper)
+        self.model = RecordTableModel("exam_papers", EXAM_HEADERS, query_exam_papers, 3)  # 卷名列标红
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        enable_prefetch(self.table, self.model)
+        self.table.setSelectionBehavior(QTableView.SelectRows)  # 设置选择行为为选择行
+        self.table.setSelectionMode(QTableView.SingleSelection)  # 设置选择模式为单选
+        self.table.doubleClicked.connect(self.edit_exam_paper)
 
         delete_btn = QPushButton("删除套卷")
         delete_btn.clicked.connect(self.delete_exam_paper)
@@ -571,13 +1200,18 @@ class ExamReviewTab(QWidget):
         export_btn = QPushButton("导出套卷")
         export_btn.clicked.connect(self.export_data)
 
+        export_changes_btn = QPushButton("导出套卷变更")
+        export_changes_btn.clicked.connect(self.export_changes)
+
         import_btn = QPushButton("导入套卷")
         import_btn.clicked.connect(self.import_data)
 
         layout.addLayout(filter_layout)
+        layout.addWidget(make_status_label(self.model))
         layout.addWidget(self.table)
         layout.addWidget(delete_btn)
         layout.addWidget(export_btn)
+        layout.addWidget(export_changes_btn)
         layout.addWidget(import_btn)
         self.setLayout(layout)
 
@@ -586,64 +1220,39 @@ class ExamReviewTab(QWidget):
             self.completion_date_date.setVisible(True)
         else:
             self.completion_date_date.setVisible(False)
-            self.load_data()
+            self.filter_controller.schedule()
 
     def load_data(self):
+        self.filter_controller.refresh()
+
+    def current_filters(self):
         filter_text = self.filter_input.text()
         selected_year = self.year_filter.text()
         selected_completion_date = self.completion_date_date.date().toString("yyyy-MM-dd") if self.completion_date_filter.currentText() == "选择日期" else ""
-        self.table.setRowCount(0)
-        for row in get_all_exam_papers():
-            if (selected_year == "" or str(row[1]) == selected_year) and \
-               (selected_completion_date == "" or row[2] == selected_completion_date) and \
-               filter_text.lower() in str(row).lower():  # 根据关键词进行筛选
-                row_pos = self.table.rowCount()
-                self.table.insertRow(row_pos)
-                for col, item in enumerate(row[:25]):  # 修改列数为25
-                    table_item = QTableWidgetItem(str(item))
-                    if col == 3:  # 卷名列
-                        table_item.setForeground(Qt.red)
-                    self.table.setItem(row_pos, col, table_item)
-
-    def edit_exam_paper(self, row):
-        qid = int(self.table.item(row, 0).text())
+        return {'keyword': filter_text, 'year': selected_year, 'completion_date': selected_completion_date}
+
+    def apply_filters(self, filters):
+        self.model.set_query(filters)
+
+    def edit_exam_paper(self, index):
+        qid = self.model.row_id(index.row())
         dialog = EditExamPaperDialog(qid)
-        if dialog.exec_():
-            self.load_data()
+        dialog.exec_()  # 保存后由变更通知刷新对应的行
 
     def delete_exam_paper(self):
-        selected_items = self.table.selectedItems()
-        if selected_items:
-            qid = int(selected_items[0].text())
-            try:
-                delete_exam_paper(qid)
-                QMessageBox.information(self, "成功", "套卷已删除！")
-                self.load_data()
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"删除套卷时出错: {e}")
+        qid = selected_record_id(self.table)
+        if qid is not None:
+            write_in_background(self, "删除套卷", delete_exam_paper, qid,
+                                on_done=lambda _: QMessageBox.information(self, "成功", "套卷已删除！"))
 
     def export_data(self):
-        path, _ = QFileDialog.getSaveFileName(self, "导出套卷", "", "CSV Files (*.csv)")
-        if path:
-            with open(path, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(["ID", "年份", "完成日期", "卷名", "政治总数", "政治正确数", "常识总数", "常识正确数", "逻辑总数", "逻辑正确数", "片段总数", "片段正确数", "数量关系总数", "数量关系正确数", "图推总数", "图推正确数", "定义总数", "定义正确数", "类比总数", "类比正确数", "资料分析总数", "资料分析正确数", "总正确数", "总题量", "成绩"])
-                for row in get_all_exam_papers():
-                    writer.writerow(row)
-            QMessageBox.information(self, "成功", "套卷已导出！")
+        export_table_file(self, 'exam_papers', "套卷", self.EXPORT_HEADERS)
+
+    def export_changes(self):
+        export_changes_file(self, 'exam_papers', "套卷", self.EXPORT_HEADERS)
 
     def import_data(self):
-        path, _ = QFileDialog.getOpenFileName(self, "导入套卷", "", "CSV Files (*.csv)")
-        if path:
-            with open(path, 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                next(reader)  # 跳过表头
-                for row in reader:
-                    add_exam_paper(
-                        int(row[1]), row[2], row[3], int(row[4]), int(row[5]), int(row[6]), int(row[7]), int(row[8]), int(row[9]), int(row[10]), int(row[11]), int(row[12]), int(row[13]), int(row[14]), int(row[15]), int(row[16]), int(row[17]), int(row[18]), int(row[19]), int(row[20]), int(row[21]), int(row[22]), int(row[23]), float(row[24])
-                    )
-            self.load_data()
-            QMessageBox.information(self, "成功", "套卷已导入！")
+        import_csv_file(self, 'exam_papers', "套卷")
 
 class EditDialog(QDialog):
     def __init__(self, qid):
@@ -676,6 +1285,8 @@ class EditDialog(QDialog):
         form_layout.addRow("错题解析:", self.analysis)
         form_layout.addRow("题型:", self.question_type)
         form_layout.addRow("录入时间:", self.entry_time)
+        self.attachments = AttachmentPanel(self.qid)  # 图片的添加和删除立即生效，不需要点保存
+        form_layout.addRow("题目图片:", self.attachments)
         
         save_btn = QPushButton("保存")
         save_btn.clicked.connect(self.save)
@@ -685,34 +1296,35 @@ class EditDialog(QDialog):
         self.setLayout(layout)
 
     def load_data(self):
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute('SELECT module, source, content, answer, analysis, question_type, entry_time FROM questions WHERE id=?', (self.qid,))
-            data = c.fetchone()
-            self.module.setCurrentText(data[0])
-            self.source.setText(data[1])
-            self.content.setText(data[2])
-            self.answer.setText(data[3])
-            self.analysis.setText(data[4])
-            self.question_type.setText(data[5])
-            self.entry_time.setDate(QDate.fromString(data[6], "yyyy-MM-dd"))
+        data = get_record('questions', self.qid)
+        if data:
+            self.module.setCurrentText(data.module)
+            self.source.setText(data.source)
+            self.content.setText(data.content)
+            self.answer.setText(data.answer)
+            self.analysis.setText(data.analysis)
+            self.question_type.setText(data.question_type)
+            self.entry_time.setDate(QDate.fromString(data.entry_time, "yyyy-MM-dd"))
 
     def save(self):
-        try:
-            update_question(
-                self.qid,
-                self.module.currentText(),
-                self.source.text(),
-                self.content.toPlainText(),
-                self.answer.text(),
-                self.analysis.toPlainText(),
-                self.question_type.text(),
-                self.entry_time.date().toString("yyyy-MM-dd")
-            )
-            QMessageBox.information(self, "成功", "题目已更新！")
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"更新题目时出错: {e}")
+        if not confirm_duplicate_question(self, self.content.toPlainText(), self.answer.text(), self.qid):
+            return
+        write_in_background(
+            self, "更新题目", update_question,
+            self.qid,
+            self.module.currentText(),
+            self.source.text(),
+            self.content.toPlainText(),
+            self.answer.text(),
+            self.analysis.toPlainText(),
+            self.question_type.text(),
+            self.entry_time.date().toString("yyyy-MM-dd"),
+            on_done=lambda _: self.saved("题目已更新！")
+        )
+
+    def saved(self, message):
+        QMessageBox.information(self, "成功", message)
+        self.accept()
 
 class DetailDialog(QDialog):
     def __init__(self, qid):
@@ -728,25 +1340,144 @@ class DetailDialog(QDialog):
         self.content = QTextEdit()
         self.content.setReadOnly(True)
         
+        self.attachments = AttachmentPanel(self.qid, editable=False)
+
         self.review_btn = QPushButton("标记复盘")
         self.review_btn.clicked.connect(self.mark_review)
 
         layout.addWidget(QLabel("题目内容:"))
         layout.addWidget(self.content)
+        layout.addWidget(self.attachments)
         layout.addWidget(self.review_btn)
         self.setLayout(layout)
 
     def load_data(self):
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute('SELECT content FROM questions WHERE id=?', (self.qid,))
-            self.content.setText(c.fetchone()[0])
+        data = get_record('questions', self.qid)
+        if data:
+            self.content.setText(data.content)
 
     def mark_review(self):
-        update_review(self.qid)
+        record_review(self.qid)  # 先记在内存里，由定时 flush 写入
         QMessageBox.information(self, "成功", "已记录复盘！")
         self.accept()
 
+DRILL_SIZE = 30  # 随机抽题默认题数
+REVIEW_FLUSH_MS = 10000  # 复习记录写缓冲的定时 flush 间隔
+
+def flush_pending_reviews():  # 写入失败的记录留在缓冲区，下次 flush 再试
+    if pending_reviews():
+        run_write(flush_reviews)
+
+class ReviewSessionDialog(QDialog):
+    # 间隔复习：按到期顺序逐题出现，看完答案后按记忆程度评分，评分决定下次到期时间
+    # 传入 drill（随机抽好的一组题）时只练这一组，评分同样计入复习进度
+    BATCH_SIZE = 50
+
+    def __init__(self, drill=None, title="间隔复习"):
+        super().__init__()
+        self.queue = []
+        self.current = None
+        self.shown_at = 0.0
+        self.reviewed = 0
+        self.drill = drill
+        self.setup_ui(title)
+        if drill is None:
+            self.fetch_batch()
+        else:
+            self.batch_loaded(drill)
+
+    def setup_ui(self, title):
+        self.setWindowTitle(title)
+        self.resize(600, 500)
+        layout = QVBoxLayout()
+
+        self.status = QLabel("正在加载到期题目…")
+        self.content = QTextEdit()
+        self.content.setReadOnly(True)
+        self.attachments = AttachmentPanel(editable=False)
+        self.answer = QTextEdit()
+        self.answer.setReadOnly(True)
+        self.answer.setVisible(False)
+
+        self.show_btn = QPushButton("显示答案")
+        self.show_btn.clicked.connect(self.show_answer)
+
+        grade_layout = QHBoxLayout()
+        self.grade_buttons = []
+        for text, grade in (("忘记", 'again'), ("困难", 'hard'), ("良好", 'good'), ("简单", 'easy')):
+            btn = QPushButton(text)
+            btn.clicked.connect(lambda _, g=grade: self.grade(g))
+            btn.setEnabled(False)
+            grade_layout.addWidget(btn)
+            self.grade_buttons.append(btn)
+
+        layout.addWidget(self.status)
+        layout.addWidget(QLabel("题目内容:"))
+        layout.addWidget(self.content)
+        layout.addWidget(self.attachments)
+        layout.addWidget(self.show_btn)
+        layout.addWidget(self.answer)
+        layout.addLayout(grade_layout)
+        self.setLayout(layout)
+
+    def fetch_batch(self):
+        self.show_btn.setEnabled(False)
+        run_in_background(get_due_questions, self.BATCH_SIZE, on_done=self.batch_loaded,
+                          on_error=lambda e: self.status.setText(f"加载失败: {e}"))
+
+    def batch_loaded(self, rows):
+        self.queue = list(rows)
+        if self.queue:
+            self.next_question()
+        else:
+            self.finish()
+
+    def next_question(self):
+        if not self.queue:  # 评过分的题下次到期至少在一天后，重新取一批不会再出现
+            self.current = None
+            self.fetch_batch() if self.drill is None else self.finish()
+            return
+        self.current = self.queue.pop(0)
+        self.shown_at = time.monotonic()
+        qid, module, source, content, answer, analysis, question_type, reviews, interval_days, due = self.current
+        self.status.setText(f"已复习 {self.reviewed} 题 | {module} · {question_type} | 来源: {source} | 复盘 {reviews} 次")
+        self.content.setText(content)
+        self.attachments.load(qid)
+        self.answer.setText(f"正确答案: {answer}\n\n解析:\n{analysis or ''}")
+        self.answer.setVisible(False)
+        self.show_btn.setEnabled(True)
+        for btn in self.grade_buttons:
+            btn.setEnabled(False)
+
+    def finish(self):
+        self.current = None
+        if self.drill is None:
+            self.status.setText(f"今天到期的题目已全部复习完，本次共复习 {self.reviewed} 题。")
+        else:
+            self.status.setText(f"本组练习完成，共 {self.reviewed} 题。")
+        self.content.clear()
+        self.attachments.load(None)
+        self.answer.setVisible(False)
+        self.show_btn.setEnabled(False)
+        for btn in self.grade_buttons:
+            btn.setEnabled(False)
+
+    def done(self, result):
+        flush_pending_reviews()  # 复习结束时把这次的评分写入数据库
+        super().done(result)
+
+    def show_answer(self):
+        self.answer.setVisible(True)
+        for btn in self.grade_buttons:
+            btn.setEnabled(True)
+
+    def grade(self, grade):
+        if self.current is None:
+            return
+        record_review(self.current.id, REVIEW_GRADES[grade], round(time.monotonic() - self.shown_at, 1))
+        self.reviewed += 1
+        self.next_question()
+
 class EditIdiomDialog(QDialog):
     def __init__(self, qid):
         super().__init__()
@@ -771,6 +1502,7 @@ class EditIdiomDialog(QDialog):
         
         form_layout.addRow("成语分类:", self.category)
         form_layout.addRow("成语名称:", self.name)
+        form_layout.addRow("", DuplicateHint(self.name, self.qid))
         form_layout.addRow("语义:", self.meaning)
         form_layout.addRow("常用语境:", self.context)
         form_layout.addRow("固定搭配:", self.collocation)
@@ -785,162 +1517,33 @@ class EditIdiomDialog(QDialog):
         self.setLayout(layout)
 
     def load_data(self):
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute('SELECT category, name, meaning, context, collocation, example, entry_time FROM idioms WHERE id=?', (self.qid,))
-            data = c.fetchone()
-            self.category.setText(data[0])
-            self.name.setText(data[1])
-            self.meaning.setText(data[2])
-            self.context.setText(data[3])
-            self.collocation.setText(data[4])
-            self.example.setText(data[5])
-            self.entry_time.setDate(QDate.fromString(data[6], "yyyy-MM-dd"))
+        data = get_record('idioms', self.qid)
+        if data:
+            self.category.setText(data.category)
+            self.name.setText(data.name)
+            self.meaning.setText(data.meaning)
+            self.context.setText(data.context)
+            self.collocation.setText(data.collocation)
+            self.example.setText(data.example)
+            self.entry_time.setDate(QDate.fromString(data.entry_time, "yyyy-MM-dd"))
 
     def save(self):
-        try:
-            update_idiom(
-                self.qid,
-                self.category.text(),
-                self.name.text(),
-                self.meaning.toPlainText(),
-                self.context.toPlainText(),
-                self.collocation.toPlainText(),
-                self.example.toPlainText(),
-                self.entry_time.date().toString("yyyy-MM-dd")
-            )
-            QMessageBox.information(self, "成功", "成语已更新！")
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"更新成语时出错: {e}")
-
-class ExamInputTab(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.setup_ui()
-
-    def setup_ui(self):
-        layout = QVBoxLayout()
-        form_layout = QFormLayout()
-        
-        self.year = QLineEdit()
-        self.completion_date = QDateEdit()
-        self.completion_date.setCalendarPopup(True)
-        self.paper_name = QLineEdit()
-        self.politics_total = QLineEdit()  # 修改为 QLineEdit
-        self.politics_correct = QLineEdit()  # 修改为 QLineEdit
-        self.general_knowledge_total = QLineEdit()  # 修改为 QLineEdit
-        self.general_knowledge_correct = QLineEdit()  # 修改为 QLineEdit
-        self.logic_total = QLineEdit()  # 修改为 QLineEdit
-        self.logic_correct = QLineEdit()  # 修改为 QLineEdit
-        self.fragment_total = QLineEdit()  # 修改为 QLineEdit
-        self.fragment_correct = QLineEdit()  # 修改为 QLineEdit
-        self.quantitative_total = QLineEdit()  # 修改为 QLineEdit
-        self.quantitative_correct = QLineEdit()  # 修改为 QLineEdit
-        self.graphic_reasoning_total = QLineEdit()  # 修改为 QLineEdit
-        self.graphic_reasoning_correct = QLineEdit()  # 修改为 QLineEdit
-        self.definition_total = QLineEdit()  # 修改为 QLineEdit
-        self.definition_correct = QLineEdit()  # 修改为 QLineEdit
-        self.analogy_total = QLineEdit()  # 修改为 QLineEdit
-        self.analogy_correct = QLineEdit()  # 修改为 QLineEdit
-        self.data_analysis_total = QLineEdit()  # 修改为 QLineEdit
-        self.data_analysis_correct = QLineEdit()  # 修改为 QLineEdit
-        self.total_correct = QLineEdit()  # 修改为 QLineEdit
-        self.total_questions = QLineEdit()  # 修改为 QLineEdit
-        self.score = QLineEdit()  # 修改为 QLineEdit
-        
-        form_layout.addRow("年份:", self.year)
-        form_layout.addRow("完成日期:", self.completion_date)
-        form_layout.addRow("卷名:", self.paper_name)
-        form_layout.addRow("政治总数:", self.politics_total)
-        form_layout.addRow("政治正确数:", self.politics_correct)
-        form_layout.addRow("常识总数:", self.general_knowledge_total)
-        form_layout.addRow("常识正确数:", self.general_knowledge_correct)
-        form_layout.addRow("逻辑总数:", self.logic_total)
-        form_layout.addRow("逻辑正确数:", self.logic_correct)
-        form_layout.addRow("片段总数:", self.fragment_total)
-        form_layout.addRow("片段正确数:", self.fragment_correct)
-        form_layout.addRow("数量关系总数:", self.quantitative_total)
-        form_layout.addRow("数量关系正确数:", self.quantitative_correct)
-        form_layout.addRow("图推总数:", self.graphic_reasoning_total)
-        form_layout.addRow("图推正确数:", self.graphic_reasoning_correct)
-        form_layout.addRow("定义总数:", self.definition_total)
-        form_layout.addRow("定义正确数:", self.definition_correct)
-        form_layout.addRow("类比总数:", self.analogy_total)
-        form_layout.addRow("类比正确数:", self.analogy_correct)
-        form_layout.addRow("资料分析总数:", self.data_analysis_total)
-        form_layout.addRow("资料分析正确数:", self.data_analysis_correct)
-        form_layout.addRow("总正确数:", self.total_correct)
-        form_layout.addRow("总题量:", self.total_questions)
-        form_layout.addRow("成绩:", self.score)
-        
-        submit_btn = QPushButton("保存套卷")
-        submit_btn.clicked.connect(self.save)
-        
-        layout.addLayout(form_layout)
-        layout.addWidget(submit_btn)
-        self.setLayout(layout)
-
-    def save(self):
-        try:
-            new_id = add_exam_paper(
-                int(self.year.text()),
-                self.completion_date.date().toString("yyyy-MM-dd"),
-                self.paper_name.text(),
-                int(self.politics_total.text()),  # 转换为整数
-                int(self.politics_correct.text()),  # 转换为整数
-                int(self.general_knowledge_total.text()),  # 转换为整数
-                int(self.general_knowledge_correct.text()),  # 转换为整数
-                int(self.logic_total.text()),  # 转换为整数
-                int(self.logic_correct.text()),  # 转换为整数
-                int(self.fragment_total.text()),  # 转换为整数
-                int(self.fragment_correct.text()),  # 转换为整数
-                int(self.quantitative_total.text()),  # 转换为整数
-                int(self.quantitative_correct.text()),  # 转换为整数
-                int(self.graphic_reasoning_total.text()),  # 转换为整数
-                int(self.graphic_reasoning_correct.text()),  # 转换为整数
-                int(self.definition_total.text()),  # 转换为整数
-                int(self.definition_correct.text()),  # 转换为整数
-                int(self.analogy_total.text()),  # 转换为整数
-                int(self.analogy_correct.text()),  # 转换为整数
-                int(self.data_analysis_total.text()),  # 转换为整数
-                int(self.data_analysis_correct.text()),  # 转换为整数
-                int(self.total_correct.text()),  # 转换为整数
-                int(self.total_questions.text()),  # 转换为整数
-                float(self.score.text())  # 转换为浮点数
-            )
-            QMessageBox.information(self, "成功", "套卷已保存！")
-            self.clear_fields()
-            self.parentWidget().parentWidget().parentWidget().exam_review_tab.load_data()
-        except Exception as e:
-            print(f"Error: {e}")
-            QMessageBox.critical(self, "错误", f"保存套卷时出错: {e}")
-
-    def clear_fields(self):
-        self.year.clear()
-        self.completion_date.setDate(QDate.currentDate())
-        self.paper_name.clear()
-        self.politics_total.clear()
-        self.politics_correct.clear()
-        self.general_knowledge_total.clear()
-        self.general_knowledge_correct.clear()
-        self.logic_total.clear()
-        self.logic_correct.clear()
-        self.fragment_total.clear()
-        self.fragment_correct.clear()
-        self.quantitative_total.clear()
-        self.quantitative_correct.clear()
-        self.graphic_reasoning_total.clear()
-        self.graphic_reasoning_correct.clear()
-        self.definition_total.clear()
-        self.definition_correct.clear()
-        self.analogy_total.clear()
-        self.analogy_correct.clear()
-        self.data_analysis_total.clear()
-        self.data_analysis_correct.clear()
-        self.total_correct.clear()
-        self.total_questions.clear()
-        self.score.clear()
+        write_in_background(
+            self, "更新成语", update_idiom,
+            self.qid,
+            self.category.text(),
+            self.name.text(),
+            self.meaning.toPlainText(),
+            self.context.toPlainText(),
+            self.collocation.toPlainText(),
+            self.example.toPlainText(),
+            self.entry_time.date().toString("yyyy-MM-dd"),
+            on_done=lambda _: self.saved("成语已更新！")
+        )
+
+    def saved(self, message):
+        QMessageBox.information(self, "成功", message)
+        self.accept()
 
 class EditExamPaperDialog(QDialog):
     def __init__(self, qid):
@@ -959,49 +1562,24 @@ class EditExamPaperDialog(QDialog):
         self.completion_date = QDateEdit()
         self.completion_date.setCalendarPopup(True)
         self.paper_name = QLineEdit()
-        self.politics_total = QSpinBox()
-        self.politics_correct = QSpinBox()
-        self.general_knowledge_total = QSpinBox()
-        self.general_knowledge_correct = QSpinBox()
-        self.logic_total = QSpinBox()
-        self.logic_correct = QSpinBox()
-        self.fragment_total = QSpinBox()
-        self.fragment_correct = QSpinBox()
-        self.quantitative_total = QSpinBox()
-        self.quantitative_correct = QSpinBox()
-        self.graphic_reasoning_total = QSpinBox()
-        self.graphic_reasoning_correct = QSpinBox()
-        self.definition_total = QSpinBox()
-        self.definition_correct = QSpinBox()
-        self.analogy_total = QSpinBox()
-        self.analogy_correct = QSpinBox()
-        self.data_analysis_total = QSpinBox()
-        self.data_analysis_correct = QSpinBox()
+        self.sections = {}  # 模块名 -> (总数, 正确数) 两个微调框
         self.total_correct = QSpinBox()
         self.total_questions = QSpinBox()
         self.score = QDoubleSpinBox()
+        self.total_correct.setMaximum(9999)  # 默认上限 99，总题量常常超过
+        self.total_questions.setMaximum(9999)
+        self.score.setMaximum(9999)
         
         form_layout.addRow("年份:", self.year)
         form_layout.addRow("完成日期:", self.completion_date)
         form_layout.addRow("卷名:", self.paper_name)
-        form_layout.addRow("政治总数:", self.politics_total)
-        form_layout.addRow("政治正确数:", self.politics_correct)
-        form_layout.addRow("常识总数:", self.general_knowledge_total)
-        form_layout.addRow("常识正确数:", self.general_knowledge_correct)
-        form_layout.addRow("逻辑总数:", self.logic_total)
-        form_layout.addRow("逻辑正确数:", self.logic_correct)
-        form_layout.addRow("片段总数:", self.fragment_total)
-        form_layout.addRow("片段正确数:", self.fragment_correct)
-        form_layout.addRow("数量关系总数:", self.quantitative_total)
-        form_layout.addRow("数量关系正确数:", self.quantitative_correct)
-        form_layout.addRow("图推总数:", self.graphic_reasoning_total)
-        form_layout.addRow("图推正确数:", self.graphic_reasoning_correct)
-        form_layout.addRow("定义总数:", self.definition_total)
-        form_layout.addRow("定义正确数:", self.definition_correct)
-        form_layout.addRow("类比总数:", self.analogy_total)
-        form_layout.addRow("类比正确数:", self.analogy_correct)
-        form_layout.addRow("资料分析总数:", self.data_analysis_total)
-        form_layout.addRow("资料分析正确数:", self.data_analysis_correct)
+        for name, label in EXAM_SECTIONS:
+            total, correct = QSpinBox(), QSpinBox()
+            total.setMaximum(9999)
+            correct.setMaximum(9999)
+            self.sections[name] = (total, correct)
+            form_layout.addRow(f"{label}总数:", total)
+            form_layout.addRow(f"{label}正确数:", correct)
         form_layout.addRow("总正确数:", self.total_correct)
         form_layout.addRow("总题量:", self.total_questions)
         form_layout.addRow("成绩:", self.score)
@@ -1014,69 +1592,42 @@ class EditExamPaperDialog(QDialog):
         self.setLayout(layout)
 
     def load_data(self):
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute('''SELECT year, completion_date, paper_name, politics_total, politics_correct, general_knowledge_total, general_knowledge_correct, logic_total, logic_correct, fragment_total, fragment_correct, quantitative_total, quantitative_correct, graphic_reasoning_total, graphic_reasoning_correct, definition_total, definition_correct, analogy_total, analogy_correct, data_analysis_total, data_analysis_correct, total_correct, total_questions, score 
-                         FROM exam_papers WHERE id=?''', (self.qid,))
-            data = c.fetchone()
-            self.year.setText(str(data[0]))
-            self.completion_date.setDate(QDate.fromString(data[1], "yyyy-MM-dd"))
-            self.paper_name.setText(data[2])
-            self.politics_total.setValue(data[3])
-            self.politics_correct.setValue(data[4])
-            self.general_knowledge_total.setValue(data[5])
-            self.general_knowledge_correct.setValue(data[6])
-            self.logic_total.setValue(data[7])
-            self.logic_correct.setValue(data[8])
-            self.fragment_total.setValue(data[9])
-            self.fragment_correct.setValue(data[10])
-            self.quantitative_total.setValue(data[11])
-            self.quantitative_correct.setValue(data[12])
-            self.graphic_reasoning_total.setValue(data[13])
-            self.graphic_reasoning_correct.setValue(data[14])
-            self.definition_total.setValue(data[15])
-            self.definition_correct.setValue(data[16])
-            self.analogy_total.setValue(data[17])
-            self.analogy_correct.setValue(data[18])
-            self.data_analysis_total.setValue(data[19])
-            self.data_analysis_correct.setValue(data[20])
-            self.total_correct.setValue(data[21])
-            self.total_questions.setValue(data[22])
-            self.score.setValue(data[23])
+        record = get_record('exam_papers', self.qid)
+        if record:
+            data, sections = record
+            self.year.setText(str(data.year))
+            self.completion_date.setDate(QDate.fromString(data.completion_date, "yyyy-MM-dd"))
+            self.paper_name.setText(data.paper_name)
+            self.total_correct.setValue(data.total_correct or 0)
+            self.total_questions.setValue(data.total_questions or 0)
+            self.score.setValue(data.score or 0)
+            for name, (total, correct) in sections.items():
+                if name in self.sections:
+                    self.sections[name][0].setValue(total or 0)
+                    self.sections[name][1].setValue(correct or 0)
 
     def save(self):
         try:
-            update_exam_paper(
-                self.qid,
-                int(self.year.text()),
-                self.completion_date.date().toString("yyyy-MM-dd"),
-                self.paper_name.text(),
-                self.politics_total.value(),
-                self.politics_correct.value(),
-                self.general_knowledge_total.value(),
-                self.general_knowledge_correct.value(),
-                self.logic_total.value(),
-                self.logic_correct.value(),
-                self.fragment_total.value(),
-                self.fragment_correct.value(),
-                self.quantitative_total.value(),
-                self.quantitative_correct.value(),
-                self.graphic_reasoning_total.value(),
-                self.graphic_reasoning_correct.value(),
-                self.definition_total.value(),
-                self.definition_correct.value(),
-                self.analogy_total.value(),
-                self.analogy_correct.value(),
-                self.data_analysis_total.value(),
-                self.data_analysis_correct.value(),
-                self.total_correct.value(),
-                self.total_questions.value(),
-                self.score.value()
-            )
-            QMessageBox.information(self, "成功", "套卷已更新！")
-            self.accept()
-        except Exception as e:
+            year = int(self.year.text())
+        except ValueError as e:
             QMessageBox.critical(self, "错误", f"更新套卷时出错: {e}")
+            return
+        write_in_background(
+            self, "更新套卷", update_exam_paper,
+            self.qid,
+            year,
+            self.completion_date.date().toString("yyyy-MM-dd"),
+            self.paper_name.text(),
+            {name: (total.value(), correct.value()) for name, (total, correct) in self.sections.items()},
+            self.total_correct.value(),
+            self.total_questions.value(),
+            self.score.value(),
+            on_done=lambda _: self.saved("套卷已更新！")
+        )
+
+    def saved(self, message):
+        QMessageBox.information(self, "成功", message)
+        self.accept()
 
 class EssayInputTab(QWidget):
     def __init__(self):
@@ -1117,30 +1668,37 @@ class EssayInputTab(QWidget):
 
     def save(self):
         try:
-            new_id = add_essay_paper(
-                int(self.year.text()),
-                self.province.text(),
-                self.question_type.text(),
-                self.source.text(),
-                self.date.date().toString("yyyy-MM-dd"),
-                self.content.toPlainText(),
-                self.completion_status.text(),
-                self.entry_time.date().toString("yyyy-MM-dd")
-            )
-            QMessageBox.information(self, "成功", "申论已保存！")
-            self.year.clear()
-            self.province.clear()
-            self.question_type.clear()
-            self.source.clear()
-            self.date.setDate(QDate.currentDate())
-            self.content.clear()
-            self.completion_status.clear()
-            self.entry_time.setDate(QDate.currentDate())
-            self.parentWidget().parentWidget().parentWidget().essay_review_tab.load_data()
-        except Exception as e:
+            year = int(self.year.text())
+        except ValueError as e:
             QMessageBox.critical(self, "错误", f"保存申论时出错: {e}")
+            return
+        write_in_background(
+            self, "保存申论", add_essay_paper,
+            year,
+            self.province.text(),
+            self.question_type.text(),
+            self.source.text(),
+            self.date.date().toString("yyyy-MM-dd"),
+            self.content.toPlainText(),
+            self.completion_status.text(),
+            self.entry_time.date().toString("yyyy-MM-dd"),
+            on_done=self.saved
+        )
+
+    def saved(self, _):
+        QMessageBox.information(self, "成功", "申论已保存！")
+        self.year.clear()
+        self.province.clear()
+        self.question_type.clear()
+        self.source.clear()
+        self.date.setDate(QDate.currentDate())
+        self.content.clear()
+        self.completion_status.clear()
+        self.entry_time.setDate(QDate.currentDate())
 
 class EssayReviewTab(QWidget):
+    EXPORT_HEADERS = ["ID", "年份", "省份", "题型", "来源", "日期", "题目", "完成情况", "录入时间"]
+
     def __init__(self):
         super().__init__()
         self.setup_ui()
@@ -1148,28 +1706,29 @@ class EssayReviewTab(QWidget):
 
     def setup_ui(self):
         layout = QVBoxLayout()
+        self.filter_controller = FilterController(self.current_filters, self.apply_filters, self)
         
         filter_layout = QHBoxLayout()
         
         self.filter_input = QLineEdit()
         self.filter_input.setPlaceholderText("输入关键词筛选申论")
-        self.filter_input.textChanged.connect(self.load_data)
+        self.filter_input.textChanged.connect(self.filter_controller.schedule)
         
         self.year_filter = QLineEdit()
         self.year_filter.setPlaceholderText("输入年份筛选")
-        self.year_filter.textChanged.connect(self.load_data)
+        self.year_filter.textChanged.connect(self.filter_controller.schedule)
         
         self.province_filter = QLineEdit()
         self.province_filter.setPlaceholderText("输入省份筛选")
-        self.province_filter.textChanged.connect(self.load_data)
+        self.province_filter.textChanged.connect(self.filter_controller.schedule)
         
         self.question_type_filter = QLineEdit()
         self.question_type_filter.setPlaceholderText("输入题型筛选")
-        self.question_type_filter.textChanged.connect(self.load_data)
+        self.question_type_filter.textChanged.connect(self.filter_controller.schedule)
         
         self.source_filter = QLineEdit()
         self.source_filter.setPlaceholderText("输入来源筛选")
-        self.source_filter.textChanged.connect(self.load_data)
+        self.source_filter.textChanged.connect(self.filter_controller.schedule)
         
         self.date_filter = QComboBox()
         self.date_filter.addItems(["全部时间", "选择日期"])
@@ -1179,7 +1738,7 @@ class EssayReviewTab(QWidget):
         self.date_date.setCalendarPopup(True)
         self.date_date.setDisplayFormat("yyyy-MM-dd")
         self.date_date.setVisible(False)
-        self.date_date.dateChanged.connect(self.load_data)  # 绑定筛选事件
+        self.date_date.dateChanged.connect(self.filter_controller.schedule)  # 绑定筛选事件
         
         filter_layout.addWidget(QLabel("关键词:"))
         filter_layout.addWidget(self.filter_input)
@@ -1195,12 +1754,13 @@ class EssayReviewTab(QWidget):
         filter_layout.addWidget(self.date_filter)
         filter_layout.addWidget(self.date_date)
         
-        self.table = QTableWidget()
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels(["ID", "年份", "省份", "题型", "来源", "日期", "题目", "完成情况", "录入时间"])
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SingleSelection)
-        self.table.cellDoubleClicked.connect(self.edit_essay_paper)
+        self.model = RecordTableModel("essay_papers", ["ID", "年份", "省份", "题型", "来源", "日期", "题目", "完成情况", "录入时间"], query_essay_papers, 6)  # 题目列标红
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        enable_prefetch(self.table, self.model)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
+        self.table.setSelectionMode(QTableView.SingleSelection)
+        self.table.doubleClicked.connect(self.edit_essay_paper)
         
         delete_btn = QPushButton("删除申论")
         delete_btn.clicked.connect(self.delete_essay_paper)
@@ -1208,13 +1768,18 @@ class EssayReviewTab(QWidget):
         export_btn = QPushButton("导出申论")
         export_btn.clicked.connect(self.export_data)
 
+        export_changes_btn = QPushButton("导出申论变更")
+        export_changes_btn.clicked.connect(self.export_changes)
+
         import_btn = QPushButton("导入申论")
         import_btn.clicked.connect(self.import_data)
         
         layout.addLayout(filter_layout)
+        layout.addWidget(make_status_label(self.model))
         layout.addWidget(self.table)
         layout.addWidget(delete_btn)
         layout.addWidget(export_btn)
+        layout.addWidget(export_changes_btn)
         layout.addWidget(import_btn)
         self.setLayout(layout)
 
@@ -1223,70 +1788,49 @@ class EssayReviewTab(QWidget):
             self.date_date.setVisible(True)
         else:
             self.date_date.setVisible(False)
-            self.load_data()
+            self.filter_controller.schedule()
 
     def load_data(self):
+        self.filter_controller.refresh()
+
+    def current_filters(self):
         filter_text = self.filter_input.text()
         selected_year = self.year_filter.text()
         selected_province = self.province_filter.text()
         selected_question_type = self.question_type_filter.text()
         selected_source = self.source_filter.text()
         selected_date = self.date_date.date().toString("yyyy-MM-dd") if self.date_filter.currentText() == "选择日期" else ""
-        self.table.setRowCount(0)
-        for row in get_all_essay_papers():
-            if (selected_year == "" or str(row[1]) == selected_year) and \
-               (selected_province == "" or row[2] == selected_province) and \
-               (selected_question_type == "" or row[3] == selected_question_type) and \
-               (selected_source == "" or row[4] == selected_source) and \
-               (selected_date == "" or row[5] == selected_date) and \
-               filter_text.lower() in str(row).lower():
-                row_pos = self.table.rowCount()
-                self.table.insertRow(row_pos)
-                for col, item in enumerate(row):
-                    table_item = QTableWidgetItem(str(item))
-                    if col == 6:  # 题目列
-                        table_item.setForeground(Qt.red)
-                    self.table.setItem(row_pos, col, table_item)
-
-    def edit_essay_paper(self, row):
-        qid = int(self.table.item(row, 0).text())
+        return {
+            'keyword': filter_text,
+            'year': selected_year,
+            'province': selected_province,
+            'question_type': selected_question_type,
+            'source': selected_source,
+            'date': selected_date,
+        }
+
+    def apply_filters(self, filters):
+        self.model.set_query(filters, 'rank')
+
+    def edit_essay_paper(self, index):
+        qid = self.model.row_id(index.row())
         dialog = EditEssayPaperDialog(qid)
-        if dialog.exec_():
-            self.load_data()
+        dialog.exec_()  # 保存后由变更通知刷新对应的行
 
     def delete_essay_paper(self):
-        selected_items = self.table.selectedItems()
-        if selected_items:
-            qid = int(selected_items[0].text())
-            try:
-                delete_essay_paper(qid)
-                QMessageBox.information(self, "成功", "申论已删除！")
-                self.load_data()
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"删除申论时出错: {e}")
+        qid = selected_record_id(self.table)
+        if qid is not None:
+            write_in_background(self, "删除申论", delete_essay_paper, qid,
+                                on_done=lambda _: QMessageBox.information(self, "成功", "申论已删除！"))
 
     def export_data(self):
-        path, _ = QFileDialog.getSaveFileName(self, "导出申论", "", "CSV Files (*.csv)")
-        if path:
-            with open(path, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(["ID", "年份", "省份", "题型", "来源", "日期", "题目", "完成情况", "录入时间"])
-                for row in get_all_essay_papers():
-                    writer.writerow(row)
-            QMessageBox.information(self, "成功", "申论已导出！")
+        export_table_file(self, 'essay_papers', "申论", self.EXPORT_HEADERS)
+
+    def export_changes(self):
+        export_changes_file(self, 'essay_papers', "申论", self.EXPORT_HEADERS)
 
     def import_data(self):
-        path, _ = QFileDialog.getOpenFileName(self, "导入申论", "", "CSV Files (*.csv)")
-        if path:
-            with open(path, 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                next(reader)  # 跳过表头
-                for row in reader:
-                    add_essay_paper(
-                        int(row[1]), row[2], row[3], row[4], row[5], row[6], row[7], row[8]
-                    )
-            self.load_data()
-            QMessageBox.information(self, "成功", "申论已导入！")
+        import_csv_file(self, 'essay_papers', "申论")
 
 class EditEssayPaperDialog(QDialog):
     def __init__(self, qid):
@@ -1329,71 +1873,327 @@ class EditEssayPaperDialog(QDialog):
         self.setLayout(layout)
 
     def load_data(self):
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute('SELECT year, province, question_type, source, date, content, completion_status, entry_time FROM essay_papers WHERE id=?', (self.qid,))
-            data = c.fetchone()
-            self.year.setText(str(data[0]))
-            self.province.setText(data[1])
-            self.question_type.setText(data[2])
-            self.source.setText(data[3])
-            self.date.setDate(QDate.fromString(data[4], "yyyy-MM-dd"))
-            self.content.setText(data[5])
-            self.completion_status.setText(data[6])
-            self.entry_time.setDate(QDate.fromString(data[7], "yyyy-MM-dd"))
+        data = get_record('essay_papers', self.qid)
+        if data:
+            self.year.setText(str(data.year))
+            self.province.setText(data.province)
+            self.question_type.setText(data.question_type)
+            self.source.setText(data.source)
+            self.date.setDate(QDate.fromString(data.date, "yyyy-MM-dd"))
+            self.content.setText(data.content)
+            self.completion_status.setText(data.completion_status)
+            self.entry_time.setDate(QDate.fromString(data.entry_time, "yyyy-MM-dd"))
 
     def save(self):
         try:
-            update_essay_paper(
-                self.qid,
-                int(self.year.text()),
-                self.province.text(),
-                self.question_type.text(),
-                self.source.text(),
-                self.date.date().toString("yyyy-MM-dd"),
-                self.content.toPlainText(),
-                self.completion_status.text(),
-                self.entry_time.date().toString("yyyy-MM-dd")
-            )
-            QMessageBox.information(self, "成功", "申论已更新！")
-            self.accept()
-        except Exception as e:
+            year = int(self.year.text())
+        except ValueError as e:
             QMessageBox.critical(self, "错误", f"更新申论时出错: {e}")
+            return
+        write_in_background(
+            self, "更新申论", update_essay_paper,
+            self.qid,
+            year,
+            self.province.text(),
+            self.question_type.text(),
+            self.source.text(),
+            self.date.date().toString("yyyy-MM-dd"),
+            self.content.toPlainText(),
+            self.completion_status.text(),
+            self.entry_time.date().toString("yyyy-MM-dd"),
+            on_done=lambda _: self.saved("申论已更新！")
+        )
+
+    def saved(self, message):
+        QMessageBox.information(self, "成功", message)
+        self.accept()
+
+class ExamStatsTab(QWidget):
+    # 套卷统计：各模块正确率按年 / 按月汇总，外加最近 N 套的滚动正确率，数据来自触发器维护的汇总表
+    PERIODS = [("按年", 'year'), ("按月", 'month'), ("全部", 'all')]
+
+    def __init__(self):
+        super().__init__()
+        self.setup_ui()
+        self.load_data()
+
+    def setup_ui(self):
+        layout = QVBoxLayout()
+
+        control_layout = QHBoxLayout()
+        self.period_type = QComboBox()
+        self.period_type.addItems([text for text, _ in self.PERIODS])
+        self.period_type.currentIndexChanged.connect(self.load_data)
+
+        self.window_size = QSpinBox()
+        self.window_size.setRange(1, 200)
+        self.window_size.setValue(10)
+        self.window_size.valueChanged.connect(self.load_data)
+
+        control_layout.addWidget(QLabel("统计周期:"))
+        control_layout.addWidget(self.period_type)
+        control_layout.addWidget(QLabel("最近套数:"))
+        control_layout.addWidget(self.window_size)
+        control_layout.addStretch()
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(EXAM_STAT_SECTIONS) + 2)
+        self.table.setHorizontalHeaderLabels(["周期", "套数"] + [label for _, label in EXAM_STAT_SECTIONS])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+
+        self.reload_timer = QTimer(self)  # 连续录入、导入时合并成一次刷新
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self.reload_timer.timeout.connect(self.load_data)
+        CHANGE_BUS.changed.connect(self.on_change)
+
+        layout.addLayout(control_layout)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+    def on_change(self, event):
+        if event.table == 'exam_papers':
+            self.reload_timer.start()
+
+    def load_data(self):
+        period_type = self.PERIODS[self.period_type.currentIndex()][1]
+        n = self.window_size.value()
+        run_in_background(lambda: (get_exam_rolling_stats(n), get_exam_stats(period_type)),
+                          on_done=lambda result: self.show_stats(n, *result))
+
+    def show_stats(self, n, rolling, stats):
+        rows = {}  # period -> (套数, {section: (total, correct)})
+        for period, section, papers, total, correct in stats:
+            row = rows.setdefault(period, [0, {}])
+            row[0] = max(row[0], papers)
+            row[1][section] = (total, correct)
+        lines = [(f"最近 {n} 套", rolling[-1][1] if rolling else 0, {section: (total, correct) for section, _, total, correct in rolling})]
+        lines += [(period or "全部", papers, sections) for period, (papers, sections) in rows.items()]
+        self.table.setRowCount(len(lines))
+        for r, (label, papers, sections) in enumerate(lines):
+            self.table.setItem(r, 0, QTableWidgetItem(label))
+            self.table.setItem(r, 1, QTableWidgetItem(str(papers)))
+            for col, (name, _) in enumerate(EXAM_STAT_SECTIONS, 2):
+                total, correct = sections.get(name, (0, 0))
+                text = f"{correct / total:.1%}" if total else "-"
+                item = QTableWidgetItem(text)
+                item.setToolTip(f"{correct} / {total}")
+                self.table.setItem(r, col, item)
+        self.table.resizeColumnsToContents()
+
+class DiagnosticsDialog(QDialog):
+    # 隐藏的诊断面板（Ctrl+Shift+D）：SQL 耗时统计、最慢的几次执行及其查询计划、界面各阶段耗时
+    QUERY_HEADERS = ["SQL", "次数", "总耗时(ms)", "平均(ms)", "p95≤(ms)", "最大(ms)", "行数", "虚拟机步数"]
+    PHASE_HEADERS = ["阶段", "次数", "总耗时(ms)", "平均(ms)", "p95≤(ms)", "最大(ms)"]
+    SLOW_HEADERS = ["耗时(ms)", "行数", "时间", "SQL", "参数"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("诊断")
+        self.resize(1000, 600)
+        self.slow = []
+        self.setup_ui()
+        self.load_data()
+
+    def make_table(self, headers):
+        table = QTableWidget()
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.setSelectionBehavior(QTableWidget.SelectRows)
+        table.verticalHeader().setVisible(False)
+        return table
+
+    def setup_ui(self):
+        layout = QVBoxLayout()
+        tabs = QTabWidget()
+        self.query_table = self.make_table(self.QUERY_HEADERS)
+        self.phase_table = self.make_table(self.PHASE_HEADERS)
+        self.slow_table = self.make_table(self.SLOW_HEADERS)
+        self.slow_table.itemSelectionChanged.connect(self.show_plan)
+        self.plan = QTextEdit()
+        self.plan.setReadOnly(True)
+
+        slow_page = QWidget()
+        slow_layout = QVBoxLayout()
+        slow_layout.addWidget(self.slow_table)
+        slow_layout.addWidget(QLabel("查询计划:"))
+        slow_layout.addWidget(self.plan)
+        slow_page.setLayout(slow_layout)
+
+        tabs.addTab(self.query_table, "SQL 统计")
+        tabs.addTab(slow_page, "最慢的执行")
+        tabs.addTab(self.phase_table, "界面阶段")
+
+        button_layout = QHBoxLayout()
+        refresh_btn = QPushButton("刷新")
+        refresh_btn.clicked.connect(self.load_data)
+        reset_btn = QPushButton("清零")
+        reset_btn.clicked.connect(self.reset)
+        log_btn = QPushButton("写入日志")
+        log_btn.clicked.connect(lambda: log.info("诊断摘要\n%s", diagnostics_report()))
+        self.trace_check = QCheckBox("把每条 SQL 记到日志")
+        self.trace_check.toggled.connect(self.set_trace)
+        button_layout.addWidget(refresh_btn)
+        button_layout.addWidget(reset_btn)
+        button_layout.addWidget(log_btn)
+        button_layout.addWidget(self.trace_check)
+        button_layout.addStretch()
+        button_layout.addWidget(QLabel(f"日志文件: {LOG_FILE}"))
+
+        layout.addWidget(tabs)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def fill(self, table, rows, sortable=True):
+        table.setSortingEnabled(False)
+        table.setRowCount(len(rows))
+        for r, values in enumerate(rows):
+            for c, value in enumerate(values):
+                item = QTableWidgetItem()
+                if isinstance(value, float):
+                    value = round(value, 3)
+                item.setData(Qt.DisplayRole, value)  # 数字按数值排序
+                if isinstance(value, str):
+                    item.setToolTip(value)
+                table.setItem(r, c, item)
+        table.setSortingEnabled(sortable)
+        table.resizeColumnsToContents()
+
+    def load_data(self):
+        stats = query_stats()
+        self.fill(self.query_table, [(s['name'], s['count'], s['total_ms'], s['mean_ms'], s['p95_ms'], s['max_ms'], s['rows'], s['steps'])
+                                     for s in stats])
+        self.fill(self.phase_table, [(s['name'], s['count'], s['total_ms'], s['mean_ms'], s['p95_ms'], s['max_ms'])
+                                     for s in phase_stats()])
+        self.slow = slow_queries()
+        self.fill(self.slow_table, [(s['ms'], s['rows'], s['time'], ' '.join(s['sql'].split()), repr(s['params'])) for s in self.slow],
+                  sortable=False)  # 行号要和 self.slow 对应，这张表不排序
+        self.plan.clear()
+
+    def show_plan(self):
+        rows = self.slow_table.selectionModel().selectedRows()
+        if rows:
+            self.plan.setPlainText(self.slow[rows[0].row()]['plan'] or "（没有查询计划）")
+
+    def reset(self):
+        reset_stats()
+        self.load_data()
+
+    def set_trace(self, enabled):
+        logging.getLogger('xingce').setLevel(logging.DEBUG if enabled else logging.INFO)
+        set_sql_trace(enabled)
+
+class LazyTab(QWidget):
+    # 标签页占位：第一次切换到这一页时才创建真正的页面，页面的构造和首次查询只在用到时才付出
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+        self.page = None
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+    def ensure_built(self):
+        if self.page is None:
+            with timed(f"{self.factory.__name__} 创建"):
+                self.page = self.factory()
+            self.layout().addWidget(self.page)
+        return self.page
 
 class MainWindow(QMainWindow):
+    # (属性名, 页面类, 标题)，按此顺序排列标签页
+    TABS = [
+        ('input_tab', InputTab, "题目录入"),
+        ('review_tab', ReviewTab, "题目回顾"),
+        ('idiom_input_tab', IdiomInputTab, "成语录入"),
+        ('idiom_review_tab', IdiomReviewTab, "成语回顾"),
+        ('exam_input_tab', ExamInputTab, "行测套卷录入"),
+        ('exam_review_tab', ExamReviewTab, "行测套题回顾"),
+        ('exam_stats_tab', ExamStatsTab, "行测统计"),
+        ('essay_input_tab', EssayInputTab, "申论录入"),
+        ('essay_review_tab', EssayReviewTab, "申论回顾"),
+    ]
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("行测错题管理系统")
         self.setGeometry(300, 300, 800, 600)
         
         self.tabs = QTabWidget()
-        self.input_tab = InputTab()
-        self.review_tab = ReviewTab()
-        self.idiom_input_tab = IdiomInputTab()
-        self.idiom_review_tab = IdiomReviewTab()
-        self.exam_input_tab = ExamInputTab()
-        self.exam_review_tab = ExamReviewTab()
-        self.essay_input_tab = EssayInputTab()
-        self.essay_review_tab = EssayReviewTab()
-        self.tabs.addTab(self.input_tab, "题目录入")
-        self.tabs.addTab(self.review_tab, "题目回顾")
-        self.tabs.addTab(self.idiom_input_tab, "成语录入")
-        self.tabs.addTab(self.idiom_review_tab, "成语回顾")
-        self.tabs.addTab(self.exam_input_tab, "行测套卷录入")
-        self.tabs.addTab(self.exam_review_tab, "行测套题回顾")
-        self.tabs.addTab(self.essay_input_tab, "申论录入")
-        self.tabs.addTab(self.essay_review_tab, "申论回顾")
+        self.lazy_tabs = {}
+        for name, page_class, title in self.TABS:
+            self.lazy_tabs[name] = LazyTab(page_class)
+            self.tabs.addTab(self.lazy_tabs[name], title)
+        self.tabs.currentChanged.connect(self.activate_tab)
+        self.activate_tab(self.tabs.currentIndex())  # 启动时只创建第一个显示的页面
         
         self.setCentralWidget(self.tabs)
 
-        # 将 review_tab 和 idiom_review_tab 作为属性添加到 MainWindow
-        self.review_tab = self.tabs.widget(1)
-        self.idiom_review_tab = self.tabs.widget(3)
-        self.exam_review_tab = self.tabs.widget(5)
-        self.essay_review_tab = self.tabs.widget(7)
+        self.review_flush_timer = QTimer(self)
+        self.review_flush_timer.timeout.connect(flush_pending_reviews)
+        self.review_flush_timer.start(REVIEW_FLUSH_MS)
+
+        self.diagnostics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.diagnostics_shortcut.activated.connect(self.show_diagnostics)
+
+        data_menu = self.menuBar().addMenu("数据")
+        sync_action = data_menu.addAction("与另一个数据库同步…")
+        sync_action.triggered.connect(self.sync_database)
+
+    # 对方可以是另一台电脑的 question_data.db，也可以是同步盘里的中转库，选一个不存在的文件名会新建中转库
+    def sync_database(self):
+        path, _ = QFileDialog.getSaveFileName(self, "选择要同步的数据库", "", "SQLite 数据库 (*.db)",
+                                              options=QFileDialog.DontConfirmOverwrite)
+        if not path:
+            return
+
+        def done(result):
+            message = f"同步完成：发送 {result.sent} 条，接收 {result.received} 条变更。"
+            if result.conflicts:
+                message += f"\n有 {result.conflicts} 条记录两边都修改过，已按修改时间保留较新的版本。"
+            QMessageBox.information(self, "同步", message)
+
+        def failed(error):
+            if isinstance(error, (TaskCancelled, TransferCancelled)):
+                QMessageBox.information(self, "已取消", "同步已取消，两边都没有改动。")
+            else:
+                log.error("同步失败: %r", error)
+                QMessageBox.critical(self, "错误", f"同步失败，两边都没有改动: {error}")
+
+        run_with_progress(self, "正在同步…", sync_with, path, on_done=done, on_error=failed)  # 写缓冲里的复习由 sync_with 先写入再同步
+
+    def show_diagnostics(self):
+        DiagnosticsDialog(self).exec_()
+
+    def activate_tab(self, index):
+        if index >= 0:
+            self.tabs.widget(index).ensure_built()
+
+    # 按属性名取页面，例如 window.tab('review_tab')；还没创建的页面这时创建
+    def tab(self, name):
+        return self.lazy_tabs[name].ensure_built()
+
+def setup_logging():
+    handler = RotatingFileHandler(LOG_FILE, maxBytes=1024 * 1024, backupCount=3, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    logger = logging.getLogger('xingce')
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
 
 if __name__ == "__main__":
+    started = time.perf_counter()
+    setup_logging()
     app = QApplication(sys.argv)
+    init_db()  # 建表和迁移放在启动时执行，导入 main 模块本身不碰数据库
     window = MainWindow()
     window.show()
-    sys.exit(app.exec_())
+    record_phase("启动", (time.perf_counter() - started) * 1000)
+    ret = app.exec_()
+    wait_for_workers()
+    flush_reviews()  # 退出前写入还在缓冲区的复习记录
+    if any(record['ms'] >= SLOW_QUERY_MS for record in slow_queries()):
+        log.info("退出时的诊断摘要\n%s", diagnostics_report())
+    close_db()
+    sys.exit(ret)
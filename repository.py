@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+import database
+from database import subscribe
+
+# 详情和编辑对话框读完整记录走这里：按 (表名, ID) 缓存最近用过的记录，超过上限时淘汰最久没用的
+# 数据库的增删改通知到达时丢掉对应的记录，批量导入、同步等发出 'reset' 时丢掉整张表
+# 记录与 database.get_* 的返回值相同，套卷是 (get_exam_paper, get_exam_sections)；缓存的记录是共享的，调用方不要修改
+RECORD_CACHE_SIZE = 512
+
+def _get_exam_paper(qid):
+    paper = database.get_exam_paper(qid)
+    return None if paper is None else (paper, database.get_exam_sections(qid))
+
+LOADERS = {
+    'questions': database.get_question,
+    'idioms': database.get_idiom,
+    'exam_papers': _get_exam_paper,
+    'essay_papers': database.get_essay_paper,
+}
+
+class RecordCache:
+    def __init__(self, loaders=LOADERS, size=RECORD_CACHE_SIZE):
+        self._loaders = loaders
+        self._size = size
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+        self._versions = dict.fromkeys(loaders, 0)  # 每张表收到变更通知的次数
+        self._path = None
+        self.hits = 0
+        self.misses = 0
+
+    def _check_path(self):  # 换了数据库文件时整体作废
+        if self._path != database.DB_PATH:
+            self._records.clear()
+            self._path = database.DB_PATH
+
+    def _lookup(self, key):  # 命中返回记录，否则返回读库前的表版本
+        with self._lock:
+            self._check_path()
+            record = self._records.get(key)
+            if record is not None:
+                self._records.move_to_end(key)
+                return record, None
+            return None, self._versions[key[0]]
+
+    # 读库期间这张表有过变更时读到的可能是旧数据，不放进缓存
+    def _store(self, key, version, record):
+        if record is None:
+            return
+        with self._lock:
+            if self._versions[key[0]] != version or self._path != database.DB_PATH:
+                return
+            self._records[key] = record
+            self._records.move_to_end(key)
+            while len(self._records) > self._size:
+                self._records.popitem(last=False)
+
+    def get(self, table, qid):
+        key = (table, qid)
+        record, version = self._lookup(key)
+        if record is not None:
+            self.hits += 1
+            return record
+        self.misses += 1
+        record = self._loaders[table](qid)
+        self._store(key, version, record)
+        return record
+
+    def prefetch(self, table, ids):  # 可以在后台线程调用，已缓存的跳过
+        for qid in ids:
+            record, version = self._lookup((table, qid))
+            if record is None:
+                self._store((table, qid), version, self._loaders[table](qid))
+
+    def on_change(self, event):
+        if event.table not in self._versions:
+            return
+        with self._lock:
+            self._versions[event.table] += 1
+            if event.op == 'reset':
+                for key in [key for key in self._records if key[0] == event.table]:
+                    del self._records[key]
+            else:
+                self._records.pop((event.table, event.id), None)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'records': len(self._records), 'size': self._size, 'hits': self.hits, 'misses': self.misses}
+
+_cache = RecordCache()
+subscribe(_cache.on_change)
+
+def get_record(table, qid):  # 不存在时返回 None
+    return _cache.get(table, qid)
+
+def prefetch_records(table, ids):
+    _cache.prefetch(table, ids)
+
+def clear_record_cache():
+    _cache.clear()
+
+def record_cache_stats():
+    return _cache.stats()
@@ -0,0 +1,138 @@
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from database import get_conn
+
+# 数据库查询专用线程池：线程不过期，每个线程的长连接可以一直复用，连接数也不会随时间增长
+DB_POOL = QThreadPool()
+DB_POOL.setMaxThreadCount(2)
+DB_POOL.setExpiryTimeout(-1)
+
+# 单条写入的线程池：只有一个线程，写入按提交的先后执行，不占查询线程，界面线程也不用等磁盘
+WRITE_POOL = QThreadPool()
+WRITE_POOL.setMaxThreadCount(1)
+WRITE_POOL.setExpiryTimeout(-1)
+
+# 导入、导出、同步这类长任务的线程池：长任务跑多久都不会占满 DB_POOL，翻页和筛选查询总有空闲线程
+JOB_POOL = QThreadPool()
+JOB_POOL.setMaxThreadCount(1)
+JOB_POOL.setExpiryTimeout(-1)
+
+# 图片解码专用线程池：解码不占数据库线程，缩略图多的时候筛选和搜索查询也不用排在后面
+IMAGE_POOL = QThreadPool()
+IMAGE_POOL.setMaxThreadCount(2)
+
+_active = set()  # 运行中的任务，结果送回界面线程之前保持引用，防止信号对象被回收
+
+class TaskCancelled(Exception):
+    pass
+
+class TaskSignals(QObject):
+    finished = pyqtSignal(object)  # 任务返回值
+    failed = pyqtSignal(object)  # 异常对象，取消时是 TaskCancelled
+    progress = pyqtSignal(object)  # 长任务的进度参数元组
+
+class DbTask(QRunnable):
+    # 在后台线程里执行一次数据库调用，结果通过信号回到界面线程
+    # cancellable 为 False 的是写入任务，退出时不取消，等它写完
+    def __init__(self, fn, args, kwargs, cancellable=True):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancellable = cancellable
+        self.signals = TaskSignals()
+        self.cancelled = False
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def run(self):
+        error = None
+        with self._lock:
+            if not self.cancelled:
+                self._conn = get_conn()
+        if self._conn is None:
+            self.signals.failed.emit(TaskCancelled())
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            error = e
+        with self._lock:
+            self._conn = None
+        if self.cancelled:
+            self.signals.failed.emit(TaskCancelled())
+        elif error is not None:
+            self.signals.failed.emit(error)
+        else:
+            self.signals.finished.emit(result)
+
+    # 可以在任意线程调用：正在执行的 SQL 会被 sqlite3 interrupt 打断，结果不再送达
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None:
+                self._conn.interrupt()
+
+def _submit(pool, task, on_done, on_error):
+    if on_done is not None:
+        task.signals.finished.connect(on_done)
+    if on_error is not None:
+        task.signals.failed.connect(on_error)
+    task.signals.finished.connect(lambda _: _active.discard(task))
+    task.signals.failed.connect(lambda _: _active.discard(task))
+    _active.add(task)
+    pool.start(task)
+    return task
+
+# 给了 on_progress 的是导入导出这类长任务，放到 JOB_POOL：fn 需要接受 progress 和 cancelled 两个关键字参数，
+# 进度经信号送回界面线程，cancelled() 在任务被取消后返回 True
+def run_in_background(fn, *args, on_done=None, on_error=None, on_progress=None, **kwargs):
+    task = DbTask(fn, args, kwargs)
+    if on_progress is None:
+        return _submit(DB_POOL, task, on_done, on_error)
+    kwargs['progress'] = lambda *values: task.signals.progress.emit(values)
+    kwargs['cancelled'] = lambda: task.cancelled
+    task.signals.progress.connect(lambda values: on_progress(*values))
+    return _submit(JOB_POOL, task, on_done, on_error)
+
+# 增删改单条记录：在 WRITE_POOL 里按提交顺序执行
+def run_write(fn, *args, on_done=None, on_error=None):
+    return _submit(WRITE_POOL, DbTask(fn, args, {}, cancellable=False), on_done, on_error)
+
+class ImageTask(QRunnable):
+    # 在图片线程池里执行一次解码之类的计算，不打开数据库连接
+    cancellable = True
+
+    def __init__(self, fn, args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = TaskSignals()
+        self.cancelled = False
+
+    def run(self):
+        if self.cancelled:
+            self.signals.failed.emit(TaskCancelled())
+            return
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(e)
+            return
+        if self.cancelled:
+            self.signals.failed.emit(TaskCancelled())
+        else:
+            self.signals.finished.emit(result)
+
+    def cancel(self):
+        self.cancelled = True
+
+def run_image_task(fn, *args, on_done=None, on_error=None):
+    return _submit(IMAGE_POOL, ImageTask(fn, args), on_done, on_error)
+
+def wait_for_workers():  # 退出前取消查询和长任务并等线程结束，写入任务等它写完，之后才能关闭数据库连接
+    for task in list(_active):
+        if task.cancellable:
+            task.cancel()
+    for pool in (IMAGE_POOL, DB_POOL, JOB_POOL, WRITE_POOL):
+        pool.waitForDone()